@@ -0,0 +1,97 @@
+"""
+Run the benchmark suite and compare it with the recorded baseline.
+
+    python -m benchmarks                  # run everything, report against the baseline
+    python -m benchmarks -k parse_ofx     # only benchmarks whose name contains parse_ofx
+    python -m benchmarks --save           # record the results as the new baseline
+    python -m benchmarks --check          # exit non-zero on regressions
+    python -m benchmarks --quick          # smoke test: one call per benchmark
+"""
+
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+import click
+
+from benchmarks.suite import BENCHMARKS
+from copeland_ledger.logs import configure_logging
+
+BASELINE = Path(__file__).parent / "baseline.json"
+# Slowdown against the baseline reported as a regression
+REGRESSION_FACTOR = 1.5
+
+
+def measure(function, repeat: int) -> float:
+    """Return the best time of a single call, in seconds."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(
+    directory: Path, keyword: str = "", quick: bool = False, repeat: int = 3
+) -> dict[str, float]:
+    """Run the selected benchmarks and return the time of each one per size."""
+    results = {}
+    for bench in BENCHMARKS:
+        if keyword not in bench.name:
+            continue
+        for size in bench.sizes[:1] if quick else bench.sizes:
+            function = bench.setup(size, directory)
+            key = f"{bench.name}:{size}"
+            if quick:
+                # A single call of the smallest size, to check the benchmark runs
+                start = time.perf_counter()
+                function()
+                results[key] = time.perf_counter() - start
+            else:
+                results[key] = measure(function, repeat=repeat)
+            click.echo(f"{key:<40} {results[key] * 1000:10.3f} ms")
+    return results
+
+
+def compare(results: dict[str, float], baseline: dict[str, float]) -> list[str]:
+    """Return the benchmarks that got slower than the baseline allows."""
+    regressions = []
+    for key, seconds in results.items():
+        if key in baseline and seconds > baseline[key] * REGRESSION_FACTOR:
+            regressions.append(key)
+            click.echo(f"{key} regressed: {baseline[key] * 1000:.3f} -> {seconds * 1000:.3f} ms")
+    return regressions
+
+
+@click.command()
+@click.option("-k", "keyword", default="", help="Only run benchmarks whose name contains this.")
+@click.option("--repeat", default=3, show_default=True, help="Timing repeats per benchmark.")
+@click.option("--quick", is_flag=True, help="Call each benchmark once at its smallest size.")
+@click.option("--save", is_flag=True, help="Record the results as the new baseline.")
+@click.option("--check", is_flag=True, help="Exit with an error if anything regressed.")
+def main(keyword: str, repeat: int, quick: bool, save: bool, check: bool):
+    # Debug logging would dominate the timings
+    configure_logging(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(directory=Path(directory), keyword=keyword, quick=quick, repeat=repeat)
+    if quick:
+        return
+
+    baseline = json.loads(BASELINE.read_text())["results"] if BASELINE.exists() else {}
+    regressions = compare(results=results, baseline=baseline)
+    if save:
+        recorded = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": baseline | results,
+        }
+        BASELINE.write_text(json.dumps(recorded, indent=2, sort_keys=True) + "\n")
+    if check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Synthetic OFX and PDF downloads, and Beancount ledgers, of configurable size."""
+
+import datetime as dt
+import random
+from decimal import Decimal
+from pathlib import Path
+
+OFX_HEADER = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+SECURITY:NONE
+ENCODING:USASCII
+CHARSET:1252
+COMPRESSION:NONE
+OLDFILEUID:NONE
+NEWFILEUID:NONE
+
+"""
+
+START = dt.datetime(2024, 1, 1, 12)
+
+# (CUSIP, ticker, name, info aggregate)
+SECURITIES = [
+    ("922908728", "VTSAX", "Vanguard Total Stock Market Index Fund", "MFINFO"),
+    ("922908710", "VFIAX", "Vanguard 500 Index Fund", "MFINFO"),
+    ("037833100", "AAPL", "Apple Inc", "STOCKINFO"),
+]
+
+
+def ofx_datetime(value: dt.datetime) -> str:
+    return value.strftime("%Y%m%d%H%M%S.000[-5:EST]")
+
+
+def signon(org: str, fid: str) -> str:
+    return f"""<SIGNONMSGSRSV1>
+<SONRS>
+<STATUS>
+<CODE>0
+<SEVERITY>INFO
+</STATUS>
+<DTSERVER>{ofx_datetime(START)}
+<LANGUAGE>ENG
+<FI>
+<ORG>{org}
+<FID>{fid}
+</FI>
+</SONRS>
+</SIGNONMSGSRSV1>
+"""
+
+
+def bank_transactions(count: int, rng: random.Random, prefix: str) -> str:
+    lines = []
+    for i in range(count):
+        amount = Decimal(rng.randint(-50000, 50000)) / 100
+        lines.append(
+            f"""<STMTTRN>
+<TRNTYPE>{"CREDIT" if amount > 0 else "DEBIT"}
+<DTPOSTED>{ofx_datetime(START + dt.timedelta(hours=i))}
+<TRNAMT>{amount}
+<FITID>{prefix}-{i:06d}
+<NAME>Payee {rng.randint(1, 500)} &amp; Co
+</STMTTRN>
+"""
+        )
+    return "".join(lines)
+
+
+def write_bank_qfx(
+    path: Path,
+    transactions: int,
+    accounts: int = 1,
+    credit_card: bool = False,
+    seed: int = 0,
+) -> Path:
+    """
+    Write a bank or credit card OFX file.
+
+    The file holds one statement per account, each with the given number of
+    transactions. Account IDs end in 1111, 2222, ...
+    """
+    rng = random.Random(seed)
+    msgset, trnrs, stmtrs, acctfrom = (
+        ("CREDITCARDMSGSRSV1", "CCSTMTTRNRS", "CCSTMTRS", "CCACCTFROM")
+        if credit_card
+        else ("BANKMSGSRSV1", "STMTTRNRS", "STMTRS", "BANKACCTFROM")
+    )
+    end = START + dt.timedelta(hours=transactions)
+    statements = []
+    for n in range(1, accounts + 1):
+        acct_id = "0000" + str(n % 10) * 8
+        bank_id = "" if credit_card else "<BANKID>123456789\n"
+        acct_type = "" if credit_card else "<ACCTTYPE>CHECKING\n"
+        statements.append(
+            f"""<{trnrs}>
+<TRNUID>{n}
+<STATUS>
+<CODE>0
+<SEVERITY>INFO
+</STATUS>
+<{stmtrs}>
+<CURDEF>USD
+<{acctfrom}>
+{bank_id}<ACCTID>{acct_id}
+{acct_type}</{acctfrom}>
+<BANKTRANLIST>
+<DTSTART>{ofx_datetime(START)}
+<DTEND>{ofx_datetime(end)}
+{bank_transactions(transactions, rng, prefix=f"T{n}")}</BANKTRANLIST>
+<LEDGERBAL>
+<BALAMT>1000.00
+<DTASOF>{ofx_datetime(end)}
+</LEDGERBAL>
+</{stmtrs}>
+</{trnrs}>
+"""
+        )
+    body = f"<OFX>\n{signon('Ally', '1234')}<{msgset}>\n{''.join(statements)}</{msgset}>\n</OFX>\n"
+    path.write_text(OFX_HEADER + body)
+    return path
+
+
+def invest_transaction(i: int, rng: random.Random) -> str:
+    cusip = SECURITIES[i % len(SECURITIES)][0]
+    units = Decimal(rng.randint(1, 10000)) / 100
+    price = Decimal(rng.randint(1000, 50000)) / 100
+    total = (units * price).quantize(Decimal("0.01"))
+    invtran = f"""<INVTRAN>
+<FITID>I-{i:06d}
+<DTTRADE>{ofx_datetime(START + dt.timedelta(hours=i))}
+<DTSETTLE>{ofx_datetime(START + dt.timedelta(hours=i + 48))}
+<MEMO>Transaction {i}
+</INVTRAN>
+<SECID>
+<UNIQUEID>{cusip}
+<UNIQUEIDTYPE>CUSIP
+</SECID>
+"""
+    kind = i % 3
+    if kind == 0:
+        return f"""<BUYMF>
+<INVBUY>
+{invtran}<UNITS>{units}
+<UNITPRICE>{price}
+<TOTAL>-{total}
+<SUBACCTSEC>CASH
+<SUBACCTFUND>CASH
+</INVBUY>
+<BUYTYPE>BUY
+</BUYMF>
+"""
+    if kind == 1:
+        return f"""<INCOME>
+{invtran}<INCOMETYPE>DIV
+<TOTAL>{total}
+<SUBACCTSEC>CASH
+<SUBACCTFUND>CASH
+</INCOME>
+"""
+    return f"""<REINVEST>
+{invtran}<INCOMETYPE>DIV
+<TOTAL>-{total}
+<SUBACCTSEC>CASH
+<UNITS>{units}
+<UNITPRICE>{price}
+</REINVEST>
+"""
+
+
+def write_invest_qfx(path: Path, transactions: int, seed: int = 0) -> Path:
+    """Write an investment OFX file of BUYMF, INCOME and REINVEST transactions."""
+    rng = random.Random(seed)
+    end = START + dt.timedelta(hours=transactions + 48)
+    body = "".join(invest_transaction(i, rng) for i in range(transactions))
+    securities = []
+    for cusip, ticker, name, info in SECURITIES:
+        type_tag = "<MFTYPE>OPENEND\n" if info == "MFINFO" else "<STOCKTYPE>COMMON\n"
+        securities.append(
+            f"""<{info}>
+<SECINFO>
+<SECID>
+<UNIQUEID>{cusip}
+<UNIQUEIDTYPE>CUSIP
+</SECID>
+<SECNAME>{name}
+<TICKER>{ticker}
+<UNITPRICE>100.00
+<DTASOF>{ofx_datetime(end)}
+</SECINFO>
+{type_tag}</{info}>
+"""
+        )
+    document = f"""<OFX>
+{signon("Vanguard", "1358")}<INVSTMTMSGSRSV1>
+<INVSTMTTRNRS>
+<TRNUID>1
+<STATUS>
+<CODE>0
+<SEVERITY>INFO
+</STATUS>
+<INVSTMTRS>
+<DTASOF>{ofx_datetime(end)}
+<CURDEF>USD
+<INVACCTFROM>
+<BROKERID>vanguard.com
+<ACCTID>88887777
+</INVACCTFROM>
+<INVTRANLIST>
+<DTSTART>{ofx_datetime(START)}
+<DTEND>{ofx_datetime(end)}
+{body}</INVTRANLIST>
+</INVSTMTRS>
+</INVSTMTTRNRS>
+</INVSTMTMSGSRSV1>
+<SECLISTMSGSRSV1>
+<SECLIST>
+{"".join(securities)}</SECLIST>
+</SECLISTMSGSRSV1>
+</OFX>
+"""
+    path.write_text(OFX_HEADER + document)
+    return path
+
+
+def write_ledger(path: Path, transactions: int, seed: int = 0) -> Path:
+    """Write a ledger of imported checking transactions, split into a file per year."""
+    rng = random.Random(seed)
+    directory = path.parent / f"{path.stem}-years"
+    directory.mkdir(parents=True, exist_ok=True)
+    years: dict[int, list[str]] = {}
+    for i in range(transactions):
+        date = START.date() + dt.timedelta(days=i // 5)
+        amount = Decimal(rng.randint(-50000, 50000)) / 100
+        years.setdefault(date.year, []).append(
+            f"""{date} * "Payee {rng.randint(1, 500)}" ""
+  fitid: "CHK-{i:06d}"
+  Assets:Checking  {amount} USD
+  Expenses:Misc
+"""
+        )
+    for year, entries in years.items():
+        (directory / f"{year}.beancount").write_text("\n".join(entries))
+    path.write_text(
+        f"""option "operating_currency" "USD"
+include "{directory.name}/*.beancount"
+
+{START.date()} open Assets:Checking
+{START.date()} open Expenses:Misc
+"""
+    )
+    return path
+
+
+def pdf_page_text(page: int, lines: int, rng: random.Random) -> list[str]:
+    words = ["statement", "balance", "payment", "account", "interest", "deposit", "total"]
+    return [
+        f"Page {page + 1} line {line + 1}: " + " ".join(rng.choices(words, k=8))
+        for line in range(lines)
+    ]
+
+
+def write_pdf(
+    path: Path, pages: int, lines: int = 40, footer: str | None = None, seed: int = 0
+) -> Path:
+    """
+    Write a text PDF with the given number of pages.
+
+    Each page holds lines of filler text. The optional footer is added to
+    the last page, so matching it requires reading the whole document.
+    """
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # Page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        text = pdf_page_text(page, lines, rng)
+        if footer and page == pages - 1:
+            text.append(footer)
+        escaped = (
+            line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text
+        )
+        stream = "BT /F1 10 Tf 12 TL 50 750 Td " + " ".join(f"({line}) '" for line in escaped)
+        stream = (stream + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    path.write_bytes(bytes(output))
+    return path
@@ -0,0 +1,238 @@
+"""
+Benchmarks of the ingest and amortization hot paths.
+
+Each benchmark takes a size and a scratch directory, does its setup, and
+returns the function to time.
+"""
+
+import datetime as dt
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from benchmarks import generate
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    sizes: tuple[int, ...]
+    setup: Callable[[int, Path], Callable[[], object]]
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(name: str, sizes: Iterable[int]):
+    """Register a benchmark setup function."""
+
+    def register(setup: Callable[[int, Path], Callable[[], object]]):
+        BENCHMARKS.append(Benchmark(name=name, sizes=tuple(sizes), setup=setup))
+        return setup
+
+    return register
+
+
+QFX_SIZES = (100, 1000, 10000)
+PDF_SIZES = (1, 10, 50)
+
+
+def qfx_file(kind: str, size: int, directory: Path) -> Path:
+    path = directory / f"{kind}-{size}.qfx"
+    if not path.exists():
+        if kind == "invest":
+            generate.write_invest_qfx(path, transactions=size)
+        else:
+            generate.write_bank_qfx(path, transactions=size, credit_card=kind == "creditcard")
+    return path
+
+
+def pdf_file(size: int, directory: Path) -> Path:
+    path = directory / f"statement-{size}.pdf"
+    if not path.exists():
+        generate.write_pdf(path, pages=size, footer="Chase account ending in 1111")
+    return path
+
+
+def register_qfx_benchmarks(kind: str) -> None:
+    @benchmark(f"parse_ofx[{kind}]", QFX_SIZES)
+    def parse(size: int, directory: Path) -> Callable[[], object]:
+        from copeland_ledger.qfx.extract import parse_ofx
+
+        path = qfx_file(kind, size, directory)
+        return lambda: parse_ofx(path=path)
+
+    @benchmark(f"transform_ofx[{kind}]", QFX_SIZES)
+    def transform(size: int, directory: Path) -> Callable[[], object]:
+        from copeland_ledger.qfx.extract import parse_ofx
+        from copeland_ledger.qfx.transform import transform_ofx
+
+        ofx = parse_ofx(path=qfx_file(kind, size, directory))
+        return lambda: transform_ofx(ofx=ofx)
+
+    @benchmark(f"load[{kind}]", QFX_SIZES)
+    def load(size: int, directory: Path) -> Callable[[], object]:
+        from copeland_ledger.qfx.load import load
+
+        path = qfx_file(kind, size, directory)
+        return lambda: load(path=str(path))
+
+
+for kind in ("bank", "creditcard", "invest"):
+    register_qfx_benchmarks(kind)
+
+
+@benchmark("transform_ofx[statements]", (10, 100, 500))
+def transform_statements(size: int, directory: Path) -> Callable[[], object]:
+    from copeland_ledger.qfx.extract import parse_ofx
+    from copeland_ledger.qfx.transform import transform_ofx
+
+    # Many small statements, where per-statement overhead such as logging shows
+    path = directory / f"statements-{size}.qfx"
+    if not path.exists():
+        generate.write_bank_qfx(path, transactions=5, accounts=size)
+    ofx = parse_ofx(path=path)
+    return lambda: transform_ofx(ofx=ofx)
+
+
+@benchmark("lazy_debug[statement]", QFX_SIZES)
+def log_statement(size: int, directory: Path) -> Callable[[], object]:
+    import structlog
+
+    from copeland_ledger.logs import lazy_debug
+    from copeland_ledger.qfx.load import load
+
+    logger = structlog.getLogger(__name__)
+    statement = load(path=str(qfx_file("invest", size, directory))).statements[0]
+    # With debug off this costs the same whatever the size of the statement
+    return lambda: lazy_debug(logger, "Loaded statement", statement=statement.summary)
+
+
+@benchmark("QfxFileIndex.get[invest]", QFX_SIZES)
+def index_get(size: int, directory: Path) -> Callable[[], object]:
+    from copeland_ledger.qfx.index import QfxFileIndex
+
+    path = qfx_file("invest", size, directory)
+    # A new index per call, so the file's account IDs are read again
+    return lambda: QfxFileIndex().get(path).account_ids
+
+
+@benchmark("QfxImporter.identify", QFX_SIZES)
+def qfx_identify(size: int, directory: Path) -> Callable[[], object]:
+    from copeland_ledger.importers.qfx import QfxImporter
+    from copeland_ledger.qfx.index import FILE_INDEX
+
+    path = str(qfx_file("bank", size, directory))
+    importer = QfxImporter(org="Ally", acctid_suffix="1111", bean_account="Assets:Checking")
+
+    def identify():
+        # A cold index, as for the first importer to see a download
+        FILE_INDEX.clear()
+        return importer.identify(path)
+
+    return identify
+
+
+@benchmark("QfxImporter.extract", QFX_SIZES)
+def qfx_extract(size: int, directory: Path) -> Callable[[], object]:
+    from copeland_ledger.importers.qfx import QfxImporter
+
+    path = str(qfx_file("bank", size, directory))
+    importer = QfxImporter(org="Ally", acctid_suffix="1111", bean_account="Assets:Checking")
+    importer.identify(path)
+    return lambda: importer.extract(path, existing=[])
+
+
+def extracted_entries(kind: str, size: int, directory: Path) -> list:
+    from copeland_ledger.importers.qfx import QfxImporter
+
+    path = str(qfx_file(kind, size, directory))
+    importer = QfxImporter(org="Test", acctid_suffix="", bean_account="Assets:Test")
+    importer.identify(path)
+    return importer.extract(path, existing=[])
+
+
+def register_format_benchmarks(kind: str) -> None:
+    @benchmark(f"format_entry[{kind}]", QFX_SIZES)
+    def format_entries(size: int, directory: Path) -> Callable[[], object]:
+        from copeland_ledger.writer import format_entry
+
+        entries = extracted_entries(kind, size, directory)
+        return lambda: "".join(format_entry(entry) for entry in entries)
+
+    @benchmark(f"printer.format_entry[{kind}]", QFX_SIZES)
+    def print_entries(size: int, directory: Path) -> Callable[[], object]:
+        from beancount.parser import printer
+
+        entries = extracted_entries(kind, size, directory)
+        return lambda: "".join(printer.format_entry(entry) for entry in entries)
+
+
+for kind in ("bank", "invest"):
+    register_format_benchmarks(kind)
+
+
+def ledger_file(size: int, directory: Path) -> Path:
+    path = directory / f"ledger-{size}.beancount"
+    if not path.exists():
+        generate.write_ledger(path, transactions=size)
+    return path
+
+
+@benchmark("loader.load_file", (1000, 10000))
+def beancount_load(size: int, directory: Path) -> Callable[[], object]:
+    from beancount import loader
+
+    path = str(ledger_file(size, directory))
+    # Warm beancount's own pickle cache, which it only writes for loads over a second
+    loader.load_file(path)
+    return lambda: loader.load_file(path)
+
+
+@benchmark("load_ledger[snapshot]", (1000, 10000))
+def ledger_snapshot(size: int, directory: Path) -> Callable[[], object]:
+    from copeland_ledger import ledger
+
+    path = ledger_file(size, directory)
+    snapshot_dir = directory / "ledger-snapshots"
+    ledger.load_ledger(path, snapshot_dir=snapshot_dir)
+
+    def load():
+        # A new process, which only has the snapshot
+        ledger._loaded.clear()
+        return ledger.load_ledger(path, snapshot_dir=snapshot_dir)
+
+    return load
+
+
+@benchmark("PdfArchiver.identify", PDF_SIZES)
+def pdf_identify(size: int, directory: Path) -> Callable[[], object]:
+    from copeland_ledger.config import Account
+    from copeland_ledger.importers.pdf_archive import PdfArchiver
+
+    path = str(pdf_file(size, directory))
+    account = Account(bean_account="Assets:Checking", org="Chase", acctid_suffix="1111")
+
+    def identify():
+        # A new archiver per call, so the matched text isn't memoized
+        return PdfArchiver(config=account).identify(path)
+
+    return identify
+
+
+@benchmark("amortization_table", (1, 10, 30))
+def amortization(size: int, directory: Path) -> Callable[[], object]:
+    from copeland_ledger.amortization import LoanDetail, amortization_table
+
+    loan = LoanDetail(
+        interest_rate=0.06,
+        years=size,
+        principal=300000,
+        monthly_payment=-2500,
+        start_date=dt.date(2000, 1, 1),
+        account_bank="Assets:Checking",
+        account_liability="Liabilities:Mortgage",
+        account_interest_expense="Expenses:Interest",
+        account_escrow="Assets:Escrow",
+    )
+    return lambda: amortization_table(loan=loan)
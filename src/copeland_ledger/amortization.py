@@ -1,13 +1,21 @@
 import datetime as dt
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 from decimal import Decimal
 from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, TextIO
 
+import numpy as np
 import numpy_financial as npf
-import pandas as pd
-import yaml
-from beancount.core import amount, data, flags
-from beancount.parser import printer
-from pydantic import BaseModel, field_validator
+from numpy.typing import ArrayLike
+from pydantic import BaseModel, Field, field_validator
+
+from copeland_ledger.cache import cache_dir
+from copeland_ledger.config import load_config
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class LoanDetail(BaseModel):
@@ -23,6 +31,8 @@ class LoanDetail(BaseModel):
     principal: float
     # Additional principal payment
     addl_principal: float = 0.0
+    # One-off additional principal payments, by payment date
+    addl_principal_schedule: dict[dt.date, float] = Field(default_factory=dict)
     # Start date of the loan
     start_date: dt.date
     # Monthly payment including escrow
@@ -38,8 +48,7 @@ class LoanDetail(BaseModel):
     @classmethod
     def from_config_file(cls, path: Path, name: str) -> "LoanDetail":
         """Create a Loan object from a YAML config file."""
-        config = yaml.safe_load(path.read_text())
-        loan = config["loans"][name]
+        loan = load_config(path=path, snapshot_dir=cache_dir() / "config").data["loans"][name]
         return cls.model_validate(loan)
 
     @field_validator("monthly_payment", "addl_principal")
@@ -48,132 +57,454 @@ class LoanDetail(BaseModel):
         """Ensure that the monthly payment and additional principal are negative."""
         return -value if value > 0 else value
 
+    @field_validator("addl_principal_schedule")
+    @classmethod
+    def ensure_negative_schedule(cls, value: dict[dt.date, float]) -> dict[dt.date, float]:
+        """Ensure that scheduled additional principal payments are negative."""
+        return {date: -abs(amount) for date, amount in value.items()}
+
+
+# Remaining balance below which a loan counts as paid off
+PAYOFF_TOLERANCE = 0.005
+CENT = Decimal("0.01")
 
-def amortization_table(loan: LoanDetail) -> pd.DataFrame:
+
+# Loans amortized together; large blocks spend more time allocating than computing
+BLOCK_SIZE = 256
+
+
+@dataclass(frozen=True)
+class Amortization:
     """
-    Calculate the amortization schedule given the loan details.
+    Payment schedules of one or more loans.
 
-    Based on:
-    https://github.com/chris1610/pbpython/blob/master/notebooks/Amortization-Model-Article.ipynb
+    Every array has one row per loan and one column per period. Amounts are
+    positive and are zero after a loan is paid off.
     """
-    # Create an index of the payment dates
-    rng = pd.date_range(
-        name="date",
-        start=loan.start_date,
-        periods=loan.years * loan.payments_year,
-        freq="MS",
+
+    principal: np.ndarray
+    interest: np.ndarray
+    # Additional principal actually applied
+    extra: np.ndarray
+    # Balance after each payment
+    balance: np.ndarray
+    # Number of payments until each loan is paid off
+    payoff: np.ndarray
+
+    @property
+    def payment(self) -> np.ndarray:
+        """Return the scheduled payments: principal plus interest."""
+        return self.principal + self.interest
+
+
+def amortize(
+    principal: ArrayLike,
+    rate: ArrayLike,
+    periods: ArrayLike,
+    extra: ArrayLike = 0.0,
+) -> Amortization:
+    """
+    Calculate exact, balance-dependent payment schedules.
+
+    principal, rate (per period) and periods (number of scheduled payments)
+    are scalars or one value per loan. extra is the additional principal paid
+    each period: a scalar, one schedule of periods, or one schedule per loan.
+
+    Each balance follows B[k] = (1 + r) * B[k-1] - (P + E[k]), which unrolls to
+    B[k] = (1 + r)**k * (B[0] - sum((1 + r)**-j * (P + E[j]) for j <= k)), so
+    every schedule is computed with cumulative sums instead of a Python loop.
+    """
+    principal = np.atleast_1d(np.asarray(principal, dtype=float))
+    rate = np.atleast_1d(np.asarray(rate, dtype=float))
+    periods = np.atleast_1d(np.asarray(periods, dtype=int))
+    principal, rate, periods = (a[:, None] for a in np.broadcast_arrays(principal, rate, periods))
+    m, n = len(principal), int(periods.max())
+    extra = np.asarray(extra, dtype=float)
+    if extra.ndim and 1 < extra.shape[-1] < n:
+        # Schedules shorter than the term have no extra principal afterwards
+        padding = [(0, 0)] * (extra.ndim - 1) + [(0, n - extra.shape[-1])]
+        extra = np.pad(extra, padding)
+    extra = np.broadcast_to(extra[..., :n] if extra.ndim else extra, (m, n))
+
+    schedule = Amortization(
+        principal=np.empty((m, n)),
+        interest=np.empty((m, n)),
+        extra=np.empty((m, n)),
+        balance=np.empty((m, n)),
+        payoff=np.empty(m, dtype=int),
     )
+    for start in range(0, m, BLOCK_SIZE):
+        rows = slice(start, start + BLOCK_SIZE)
+        _amortize_block(
+            principal=principal[rows],
+            rate=rate[rows],
+            periods=periods[rows],
+            extra=extra[rows],
+            out=Amortization(
+                principal=schedule.principal[rows],
+                interest=schedule.interest[rows],
+                extra=schedule.extra[rows],
+                balance=schedule.balance[rows],
+                payoff=schedule.payoff[rows],
+            ),
+        )
+    return schedule
+
 
-    # Build up the Amortization schedule as a DataFrame
-    df = pd.DataFrame(
-        index=rng,
-        columns=[
-            "payment",
-            "principal",
-            "interest",
-            "principal_addl",
-            "monthly_payment",
-            "curr_balance",
-            "principal_cum",
-            "currency",
-        ],
-        dtype="float",
+def _amortize_block(
+    principal: np.ndarray,
+    rate: np.ndarray,
+    periods: np.ndarray,
+    extra: np.ndarray,
+    out: Amortization,
+) -> None:
+    n = out.balance.shape[1]
+    # Scheduled payment, as a positive amount
+    payment = -npf.pmt(rate, periods, principal)
+    k = np.arange(1, n + 1)
+    growth = (1 + rate) ** k
+    balance = out.balance
+    np.divide(payment + extra, growth, out=balance)
+    np.cumsum(balance, axis=1, out=balance)
+    np.subtract(principal, balance, out=balance)
+    balance *= growth
+
+    # First period with nothing left to pay, at the latest the end of the term
+    paid_off = (balance <= PAYOFF_TOLERANCE) | (k >= periods)
+    out.payoff[:] = paid_off.argmax(axis=1) + 1
+    payoff = out.payoff[:, None]
+    active = k <= payoff
+    last = k == payoff
+
+    balance_before = growth
+    balance_before[:, 0] = principal[:, 0]
+    balance_before[:, 1:] = balance[:, :-1]
+    np.multiply(balance_before, rate, out=out.interest)
+    out.interest[~active] = 0.0
+    np.subtract(payment, out.interest, out=out.principal)
+    out.principal[~active] = 0.0
+    # The final payment only covers what is left
+    np.copyto(out.principal, np.minimum(out.principal, balance_before), where=last)
+    np.copyto(out.extra, extra)
+    out.extra[~active] = 0.0
+    np.copyto(out.extra, balance_before - out.principal, where=last)
+    balance[~active | last] = 0.0
+
+
+@dataclass(frozen=True)
+class Scenarios:
+    """Schedules and summaries of a batch of loan scenarios, one row per scenario."""
+
+    principal: np.ndarray
+    # Annual interest rate
+    rate: np.ndarray
+    years: np.ndarray
+    # Additional principal paid every period
+    extra: np.ndarray
+    schedule: Amortization
+    total_interest: np.ndarray
+    # Interest saved compared to the baseline
+    interest_saved: np.ndarray
+
+    @property
+    def payoff(self) -> np.ndarray:
+        """Return the number of payments until each scenario is paid off."""
+        return self.schedule.payoff
+
+    def summary(self) -> "pd.DataFrame":
+        """Return one row of parameters and results per scenario."""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "principal": self.principal,
+                "rate": self.rate,
+                "years": self.years,
+                "extra": self.extra,
+                "payment": self.schedule.principal[:, 0] + self.schedule.interest[:, 0],
+                "payoff": self.payoff,
+                "total_interest": self.total_interest,
+                "interest_saved": self.interest_saved,
+            }
+        )
+
+
+def amortize_scenarios(
+    principal: ArrayLike,
+    rate: ArrayLike,
+    years: ArrayLike,
+    extra: ArrayLike = 0.0,
+    payments_year: int = 12,
+    baseline_interest: ArrayLike | None = None,
+) -> Scenarios:
+    """
+    Amortize a batch of loan scenarios at once.
+
+    The parameters are broadcast against each other, one element per
+    scenario; use scenario_grid for every combination. Interest saved is
+    measured against baseline_interest, by default the interest of the same
+    loan without additional principal.
+    """
+    principal, rate, years, extra = (
+        a.ravel().astype(float)
+        for a in np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(a)) for a in (principal, rate, years, extra))
+        )
+    )
+    periods = (years * payments_year).astype(int)
+    schedule = amortize(
+        principal=principal,
+        rate=rate / payments_year,
+        periods=periods,
+        extra=extra[:, None],
+    )
+    total_interest = schedule.interest.sum(axis=1)
+    if baseline_interest is None:
+        # Without additional principal every scheduled payment is made
+        baseline_interest = -npf.pmt(rate / payments_year, periods, principal) * periods - principal
+    return Scenarios(
+        principal=principal,
+        rate=rate,
+        years=years,
+        extra=extra,
+        schedule=schedule,
+        total_interest=total_interest,
+        interest_saved=baseline_interest - total_interest,
     )
 
-    # Add index by period (start at 1 not 0)
-    df.reset_index(inplace=True)
-    df.index += 1
-    df.index.name = "period"
 
-    df["currency"] = loan.currency
-    df["monthly_payment"] = loan.monthly_payment
+def scenario_grid(**axes: ArrayLike) -> dict[str, np.ndarray]:
+    """Return every combination of the given parameter values, as flat arrays."""
+    grids = np.meshgrid(*(np.atleast_1d(values) for values in axes.values()), indexing="ij")
+    return {name: grid.ravel() for name, grid in zip(axes, grids, strict=True)}
 
-    # Calculate the payment, principal and interests amounts using built in
-    # Numpy functions
-    per_payment = npf.pmt(
-        loan.interest_rate / loan.payments_year,
-        loan.years * loan.payments_year,
-        loan.principal,
+
+def sweep_loan(
+    loan: LoanDetail,
+    rates: Iterable[float] = (),
+    years: Iterable[int] = (),
+    extras: Iterable[float] = (),
+) -> Scenarios:
+    """
+    Evaluate a grid of rates, terms and additional principal for a loan.
+
+    Axes left empty keep the loan's own value, and interest saved is
+    measured against the loan as configured.
+    """
+    current = amortize_scenarios(
+        principal=loan.principal,
+        rate=loan.interest_rate,
+        years=loan.years,
+        extra=-loan.addl_principal,
+        payments_year=loan.payments_year,
     )
-    df["payment"] = per_payment
-    df["principal"] = npf.ppmt(
-        loan.interest_rate / loan.payments_year,
-        df.index,
-        loan.years * loan.payments_year,
-        loan.principal,
+    grid = scenario_grid(
+        rate=list(rates) or [loan.interest_rate],
+        years=list(years) or [loan.years],
+        extra=[abs(extra) for extra in extras] or [-loan.addl_principal],
     )
-    df["interest"] = npf.ipmt(
-        loan.interest_rate / loan.payments_year,
-        df.index,
-        loan.years * loan.payments_year,
-        loan.principal,
+    return amortize_scenarios(
+        principal=loan.principal,
+        payments_year=loan.payments_year,
+        baseline_interest=current.total_interest[0],
+        **grid,
     )
-    df["principal_addl"] = loan.addl_principal
 
-    # Store the Cumulative Principal Payments and ensure it never gets larger
-    # than the original principal
-    df["principal_cum"] = (df["principal"] + df["principal_addl"]).cumsum()
-    df["principal_cum"] = df["principal_cum"].clip(lower=float(-loan.principal))
-    # Calculate the current balance for each period
-    df["curr_balance"] = loan.principal + df["principal_cum"]
 
-    # Round the values
-    df = df.round(2)
+class Payment(NamedTuple):
+    """A single loan payment, in exact Decimal amounts."""
 
-    return df
+    # Payment number, starting at 1
+    period: int
+    date: dt.date
+    principal: Decimal
+    interest: Decimal
+    principal_addl: Decimal
+    # Balance after the payment
+    balance: Decimal
 
 
-def output_beancount_amortization_table(df: pd.DataFrame, loan: LoanDetail):
-    """Output the amortization table as Beancount transactions."""
-    entries = []
-    for row in df.itertuples():
-        payment_amount = round(Decimal(row.monthly_payment), 2)
-        principle_amount = abs(round(Decimal(row.principal), 2))
-        interest_amount = abs(round(Decimal(row.interest), 2))
-        currency: str = row.currency
-
-        payment = data.Posting(
-            account=loan.account_bank,
-            units=amount.Amount(number=payment_amount, currency=currency),
-            cost=None,
-            price=None,
-            flag=None,
-            meta=None,
-        )
-        principle = data.Posting(
-            account=loan.account_liability,
-            units=amount.Amount(number=principle_amount, currency=currency),
-            cost=None,
-            price=None,
-            flag=None,
-            meta=None,
+def payment_date(start_date: dt.date, period: int) -> dt.date:
+    """Return the date of a payment: the first of each month from the start date."""
+    months = start_date.year * 12 + start_date.month - 1 + (start_date.day > 1) + period - 1
+    return dt.date(months // 12, months % 12 + 1, 1)
+
+
+def payment_period(start_date: dt.date, date: dt.date) -> int:
+    """Return the period of the first payment on or after a date."""
+    first = payment_date(start_date, 1)
+    months = (date.year - first.year) * 12 + date.month - first.month + (date.day > 1)
+    return max(months + 1, 1)
+
+
+class DecimalTerms(NamedTuple):
+    """Loan parameters as exact Decimals, per payment period."""
+
+    periods: int
+    rate: Decimal
+    principal: Decimal
+    # Scheduled payment, principal plus interest
+    payment: Decimal
+    addl_principal: Decimal
+    # One-off additional principal, by period
+    addl_principal_schedule: dict[int, Decimal]
+
+    @classmethod
+    def from_loan(cls, loan: LoanDetail) -> "DecimalTerms":
+        """Read the loan's float parameters through their decimal strings."""
+        periods = loan.years * loan.payments_year
+        rate = Decimal(str(loan.interest_rate)) / loan.payments_year
+        principal = Decimal(str(loan.principal))
+        if rate:
+            payment = principal * rate / (1 - (1 + rate) ** -periods)
+        else:
+            payment = principal / periods
+        schedule = {}
+        for date, value in loan.addl_principal_schedule.items():
+            period = payment_period(loan.start_date, date)
+            if payment_date(loan.start_date, period) != date:
+                raise ValueError(f"{date} is not a payment date")
+            schedule[period] = schedule.get(period, 0) - Decimal(str(value))
+        return cls(
+            periods=periods,
+            rate=rate,
+            principal=principal,
+            payment=payment,
+            addl_principal=-Decimal(str(loan.addl_principal)),
+            addl_principal_schedule=schedule,
         )
-        interest = data.Posting(
-            account=loan.account_interest_expense,
-            units=amount.Amount(number=interest_amount, currency=currency),
-            cost=None,
-            price=None,
-            flag=None,
-            meta=None,
+
+    def balance(self, period: int) -> Decimal:
+        """
+        Return the balance after a payment, in closed form.
+
+        B[k] = g**k * B[0] - (P + E) * (g**k - 1) / r - sum(X[j] * g**(k - j))
+        with g = 1 + r, constant extra principal E and one-off payments X[j].
+        The result is only meaningful until the loan is paid off, and is zero
+        or less afterwards.
+        """
+        growth = (1 + self.rate) ** period
+        annuity = (growth - 1) / self.rate if self.rate else Decimal(period)
+        balance = growth * self.principal - (self.payment + self.addl_principal) * annuity
+        for j, value in self.addl_principal_schedule.items():
+            if j <= period:
+                balance -= value * (1 + self.rate) ** (period - j)
+        return balance
+
+
+def schedule_payments(
+    loan: LoanDetail, start: int = 1, stop: int | None = None
+) -> Iterator[Payment]:
+    """
+    Yield the payments of a loan from period start up to, not including, stop.
+
+    Payments are computed one at a time with Decimals: balances are carried
+    at full precision and only the yielded amounts are rounded to cents. The
+    balance before start is computed in closed form, so a window of N
+    payments costs O(N) whatever its position in the term.
+    """
+    terms = DecimalTerms.from_loan(loan)
+    start = max(start, 1)
+    stop = terms.periods + 1 if stop is None else min(stop, terms.periods + 1)
+    balance = terms.balance(start - 1) if start > 1 else terms.principal
+    if balance <= PAYOFF_TOLERANCE:
+        return
+
+    reported_balance = balance.quantize(CENT)
+    for period in range(start, stop):
+        interest = balance * terms.rate
+        principal = terms.payment - interest
+        extra = terms.addl_principal + terms.addl_principal_schedule.get(period, 0)
+        if period == terms.periods or balance - principal - extra <= PAYOFF_TOLERANCE:
+            # The final payment only covers what is left
+            principal = min(principal, balance)
+            extra = balance - principal
+        balance -= principal + extra
+        # Report principal as the change in the rounded balance, so the
+        # reported payments add up to the loan amount to the cent.
+        paid = reported_balance - balance.quantize(CENT)
+        reported_balance -= paid
+        yield Payment(
+            period=period,
+            date=payment_date(loan.start_date, period),
+            principal=paid - extra.quantize(CENT),
+            interest=interest.quantize(CENT),
+            principal_addl=extra.quantize(CENT),
+            balance=reported_balance,
         )
-        escrow = data.Posting(
-            account=loan.account_escrow,
-            units=None,
-            cost=None,
-            price=None,
-            flag=None,
-            meta=None,
+        if balance <= PAYOFF_TOLERANCE:
+            return
+
+
+def write_beancount_payments(
+    payments: Iterable[Payment], loan: LoanDetail, file: TextIO | None = None
+) -> None:
+    """
+    Write loan payments as Beancount transactions, one at a time.
+
+    The text matches beancount's printer, without building the entries first.
+    """
+    file = file or sys.stdout
+    monthly_payment = Decimal(str(loan.monthly_payment)).quantize(CENT)
+    width = max(
+        len(loan.account_bank), len(loan.account_liability), len(loan.account_interest_expense)
+    )
+    for payment in payments:
+        postings = [
+            (loan.account_bank, str(monthly_payment)),
+            (loan.account_liability, str(payment.principal + payment.principal_addl)),
+            (loan.account_interest_expense, str(payment.interest)),
+        ]
+        number_width = max(len(number) for _, number in postings)
+        file.write(f'\n{payment.date} * "Mortgage payment"\n')
+        for account, number in postings:
+            file.write(f"  {account:<{width}}  {number:>{number_width}} {loan.currency}\n")
+        file.write(f"  {loan.account_escrow}\n")
+
+
+def amortization_table(loan: LoanDetail, start: int = 1, stop: int | None = None) -> "pd.DataFrame":
+    """
+    Return the payments from period start up to, not including, stop as a table.
+
+    The table is built from schedule_payments, so its amounts are the ones
+    written as Beancount transactions, negated for payments.
+    """
+    import pandas as pd
+
+    rows = []
+    principal_cum = Decimal(0)
+    for payment in schedule_payments(loan=loan, start=start, stop=stop):
+        principal_cum -= payment.principal + payment.principal_addl
+        rows.append(
+            {
+                "period": payment.period,
+                "date": pd.Timestamp(payment.date),
+                "payment": -float(payment.principal + payment.interest),
+                "principal": -float(payment.principal),
+                "interest": -float(payment.interest),
+                "principal_addl": -float(payment.principal_addl),
+                "monthly_payment": loan.monthly_payment,
+                "curr_balance": float(payment.balance),
+                "principal_cum": float(principal_cum),
+                "currency": loan.currency,
+            }
         )
-        fileloc = data.new_metadata("<build_transaction>", 0)
-        transaction = data.Transaction(
-            meta=fileloc,
+    columns = ["period", "date", "payment", "principal", "interest", "principal_addl"]
+    columns += ["monthly_payment", "curr_balance", "principal_cum", "currency"]
+    return pd.DataFrame(rows, columns=columns).set_index("period")
+
+
+def output_beancount_amortization_table(df: "pd.DataFrame", loan: LoanDetail) -> None:
+    """Output the amortization table as Beancount transactions."""
+    payments = (
+        Payment(
+            period=row.Index,
             date=row.date.date(),
-            flag=flags.FLAG_OKAY,
-            payee=None,
-            narration="Mortgage payment",
-            tags=data.EMPTY_SET,
-            links=data.EMPTY_SET,
-            postings=[payment, principle, interest, escrow],
+            principal=-Decimal(str(row.principal)).quantize(CENT),
+            interest=-Decimal(str(row.interest)).quantize(CENT),
+            principal_addl=-Decimal(str(row.principal_addl)).quantize(CENT),
+            balance=Decimal(str(row.curr_balance)).quantize(CENT),
         )
-        entries.append(transaction)
-    printer.print_entries(entries)
+        for row in df.itertuples()
+    )
+    write_beancount_payments(payments=payments, loan=loan)
@@ -0,0 +1,85 @@
+import hashlib
+import os
+from pathlib import Path
+
+import structlog
+
+logger = structlog.getLogger(__name__)
+
+# Default size bound of each on-disk cache
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_dir() -> Path:
+    """Return the per-user cache directory for copeland_ledger."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "copeland-ledger"
+
+
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class TextCache:
+    """
+    Content-addressed on-disk cache of text derived from files.
+
+    Entries are keyed by the SHA-256 of the source file, so renamed or copied
+    downloads still hit the cache and edited ones miss it. When the cache grows
+    past max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        # (path, size, mtime) -> digest, to avoid re-hashing unchanged files
+        self._digests: dict[tuple[Path, int, int], str] = {}
+
+    def key(self, path: Path) -> str:
+        """Return the cache key of a file."""
+        path = Path(path).resolve()
+        stat = os.stat(path)
+        file_key = (path, stat.st_size, stat.st_mtime_ns)
+        if file_key not in self._digests:
+            self._digests[file_key] = file_digest(path)
+        return self._digests[file_key]
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / f"{key}.txt"
+
+    def get(self, path: Path) -> str | None:
+        """Return the cached text for a file, or None on a miss."""
+        entry = self._entry(self.key(path))
+        try:
+            text = entry.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        # Refresh the mtime so eviction is least-recently-used
+        os.utime(entry)
+        return text
+
+    def put(self, path: Path, text: str) -> None:
+        """Store the text for a file and evict old entries if over budget."""
+        entry = self._entry(self.key(path))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for dir_entry in os.scandir(self.directory):
+            if dir_entry.name.endswith(".txt"):
+                stat = dir_entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, Path(dir_entry.path)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            logger.debug("Evicted cache entry", name=entry.name)
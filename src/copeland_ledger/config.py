@@ -1,6 +1,13 @@
 import datetime as dt
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
 
-from pydantic import BaseModel
+import yaml
+from pydantic import BaseModel, Field
 
 
 class PdfArchive(BaseModel):
@@ -44,5 +51,81 @@ class Loan(BaseModel):
 class Config(BaseModel):
     """Config for the ledger."""
 
-    accounts: list[Account]
+    accounts: list[Account] = Field(default_factory=list)
     loans: dict[str, Loan] | None = None
+
+
+@dataclass
+class LoadedConfig:
+    """A validated config file, with lookup tables over its accounts."""
+
+    path: Path
+    size: int
+    mtime_ns: int
+    # The YAML document as parsed, for sections validated elsewhere
+    data: dict[str, Any] = field(repr=False)
+    config: Config = field(repr=False)
+    accounts_by_org: dict[str, list[Account]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # A download only bundles accounts held at the same org, whose importers
+        # match its account IDs against the org's ACCTID suffixes.
+        self.accounts_by_org = {}
+        for account in self.config.accounts:
+            self.accounts_by_org.setdefault(account.org, []).append(account)
+
+    @property
+    def accounts(self) -> list[Account]:
+        return self.config.accounts
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+# Bumped whenever LoadedConfig or the models change, so old snapshots are ignored
+SNAPSHOT_VERSION = 3
+
+# Configs loaded by this process, by resolved path
+_loaded: dict[Path, LoadedConfig] = {}
+
+
+def load_config(path: str | Path, snapshot_dir: Path | None = None) -> LoadedConfig:
+    """
+    Load and validate a config file, reusing earlier loads while it is unchanged.
+
+    With snapshot_dir, the validated config is also pickled there so later
+    invocations skip YAML parsing and validation until the file changes.
+    """
+    path = Path(path).resolve()
+    stat = os.stat(path)
+    loaded = _loaded.get(path)
+    if loaded is not None and loaded.is_current(stat):
+        return loaded
+
+    snapshot = None
+    if snapshot_dir is not None:
+        name = hashlib.sha256(f"{SNAPSHOT_VERSION}:{path}".encode()).hexdigest()
+        snapshot = Path(snapshot_dir) / f"{name}.pickle"
+        try:
+            loaded = pickle.loads(snapshot.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            loaded = None
+        if loaded is not None and loaded.is_current(stat):
+            _loaded[path] = loaded
+            return loaded
+
+    data = yaml.safe_load(path.read_text())
+    loaded = LoadedConfig(
+        path=path,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        data=data,
+        config=Config.model_validate(data),
+    )
+    _loaded[path] = loaded
+    if snapshot is not None:
+        snapshot.parent.mkdir(parents=True, exist_ok=True)
+        tmp = snapshot.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(pickle.dumps(loaded))
+        os.replace(tmp, snapshot)
+    return loaded
@@ -0,0 +1,127 @@
+import datetime as dt
+import threading
+from collections.abc import Iterable, Iterator
+from decimal import Decimal
+
+from beancount.core import account as account_lib
+from beancount.core import data
+
+# Metadata key holding the OFX FITID of an imported entry
+FIT_ID_META = "fitid"
+
+EntryKey = tuple[dt.date, str, Decimal]
+# An account, and a FITID of a transaction posting to it or to one of its sub-accounts
+FitIdKey = tuple[str, str]
+
+
+def entry_keys(entry: data.Transaction) -> Iterator[EntryKey]:
+    """Yield the (date, account, amount) of every priced posting of an entry."""
+    for posting in entry.postings:
+        if posting.units is not None and isinstance(posting.units.number, Decimal):
+            yield (entry.date, posting.account, posting.units.number)
+
+
+def entry_key(entry: data.Transaction) -> EntryKey | None:
+    """Return the (date, account, amount) of the first priced posting of an entry."""
+    return next(entry_keys(entry), None)
+
+
+class EntryIndex:
+    """
+    Hashed index of ledger entries for constant-time duplicate lookups.
+
+    Entries carrying a FITID are indexed by it, per account: FITIDs are
+    only unique within an account, so each is keyed with every account the
+    entry posts to, and their parents (e.g. an investment account of its
+    per-ticker postings). Entries without one, e.g. entered by hand, are
+    indexed by the (date, account, amount) of each of their postings, so an
+    imported entry matches whichever leg is in its account.
+    """
+
+    def __init__(self, entries: Iterable[data.Directive] = ()):
+        self.fit_ids: dict[FitIdKey, data.Transaction] = {}
+        self.keys: dict[EntryKey, list[data.Transaction]] = {}
+        self.add(entries)
+
+    def add(self, entries: Iterable[data.Directive]) -> None:
+        """Index more entries."""
+        for entry in entries:
+            if not isinstance(entry, data.Transaction):
+                continue
+            if fit_id := (entry.meta or {}).get(FIT_ID_META):
+                for posting in entry.postings:
+                    for account in account_lib.parents(posting.account):
+                        self.fit_ids[(account, str(fit_id))] = entry
+            else:
+                for key in entry_keys(entry):
+                    self.keys.setdefault(key, []).append(entry)
+
+    def find_fit_id(
+        self, entry: data.Transaction, account: str | None = None
+    ) -> data.Transaction | None:
+        """
+        Return the indexed entry with the same FITID as the given one, if any.
+
+        The FITID is looked up in the given account, by default that of the
+        entry's first posting.
+        """
+        if (fit_id := (entry.meta or {}).get(FIT_ID_META)) and entry.postings:
+            account = account or entry.postings[0].account
+            return self.fit_ids.get((account, str(fit_id)))
+        return None
+
+    def find_duplicate(
+        self, entry: data.Transaction, used: set[int], account: str | None = None
+    ) -> data.Transaction | None:
+        """
+        Return the indexed entry the given one duplicates, if any.
+
+        Entries are matched by FITID first. An indexed entry without a FITID
+        can only be matched once per batch; used holds the ids of those
+        matched so far, so two identical new entries are not both swallowed
+        by one existing entry.
+        """
+        if match := self.find_fit_id(entry, account=account):
+            return match
+        if (key := entry_key(entry)) is None:
+            return None
+        for candidate in self.keys.get(key, ()):
+            if id(candidate) not in used:
+                used.add(id(candidate))
+                return candidate
+        return None
+
+
+class ExistingIndex:
+    """
+    EntryIndex of a list of existing entries that only grows, built once.
+
+    beangulp hands every importer the same list of existing entries, and
+    appends each file's entries to it once they are deduplicated. The index
+    is extended with the entries appended since the last call, and rebuilt
+    for another list, or when the entry at the end of the part already
+    indexed is no longer the one indexed there.
+    """
+
+    def __init__(self):
+        self._entries: list | None = None
+        self._count = 0
+        self._last: data.Directive | None = None
+        self._index = EntryIndex()
+        self._lock = threading.Lock()
+
+    def of(self, entries: list[data.Directive]) -> EntryIndex:
+        """Return the index of the entries, extending or rebuilding it as needed."""
+        with self._lock:
+            count = len(entries)
+            if (
+                entries is not self._entries
+                or count < self._count
+                or (self._count and entries[self._count - 1] is not self._last)
+            ):
+                self._index = EntryIndex(entries)
+            elif count > self._count:
+                self._index.add(entries[self._count :])
+            self._entries, self._count = entries, count
+            self._last = entries[-1] if entries else None
+            return self._index
@@ -1,49 +1,227 @@
+import functools
+import json
 import re
+from collections.abc import Iterable, Iterator
+from contextlib import closing
+from itertools import islice
 from pathlib import Path
 
 import beangulp
 import structlog
 from beangulp import mimetypes
-from pypdf import PdfReader
 
 from copeland_ledger import config
+from copeland_ledger.cache import TextCache
+from copeland_ledger.state import ImportState
+from copeland_ledger.timing import stage
 
 logger = structlog.get_logger(__file__)
 
 VALID_MIMETYPES = {"application/pdf"}
 
 
+@functools.cache
+def _literal_pattern(literal: str) -> re.Pattern:
+    return re.compile(re.escape(literal))
+
+
 def find_account_id_suffix_in_pdf(acctid_suffix: str, content: str) -> bool:
     """Search for an account ID suffix in the given content."""
-    if m := re.search(rf"\s*({acctid_suffix})\s*", content):
-        return acctid_suffix == m.group(1)
-    return False
+    return _literal_pattern(acctid_suffix).search(content) is not None
 
 
 def find_org_name_in_pdf(org: str, content: str) -> bool:
     """Search for the organization name in the given content."""
-    if m := re.search(rf"\s*({org})\s*", content):
-        return org == m.group(1)
-    return False
+    return _literal_pattern(org).search(content) is not None
+
+
+def iter_pdf_pages(path: Path, start: int = 0) -> Iterator[str]:
+    """Lazily extract text from a PDF file, one page at a time, from page start on."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for page in reader.pages[start:]:
+        with stage("extract_pdf_text", name=path.name) as timer:
+            text = page.extract_text()
+            timer.count(pages=1, bytes=len(text))
+        yield text
 
 
 def extract_pdf_text(path: Path) -> str:
     """Extract text from a PDF file."""
-    reader = PdfReader(path)
-    content = ""
-    for page in reader.pages:
-        content += page.extract_text()
-    return content
+    return "".join(iter_pdf_pages(path=path))
+
+
+def pdf_org_name(account: config.Account) -> str:
+    """Return the organization name printed on an account's PDF statements."""
+    return account.pdf_archive.org if account.pdf_archive else account.org
+
+
+class PdfAccountMatcher:
+    """
+    Match PDF text against many accounts' org names and ID suffixes at once.
+
+    Every org name and suffix is compiled into one escaped alternation regex,
+    tried longest first inside a lookahead so overlapping hits are all seen.
+    Text is scanned in a single pass however many accounts are configured.
+    """
+
+    def __init__(self, accounts: list[config.Account]):
+        self.accounts = accounts
+        self.orgs = {pdf_org_name(account) for account in accounts}
+        self.suffixes = {account.acctid_suffix for account in accounts}
+        literals = sorted(self.orgs | self.suffixes, key=lambda literal: (-len(literal), literal))
+        alternation = "|".join(re.escape(literal) for literal in literals if literal)
+        self.pattern = re.compile(f"(?=({alternation}))") if alternation else None
+        # A hit for a literal at some position is also a hit for every other
+        # literal that is a prefix of it, which the regex could not report.
+        self.prefixes = {
+            literal: {other for other in literals if other and literal.startswith(other)}
+            for literal in literals
+        }
+
+    def scan(self, content: str) -> tuple[set[str], set[str]]:
+        """Return the org names and account ID suffixes found in the content."""
+        hits: set[str] = set()
+        if self.pattern is not None:
+            for literal in {m.group(1) for m in self.pattern.finditer(content)}:
+                hits |= self.prefixes[literal]
+        return hits & self.orgs, hits & self.suffixes
+
+    def match(self, pages: Iterable[str]) -> list[config.Account]:
+        """
+        Return the accounts whose ID suffix and org name both appear in the pages.
+
+        Pages are consumed lazily. A statement belongs to one org, so matching
+        stops at the first page by which some account has matched and every
+        other account of the matched orgs has too: the rest of the document
+        is never extracted. An account of a matched org may first appear on a
+        later page, e.g. in a statement covering several accounts.
+        """
+        orgs_found: set[str] = set()
+        suffixes_found: set[str] = set()
+        matched: list[config.Account] = []
+        for page in pages:
+            orgs, suffixes = self.scan(page)
+            orgs_found |= orgs
+            suffixes_found |= suffixes
+            matched = [
+                account
+                for account in self.accounts
+                if account.acctid_suffix in suffixes_found and pdf_org_name(account) in orgs_found
+            ]
+            matched_orgs = {pdf_org_name(account) for account in matched}
+            if matched and all(
+                account in matched
+                for account in self.accounts
+                if pdf_org_name(account) in matched_orgs
+            ):
+                break
+        return matched
+
+
+class PdfIdentifier:
+    """
+    Identify PDFs for every configured account from a single text extraction.
+
+    Shared by all PdfArchivers: the first importer to ask about a file extracts
+    its text (or reads it from the on-disk cache) and checks every account
+    against it; the others reuse the result.
+    """
+
+    def __init__(
+        self,
+        accounts: list[config.Account],
+        cache: TextCache | None = None,
+        max_pages: int | None = None,
+        state: ImportState | None = None,
+    ):
+        self.accounts = accounts
+        self.matcher = PdfAccountMatcher(accounts=accounts)
+        self.cache = cache
+        # Only read this many pages of each PDF when identifying it
+        self.max_pages = max_pages
+        # Record of previous imports, to skip extracting PDFs archived before
+        self.state = state
+        self._matches: dict[tuple[Path, int, int], list[config.Account]] = {}
+
+    def _cached_pages(self, path: Path) -> tuple[list[str], bool]:
+        """Return the pages of a PDF read before, and whether they are all of them."""
+        if self.cache is None or (text := self.cache.get(path)) is None:
+            return [], False
+        try:
+            cached = json.loads(text)
+            return cached["pages"], cached["complete"]
+        except (ValueError, KeyError, TypeError):
+            return [], False
+
+    def pages(self, path: Path) -> Iterator[str]:
+        """
+        Lazily yield the text of a PDF's pages, from the cache when possible.
+
+        Whatever was read is cached when the generator is closed, with whether
+        it is the whole document, so matching that stops early still caches
+        its pages. Only pages past the cached ones are ever extracted.
+        """
+        pages, complete = self._cached_pages(path)
+        cached, was_complete = len(pages), complete
+        try:
+            yield from pages[:cached]
+            if complete:
+                return
+            for page in iter_pdf_pages(path=path, start=cached):
+                pages.append(page)
+                yield page
+            complete = True
+        finally:
+            if self.cache is not None and (len(pages) > cached or complete != was_complete):
+                self.cache.put(path, json.dumps({"pages": pages, "complete": complete}))
+
+    @staticmethod
+    def _key(path: Path) -> tuple[Path, int, int]:
+        path = path.resolve()
+        stat = path.stat()
+        return (path, stat.st_size, stat.st_mtime_ns)
+
+    def store(self, path: Path, accounts: list[config.Account]) -> None:
+        """Record accounts matched elsewhere, e.g. by a worker process."""
+        self._matches[self._key(path)] = accounts
+
+    def match(self, path: Path) -> list[config.Account]:
+        """Return every configured account the PDF belongs to."""
+        key = self._key(path)
+        if key not in self._matches:
+            self._matches[key] = self._previous_match(path) or self._match(path)
+        return self._matches[key]
+
+    def _previous_match(self, path: Path) -> list[config.Account]:
+        if self.state is None:
+            return []
+        imported = {imported.account for imported in self.state.imported_files(path)}
+        return [account for account in self.accounts if account.bean_account in imported]
+
+    def _match(self, path: Path) -> list[config.Account]:
+        # Closing the pages caches those read, wherever matching stopped
+        with closing(self.pages(path=path)) as pages:
+            return self.matcher.match(pages=islice(pages, self.max_pages))
 
 
 class PdfArchiver(beangulp.Importer):
     """A beangulp importer to archive PDF files only (no transactions are extracted)."""
 
-    def __init__(self, config: config.Account):
+    def __init__(
+        self,
+        config: config.Account,
+        identifier: PdfIdentifier | None = None,
+        max_pages: int | None = None,
+    ):
         self.bean_account = config.bean_account
         self.org = config.org
         self.acctid_suffix = config.acctid_suffix
         self.config = config
+        self.identifier = identifier
+        self.max_pages = max_pages
+        self.matcher = PdfAccountMatcher(accounts=[config])
         logger.debug(
             "Initialized PdfArchiver",
             bean_account=self.bean_account,
@@ -60,6 +238,12 @@ class PdfArchiver(beangulp.Importer):
         path = Path(filepath)
         return f"{self.org}_{self.acctid_suffix}-statement{path.suffix}"
 
+    def matched_accounts(self, filepath: str) -> list[config.Account]:
+        """Return every configured account the PDF belongs to, this one included."""
+        if self.identifier is not None:
+            return self.identifier.match(path=Path(filepath))
+        return [self.config]
+
     def identify(self, filepath: str) -> bool:
         """Return True if this importer matches a PDF file."""
         path = Path(filepath)
@@ -70,11 +254,12 @@ class PdfArchiver(beangulp.Importer):
         if mimetype not in VALID_MIMETYPES:
             return False
         # Check for the account ID suffix and organization name in the PDF content.
-        content = extract_pdf_text(path=path)
-        org = self.config.pdf_archive.org if self.config.pdf_archive else self.org
-        if find_account_id_suffix_in_pdf(
-            acctid_suffix=self.acctid_suffix, content=content
-        ) and find_org_name_in_pdf(org=org, content=content):
+        if self.identifier is not None:
+            matched = self.config in self.identifier.match(path=path)
+        else:
+            pages = islice(iter_pdf_pages(path=path), self.max_pages)
+            matched = bool(self.matcher.match(pages=pages))
+        if matched:
             logger.info(
                 "Identified PDF file",
                 filename=path.name,
@@ -1,14 +1,20 @@
 import datetime as dt
+import heapq
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
 import beangulp
 import structlog
 from beancount.core import amount, data, flags, position
 from beangulp import mimetypes
+from beangulp.extract import DUPLICATE
 
+from copeland_ledger.dedupe import FIT_ID_META, EntryIndex, ExistingIndex
 from copeland_ledger.models import InvestTransaction, InvestType, StatementType, TransactionType
-from copeland_ledger.qfx.extract import ofx_content_contains_account_id_suffix
-from copeland_ledger.qfx.load import load_statement
+from copeland_ledger.qfx.index import FILE_INDEX
+from copeland_ledger.state import ImportedFile, ImportState
+from copeland_ledger.suffixes import SuffixMap
+from copeland_ledger.timing import stage
 
 logger = structlog.get_logger(__file__)
 
@@ -93,29 +99,91 @@ def build_bean_invest_transactions(
     return entries
 
 
+def merge_entries(
+    streams: Iterable[Iterable[data.Directive]],
+) -> Iterator[data.Directive]:
+    """
+    Merge streams of entries, each in entry_sortkey order, into one sorted stream.
+
+    Only the next entry of each stream is held, in a heap, so entries of many
+    statements or files are merged in O(n log k) without collecting them first.
+    """
+    return heapq.merge(*streams, key=data.entry_sortkey)
+
+
 class QfxImporter(beangulp.Importer):
     """A beangulp importer for QFX files."""
 
-    def __init__(self, org: str, acctid_suffix: str, bean_account: str):
+    def __init__(
+        self,
+        org: str,
+        acctid_suffix: str,
+        bean_account: str,
+        bundle_accounts: dict[str, str] | None = None,
+        state: ImportState | None = None,
+        existing_index: ExistingIndex | None = None,
+    ):
         self.bean_account = bean_account
         self.org = org
         self.acctid_suffix = acctid_suffix
+        # Account ID suffix to beancount account, for every statement this importer
+        # extracts when a download bundles several accounts (own account first).
+        self.accounts = SuffixMap([(acctid_suffix, bean_account), *(bundle_accounts or {}).items()])
         logger.debug(
             "Initialized QfxImporter",
             bean_account=bean_account,
             org=org,
             acctid_suffix=acctid_suffix,
         )
-        self.statement: StatementType | None = None
+        # Record of previous imports, to skip files and transactions already handled
+        self.state = state
+        # Index of beangulp's existing entries, shared by the importers of a run
+        self.existing_index = existing_index or ExistingIndex()
 
     def account(self, filepath):
         """Return the account against which we post transactions."""
         return self.bean_account
 
+    def imported(self, filepath: str) -> ImportedFile | None:
+        """Return the previous import of the file into this account, if it is skipped."""
+        if self.state is None:
+            return None
+        return self.state.imported_file(filepath, self.bean_account)
+
+    def record(self, filepath: str) -> None:
+        """
+        Record the file's statements and FITIDs as imported.
+
+        Called once their entries are in the ledger, never by identify or
+        extract: a file recorded as imported is skipped from then on.
+        """
+        if self.state is None:
+            return
+        for bean_account, statement in self.statements(filepath).items():
+            if statement.transactions:
+                self.state.record(
+                    filepath,
+                    account=bean_account,
+                    date_start=statement.transactions[0].date_posted.date(),
+                    date_end=statement.transactions[-1].date_posted.date(),
+                    fit_ids=statement.transactions.column("fit_id").tolist(),
+                )
+
+    def statements(self, filepath: str) -> dict[str, StatementType]:
+        """Map the beancount account of every statement in the file this importer extracts."""
+        # Parse results live in the shared file index, not on the importer, so
+        # one instance can handle any number of files, from any thread.
+        statements = FILE_INDEX.get(filepath).statement_list.dispatch(suffixes=self.accounts)
+        return {self.accounts[suffix]: statement for suffix, statement in statements.items()}
+
     def date(self, filepath: str) -> dt.date | None:
         """Return the date of the last transaction of the statement."""
-        if self.statement:
-            return self.statement.transactions[-1].date_posted.date()
+        if imported := self.imported(filepath):
+            return imported.date_end
+        statement = self.statements(filepath).get(self.bean_account)
+        if statement and statement.transactions:
+            return statement.transactions[-1].date_posted.date()
+        return None
 
     def filename(self, filepath: str) -> str:
         """Return the archival filename for the given file."""
@@ -130,11 +198,22 @@ class QfxImporter(beangulp.Importer):
         if mimetype not in VALID_MIMETYPES:
             return False
 
-        content = Path(filepath).read_text()
-        if ofx_content_contains_account_id_suffix(
-            ofx_content=content, account_id_suffix=self.acctid_suffix
-        ):
-            self.statement = load_statement(path=filepath, acctid_suffix=self.acctid_suffix)
+        # The shared index reads each file once, whichever importer asks first.
+        qfx_file = FILE_INDEX.get(filepath)
+        # The first of the file's account IDs configured at this org identifies it,
+        # skipping unconfigured ones, so exactly one importer claims a bundle.
+        if qfx_file.account_suffix(self.accounts) == self.acctid_suffix:
+            if self.imported(filepath):
+                # Already imported: skip parsing, there is nothing new to extract.
+                logger.info(
+                    "Identified imported QFX file",
+                    filename=Path(filepath).name,
+                    acctid_suffix=self.acctid_suffix,
+                    ofx_org=self.org,
+                )
+                return True
+            # One parse yields the statements of every account bundled in the file.
+            qfx_file.statement_list  # noqa: B018 - parse now, so errors surface here
             logger.info(
                 "Identified QFX file",
                 filename=Path(filepath).name,
@@ -143,19 +222,22 @@ class QfxImporter(beangulp.Importer):
             )
             return True
 
-    def build_bean_transactions(self, transaction: TransactionType) -> list[data.Transaction]:
+    def build_bean_transactions(
+        self, transaction: TransactionType, bean_account: str | None = None
+    ) -> list[data.Transaction]:
         """Build a beancount transaction from an OFX Transaction."""
+        bean_account = bean_account or self.bean_account
 
         if isinstance(transaction, InvestTransaction):
             return build_bean_invest_transactions(
-                transaction=transaction, bean_account=self.bean_account
+                transaction=transaction, bean_account=bean_account
             )
 
         # Create a single posting for it; the user will have to manually
         # categorize the other side.
         units = amount.Amount(number=transaction.amount, currency=transaction.currency)
         posting = data.Posting(
-            account=self.bean_account,
+            account=bean_account,
             units=units,
             cost=None,
             price=None,
@@ -180,12 +262,74 @@ class QfxImporter(beangulp.Importer):
     def extract(self, filepath: str, existing: data.Directive) -> data.Directives:
         """Extract a list of partially complete transactions from the file."""
         logger.debug("Extracting transactions", filepath=filepath)
+        with stage("build_entries", name=Path(filepath).name) as timer:
+            # Drop transactions already in the ledger, by FITID or (date, account, amount)
+            index = self.existing_index.of(existing)
+            entries = list(self.iter_entries(filepath=filepath, index=index))
+            timer.count(rows=len(entries))
+        return entries
+
+    def iter_entries(self, filepath: str, index: EntryIndex) -> Iterator[data.Transaction]:
+        """Yield the entries not in the index yet, in entry_sortkey order, as they are built."""
+        # Statements are sorted by date, so merging their entries keeps the file sorted.
+        yield from merge_entries(self.account_entries(filepath, index=index).values())
+
+    def account_entries(
+        self, filepath: str, index: EntryIndex
+    ) -> dict[str, Iterator[data.Transaction]]:
+        """Map the beancount account of each statement to a stream of its new entries."""
+        if self.imported(filepath):
+            return {}
+        # A hand entry absorbs one import, whichever of the file's statements it is in
+        used: set[int] = set()
+        streams = {}
+        lineno = 0
+        for bean_account, statement in self.statements(filepath).items():
+            streams[bean_account] = self.iter_statement_entries(
+                filepath=filepath,
+                bean_account=bean_account,
+                statement=statement,
+                index=index,
+                used=used,
+                lineno=lineno,
+            )
+            lineno += len(statement.transactions)
+        return streams
+
+    def iter_statement_entries(
+        self,
+        filepath: str,
+        bean_account: str,
+        statement: StatementType,
+        index: EntryIndex,
+        used: set[int],
+        lineno: int,
+    ) -> Iterator[data.Transaction]:
+        """Yield the new entries of one statement, in date order."""
+        imported_fit_ids = self.state.fit_ids(bean_account) if self.state else frozenset()
+        for i, transaction in enumerate(statement.transactions, start=lineno):
+            if transaction.fit_id in imported_fit_ids:
+                continue
+            entries = [
+                entry._replace(
+                    meta=data.new_metadata(
+                        filename=filepath, lineno=i, kvlist={FIT_ID_META: transaction.fit_id}
+                    )
+                )
+                for entry in self.build_bean_transactions(transaction, bean_account=bean_account)
+            ]
+            if index.find_duplicate(entries[0], used, account=bean_account) is None:
+                yield from entries
 
-        stmt_entries = []
-        transactions = self.statement.transactions if self.statement else []
-        for i, transaction in enumerate(transactions):
-            for entry in self.build_bean_transactions(transaction):
-                entry = entry._replace(meta=data.new_metadata(filename=filepath, lineno=i))
-                stmt_entries.append(entry)
+    def deduplicate(self, entries: data.Entries, existing: data.Entries) -> None:
+        """
+        Mark entries already extracted from other files in this run, by FITID.
 
-        return data.sorted(stmt_entries)
+        Matches by (date, account, amount) were settled by extract, which may
+        have kept an entry on purpose, so they are not made again here.
+        """
+        index = self.existing_index.of(existing)
+        for entry in entries:
+            if isinstance(entry, data.Transaction):
+                if match := index.find_fit_id(entry):
+                    entry.meta[DUPLICATE] = match
@@ -0,0 +1,225 @@
+"""
+Load a Beancount ledger once and reuse it until one of its files changes.
+
+load_ledger() snapshots the parsed entries, with indexes by account and
+date and the dedupe index importers query, so later invocations skip
+beancount's loader. A snapshot records the size, mtime and SHA-256 of every
+file the ledger includes, and the ledger files in the directories they sit
+in, so files picked up by an include glob are noticed too. A file whose
+mtime moved but whose content hashes the same, e.g. one touched by a sync
+tool, doesn't invalidate the snapshot.
+
+beancount's loader keeps a pickle cache of its own next to the ledger, but
+only for loads slower than a second, keyed on the mtimes of the files it
+read: it misses files added to an include glob and reloads whenever a file
+is merely touched. It also leaves every caller to rebuild its lookup tables.
+"""
+
+import datetime as dt
+import hashlib
+import os
+import pickle
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import structlog
+from beancount.core import data
+
+from copeland_ledger import timing
+from copeland_ledger.cache import file_digest
+from copeland_ledger.dedupe import EntryIndex
+
+logger = structlog.getLogger(__name__)
+
+
+@dataclass
+class FileStamp:
+    """Size, mtime and content hash of a file the ledger was loaded from."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    digest: str
+
+    @classmethod
+    def of(cls, path: str) -> "FileStamp":
+        stat = os.stat(path)
+        return cls(
+            path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=file_digest(path)
+        )
+
+    def is_current(self) -> bool:
+        """Return whether the file is unchanged, only hashing it when its mtime moved."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        if stat.st_size != self.size:
+            return False
+        if stat.st_mtime_ns == self.mtime_ns:
+            return True
+        if file_digest(self.path) != self.digest:
+            return False
+        # Same content; remember the new mtime to skip hashing next time
+        self.mtime_ns = stat.st_mtime_ns
+        return True
+
+
+@dataclass
+class DirectoryStamp:
+    """Ledger files in a directory holding included files, to notice files added to it."""
+
+    path: str
+    mtime_ns: int
+    # File extensions of the included files, e.g. .beancount
+    suffixes: frozenset[str]
+    names: frozenset[str]
+
+    @classmethod
+    def of(cls, path: str, suffixes: frozenset[str]) -> "DirectoryStamp":
+        mtime_ns = os.stat(path).st_mtime_ns
+        return cls(
+            path=path, mtime_ns=mtime_ns, suffixes=suffixes, names=cls.ledger_files(path, suffixes)
+        )
+
+    @staticmethod
+    def ledger_files(path: str, suffixes: frozenset[str]) -> frozenset[str]:
+        return frozenset(name for name in os.listdir(path) if os.path.splitext(name)[1] in suffixes)
+
+    def is_current(self) -> bool:
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime_ns == self.mtime_ns:
+            return True
+        # Other files come and go, e.g. an editor's temporary files
+        if self.ledger_files(self.path, self.suffixes) != self.names:
+            return False
+        self.mtime_ns = mtime_ns
+        return True
+
+
+@dataclass
+class Ledger:
+    """A loaded ledger, with lookup tables over its entries."""
+
+    path: Path
+    entries: data.Directives = field(repr=False)
+    errors: list = field(repr=False)
+    options_map: dict[str, Any] = field(repr=False)
+    files: list[FileStamp] = field(repr=False)
+    directories: list[DirectoryStamp] = field(repr=False)
+    # Entries per account, in date order: transactions by their postings'
+    # accounts, other directives such as balances by their own account
+    by_account: dict[str, list[data.Directive]] = field(init=False, repr=False)
+    # Transactions by FITID per account, and by (date, account, amount)
+    index: EntryIndex = field(init=False, repr=False)
+    dates: list[int] = field(init=False, repr=False)
+    account_dates: dict[str, list[int]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.by_account = {}
+        for entry in self.entries:
+            if isinstance(entry, data.Transaction):
+                accounts = dict.fromkeys(posting.account for posting in entry.postings)
+            elif account := getattr(entry, "account", None):
+                accounts = (account,)
+            else:
+                continue
+            for account in accounts:
+                self.by_account.setdefault(account, []).append(entry)
+        self.index = EntryIndex(self.entries)
+        self.dates = [entry.date.toordinal() for entry in self.entries]
+        self.account_dates = {
+            account: [entry.date.toordinal() for entry in entries]
+            for account, entries in self.by_account.items()
+        }
+
+    def between(
+        self, start: dt.date, end: dt.date, account: str | None = None
+    ) -> list[data.Directive]:
+        """Return the entries dated from start up to but excluding end, of one account or all."""
+        if account is None:
+            entries, dates = self.entries, self.dates
+        else:
+            entries, dates = self.by_account.get(account, []), self.account_dates.get(account, [])
+        lo = bisect_left(dates, start.toordinal())
+        hi = bisect_left(dates, end.toordinal(), lo)
+        return entries[lo:hi]
+
+    def stamps(self) -> list[FileStamp | DirectoryStamp]:
+        return [*self.files, *self.directories]
+
+    def is_current(self) -> bool:
+        return all(stamp.is_current() for stamp in self.stamps())
+
+
+# Bumped whenever Ledger or its indexes change, so old snapshots are ignored
+SNAPSHOT_VERSION = 3
+
+# Ledgers loaded by this process, by resolved path
+_loaded: dict[Path, Ledger] = {}
+
+
+def _save(ledger: Ledger, snapshot: Path) -> None:
+    snapshot.parent.mkdir(parents=True, exist_ok=True)
+    tmp = snapshot.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(pickle.dumps(ledger, protocol=pickle.HIGHEST_PROTOCOL))
+    os.replace(tmp, snapshot)
+
+
+def load_ledger(path: str | Path, snapshot_dir: Path | None = None) -> Ledger:
+    """
+    Load a ledger with beancount's loader, reusing earlier loads while its files are unchanged.
+
+    With snapshot_dir, the loaded ledger is also pickled there so later
+    invocations skip parsing, booking and validation until a file changes.
+    """
+    path = Path(path).resolve()
+    loaded = _loaded.get(path)
+    if loaded is not None and loaded.is_current():
+        return loaded
+
+    snapshot = None
+    if snapshot_dir is not None:
+        name = hashlib.sha256(f"{SNAPSHOT_VERSION}:{path}".encode()).hexdigest()
+        snapshot = Path(snapshot_dir) / f"{name}.pickle"
+        try:
+            loaded = pickle.loads(snapshot.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            loaded = None
+        if loaded is not None:
+            mtimes = [stamp.mtime_ns for stamp in loaded.stamps()]
+            if loaded.is_current():
+                _loaded[path] = loaded
+                if mtimes != [stamp.mtime_ns for stamp in loaded.stamps()]:
+                    # Files were touched but are unchanged; save their new mtimes
+                    _save(loaded, snapshot)
+                return loaded
+
+    from beancount import loader
+
+    with timing.stage("load_ledger", name=path.name) as s:
+        entries, errors, options_map = loader.load_file(str(path))
+        filenames = options_map["include"]
+        suffixes = frozenset(os.path.splitext(filename)[1] for filename in filenames)
+        loaded = Ledger(
+            path=path,
+            entries=entries,
+            errors=errors,
+            options_map=options_map,
+            files=[FileStamp.of(filename) for filename in filenames],
+            directories=[
+                DirectoryStamp.of(directory, suffixes)
+                for directory in sorted({os.path.dirname(filename) for filename in filenames})
+            ],
+        )
+        s.count(files=len(filenames), entries=len(entries))
+    logger.debug("Loaded ledger", name=path.name, files=len(filenames), entries=len(entries))
+    _loaded[path] = loaded
+    if snapshot is not None:
+        _save(loaded, snapshot)
+    return loaded
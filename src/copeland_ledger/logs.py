@@ -0,0 +1,48 @@
+"""
+Logging configuration for the command line tools, and cheap debug logging.
+
+Module loggers are structlog loggers. Until configure_logging() is called
+structlog's defaults apply, which render every event, debug included.
+"""
+
+import logging
+import sys
+from collections.abc import Callable
+from typing import Any
+
+import structlog
+
+LEVELS = ("debug", "info", "warning", "error")
+
+
+def _stderr_logger(*args) -> structlog.PrintLogger:
+    # Resolve sys.stderr per logger, so a swapped stream (e.g. by click's
+    # CliRunner) is honoured and never written to after it is closed.
+    return structlog.PrintLogger(file=sys.stderr)
+
+
+def configure_logging(level: int | str = logging.INFO) -> None:
+    """
+    Log events at or above the given level to stderr.
+
+    Events below the level are dropped by the bound logger itself, before any
+    processor or renderer runs. Logging to stderr keeps events out of the
+    entries and tables the commands write to stdout.
+    """
+    if isinstance(level, str):
+        level = logging.getLevelNamesMapping()[level.upper()]
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        logger_factory=_stderr_logger,
+    )
+
+
+def lazy_debug(logger, event: str, **fields: Callable[[], Any]) -> None:
+    """
+    Log a debug event whose fields are only computed when debug is enabled.
+
+    Each field is given as a callable returning its value, e.g.
+    ``lazy_debug(logger, "Loaded statement", statement=statement.summary)``.
+    """
+    if logger.is_enabled_for(logging.DEBUG):
+        logger.debug(event, **{name: value() for name, value in fields.items()})
@@ -1,9 +1,18 @@
 import datetime as dt
+from collections.abc import Iterable, Iterator, Mapping, Sequence
 from decimal import Decimal
 from enum import StrEnum
+from functools import cache, partial
+from typing import TYPE_CHECKING, Any, get_args
 
-import pandas as pd
-from pydantic import BaseModel, Field
+import numpy as np
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, TypeAdapter
+from pydantic_core import core_schema
+
+from copeland_ledger.suffixes import SuffixMap
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class Transaction(BaseModel):
@@ -17,16 +26,160 @@ class Transaction(BaseModel):
     currency: str
 
 
+@cache
+def _column_adapter(model: type[BaseModel], name: str) -> TypeAdapter:
+    return TypeAdapter(list[model.model_fields[name].annotation])
+
+
+def _object_array(values: Sequence) -> np.ndarray:
+    # Assign into an empty array so strings and tuples stay Python objects
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class TransactionBatch[T: Transaction]:
+    """
+    Columnar batch of transactions.
+
+    Each field is stored as a NumPy object array, so a statement costs one
+    pointer per value instead of one pydantic model per row. Columns are
+    validated whole, and rows are built, without validation, only when
+    indexed or iterated.
+    """
+
+    __slots__ = ("model", "columns")
+
+    def __init__(self, model: type[T], columns: dict[str, np.ndarray]):
+        self.model = model
+        self.columns = columns
+
+    @classmethod
+    def from_columns(
+        cls, model: type[T], columns: Mapping[str, Sequence], validate: bool = True
+    ) -> "TransactionBatch[T]":
+        """Create a batch from a sequence of values per field."""
+        size = len(next(iter(columns.values()), ()))
+        arrays = {}
+        for name, field in model.model_fields.items():
+            if name in columns:
+                values = columns[name]
+                if validate:
+                    values = _column_adapter(model, name).validate_python(values)
+            elif field.is_required():
+                raise ValueError(f"Missing {model.__name__} column {name}")
+            else:
+                values = [field.get_default(call_default_factory=True)] * size
+            if len(values) != size:
+                raise ValueError(f"Column {name} has {len(values)} values, expected {size}")
+            arrays[name] = _object_array(values)
+        return cls(model=model, columns=arrays)
+
+    @classmethod
+    def from_records(
+        cls, model: type[T], records: Sequence[Mapping[str, Any]]
+    ) -> "TransactionBatch[T]":
+        """Create a batch from a sequence of field name to value mappings."""
+        columns = {
+            name: [record[name] for record in records]
+            for name in model.model_fields
+            if all(name in record for record in records)
+        }
+        return cls.from_columns(model=model, columns=columns)
+
+    @classmethod
+    def validate(cls, model: type[T], value: Any) -> "TransactionBatch[T]":
+        """Coerce a batch, or a list of models or mappings, to a batch of the model."""
+        if isinstance(value, TransactionBatch):
+            if not issubclass(value.model, model):
+                raise ValueError(f"Expected a batch of {model.__name__}")
+            return value
+        if not isinstance(value, Sequence) or isinstance(value, str):
+            raise ValueError("Expected a sequence of transactions")
+        if all(isinstance(row, model) for row in value):
+            # Already validated, only transpose
+            columns = {name: [getattr(row, name) for row in value] for name in model.model_fields}
+            return cls.from_columns(model=model, columns=columns, validate=False)
+        return cls.from_records(model=model, records=value)
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        (model,) = get_args(source) or (Transaction,)
+        return core_schema.no_info_plain_validator_function(
+            partial(cls.validate, model),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda batch: [row.model_dump() for row in batch]
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __iter__(self) -> Iterator[T]:
+        names = list(self.columns)
+        for values in zip(*self.columns.values(), strict=True):
+            yield self.model.model_construct(**dict(zip(names, values, strict=True)))
+
+    def __getitem__(self, key: int | slice) -> "T | TransactionBatch[T]":
+        if isinstance(key, slice):
+            columns = {name: column[key] for name, column in self.columns.items()}
+            return TransactionBatch(model=self.model, columns=columns)
+        return self.model.model_construct(
+            **{name: column[key] for name, column in self.columns.items()}
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TransactionBatch):
+            return NotImplemented
+        return (
+            self.model is other.model
+            and len(self) == len(other)
+            and all(
+                np.array_equal(column, other.columns[name]) for name, column in self.columns.items()
+            )
+        )
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TransactionBatch({self.model.__name__}, {len(self)} rows)"
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the values of a single field."""
+        return self.columns[name]
+
+    def sorted_by(self, name: str) -> "TransactionBatch[T]":
+        """Return a copy of the batch stably sorted by a field."""
+        order = np.argsort(self.columns[name], kind="stable")
+        columns = {column_name: column[order] for column_name, column in self.columns.items()}
+        return TransactionBatch(model=self.model, columns=columns)
+
+
 class Statement(BaseModel):
     """Simple representation of a statement."""
 
     acct_id: str
     currency: str
-    transactions: list[Transaction] = Field(repr=False)
+    transactions: TransactionBatch[Transaction] = Field(repr=False)
 
-    def as_dataframe(self) -> pd.DataFrame:
-        """Return the statement as a pandas DataFrame."""
-        return pd.DataFrame.from_records([trans.model_dump() for trans in self.transactions])
+    def as_dataframe(self) -> "pd.DataFrame":
+        """Return the statement as a pandas DataFrame, sharing the transaction columns."""
+        import pandas as pd
+
+        return pd.DataFrame(self.transactions.columns, copy=False)
+
+    def summary(self) -> dict[str, Any]:
+        """Return a fixed-size description of the statement, e.g. for logging."""
+        dates = self.transactions.column("date_posted")
+        return {
+            "acctid_suffix": self.acct_id[-4:],
+            "currency": self.currency,
+            "transactions": len(self.transactions),
+            "date_start": min(dates) if len(dates) else None,
+            "date_end": max(dates) if len(dates) else None,
+        }
 
 
 class StatementList(BaseModel):
@@ -36,9 +189,23 @@ class StatementList(BaseModel):
 
     def get_by_acctid_suffix(self, suffix: str) -> Statement | None:
         """Get a Statement by account ID suffix."""
+        return self.dispatch([suffix]).get(suffix)
+
+    def dispatch(self, suffixes: Iterable[str]) -> "dict[str, Statement | InvestStatement]":
+        """
+        Map each account ID suffix to its statement, skipping unmatched suffixes.
+
+        A statement goes to the longest suffix its account ID ends with, so
+        overlapping suffixes such as "111" and "1111" never both claim it.
+        """
+        if not isinstance(suffixes, SuffixMap):
+            suffixes = SuffixMap((suffix, suffix) for suffix in suffixes)
+        matched = {}
         for statement in self.statements:
-            if str(statement.acct_id).endswith(suffix):
-                return statement
+            suffix = suffixes.longest(str(statement.acct_id))
+            if suffix is not None:
+                matched.setdefault(suffix, statement)
+        return {suffix: matched[suffix] for suffix in suffixes if suffix in matched}
 
 
 class Security(BaseModel):
@@ -78,7 +245,10 @@ class InvestStatement(Statement):
     date: dt.datetime
     broker: str
     securities: dict[int, Security] = Field(repr=False)
-    transactions: list[InvestTransaction] = Field(repr=False)
+    transactions: TransactionBatch[InvestTransaction] = Field(repr=False)
+
+    def summary(self) -> dict[str, Any]:
+        return super().summary() | {"broker": self.broker, "securities": len(self.securities)}
 
 
 StatementType = Statement | InvestStatement
@@ -0,0 +1,125 @@
+import os
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import structlog
+from beangulp import mimetypes, utils
+from beangulp.identify import FILE_TOO_LARGE_THRESHOLD
+
+from copeland_ledger import config, timing
+from copeland_ledger.cache import TextCache
+from copeland_ledger.importers import pdf_archive, qfx
+from copeland_ledger.qfx.index import FILE_INDEX, QfxFile, QfxFileIndex
+from copeland_ledger.suffixes import SuffixMap
+
+logger = structlog.getLogger(__name__)
+
+# Per-worker state, set once by _init_worker instead of pickled with every task
+_suffixes: SuffixMap = SuffixMap()
+_identifier: pdf_archive.PdfIdentifier | None = None
+
+
+def _init_worker(
+    accounts: list[config.Account],
+    cache_directory: Path | None,
+    max_pages: int | None,
+    timings: bool,
+) -> None:
+    global _suffixes, _identifier
+    timing.enable(timings)
+    _suffixes = SuffixMap((account.acctid_suffix, account) for account in accounts)
+    cache = TextCache(directory=cache_directory) if cache_directory else None
+    _identifier = pdf_archive.PdfIdentifier(accounts=accounts, cache=cache, max_pages=max_pages)
+
+
+def index_qfx_file(filepath: str) -> QfxFile | None:
+    """Index an OFX file and parse it if it belongs to a configured account."""
+    try:
+        qfx_file = QfxFileIndex().get(filepath)
+        if qfx_file.account_suffix(_suffixes) is not None:
+            qfx_file.statement_list  # noqa: B018 - parse in the worker
+        return qfx_file
+    except Exception as e:
+        # Leave the file to the serial pass, which reports the error per file.
+        logger.warning("Error prefetching OFX file", error=str(e), name=Path(filepath).name)
+        return None
+
+
+def match_pdf_file(filepath: str) -> list[int] | None:
+    """Return the indexes of the configured accounts a PDF belongs to."""
+    try:
+        matched = _identifier.match(path=Path(filepath))
+        return [_identifier.accounts.index(account) for account in matched]
+    except Exception as e:
+        logger.warning("Error prefetching PDF file", error=str(e), name=Path(filepath).name)
+        return None
+
+
+def _with_timings[R](
+    task: Callable[[str], R], filepath: str
+) -> tuple[R, dict[str, timing.StageTotals]]:
+    """Run a task, returning the stage timings it recorded in this worker with its result."""
+    timing.reset()
+    return task(filepath), dict(timing.TOTALS)
+
+
+class Prefetcher:
+    """
+    Parse downloads on a process pool ahead of beangulp's serial walk.
+
+    OFX parsing and PDF text extraction are CPU-bound pure Python, so they are
+    fanned out to worker processes. The compact results are stored, in file
+    order, in the shared OFX index and PDF identifier that the importers
+    consult, and beangulp then identifies and extracts from warm caches.
+    """
+
+    def __init__(
+        self,
+        accounts: list[config.Account],
+        pdf_identifier: pdf_archive.PdfIdentifier,
+        jobs: int,
+    ):
+        self.accounts = accounts
+        self.pdf_identifier = pdf_identifier
+        self.jobs = jobs
+
+    def __call__(self, src: Sequence[str]) -> None:
+        qfx_files: list[str] = []
+        pdf_files: list[str] = []
+        for filepath in utils.walk(src):
+            if os.path.getsize(filepath) > FILE_TOO_LARGE_THRESHOLD:
+                continue
+            mimetype, _ = mimetypes.guess_type(filepath, strict=False)
+            if mimetype in qfx.VALID_MIMETYPES:
+                qfx_files.append(filepath)
+            elif mimetype in pdf_archive.VALID_MIMETYPES and filepath.endswith(".pdf"):
+                pdf_files.append(filepath)
+        if not qfx_files and not pdf_files:
+            return
+
+        cache = self.pdf_identifier.cache
+        with ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_worker,
+            initargs=(
+                self.accounts,
+                cache.directory if cache else None,
+                self.pdf_identifier.max_pages,
+                timing.is_enabled(),
+            ),
+        ) as executor:
+            # Submit everything up front; map() yields results in input order.
+            qfx_results = executor.map(partial(_with_timings, index_qfx_file), qfx_files)
+            pdf_results = executor.map(partial(_with_timings, match_pdf_file), pdf_files)
+            for qfx_file, totals in qfx_results:
+                timing.merge(totals)
+                if qfx_file is not None:
+                    FILE_INDEX.add(qfx_file)
+            for filepath, (indexes, totals) in zip(pdf_files, pdf_results, strict=True):
+                timing.merge(totals)
+                if indexes is not None:
+                    accounts = [self.pdf_identifier.accounts[i] for i in indexes]
+                    self.pdf_identifier.store(path=Path(filepath), accounts=accounts)
+        logger.debug("Prefetched downloads", qfx=len(qfx_files), pdf=len(pdf_files))
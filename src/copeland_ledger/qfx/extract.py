@@ -1,15 +1,22 @@
+import mmap
+import os
 import re
 import warnings
+from collections import Counter
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 from xml.etree import ElementTree as ET
 
 import structlog
-from ofxtools.models.base import Aggregate
-from ofxtools.Parser import OFXTree
-from ofxtools.Types import OFXTypeError, OFXTypeWarning
+
+from copeland_ledger.timing import stage
+
+if TYPE_CHECKING:
+    from ofxtools.models.base import Aggregate
 
 logger = structlog.get_logger(__file__)
-warnings.filterwarnings("ignore", category=OFXTypeWarning)
 
 
 ACCOUNT_ID_RE = re.compile(r"ACCTID>(?P<account_id>[\w\-|]+)")
@@ -28,36 +35,136 @@ def ofx_content_contains_account_id_suffix(ofx_content: str, account_id_suffix:
     return False
 
 
-def parse_ofx(path: Path) -> Aggregate:
+# The same, for searching the raw bytes of a file without decoding it
+ACCOUNT_ID_BYTES_RE = re.compile(rb"ACCTID>(?P<account_id>[\w\-|]+)")
+
+# Leading region of a file scanned for account IDs when identifying it
+HEADER_BYTES = 8 * 1024
+
+
+def scan_account_ids(path: Path, limit: int | None = None) -> tuple[list[str], bool]:
+    """
+    Return the account IDs in the first limit bytes of an OFX file, in document
+    order, and whether those bytes were the whole file.
+
+    The file is memory-mapped and searched as bytes, so only the pages scanned
+    are read and nothing is decoded. An ID that may be cut off by the limit is
+    left out.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [], True
+        end = size if limit is None else min(limit, size)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            account_ids = [
+                match.group("account_id").decode("ascii")
+                for match in ACCOUNT_ID_BYTES_RE.finditer(content, 0, end)
+                if match.end() < end or end == size
+            ]
+    return account_ids, end == size
+
+
+def parse_ofx(path: Path) -> "Aggregate":
     """Parse an OFX file and return an OFX object."""
+    # ofxtools loads its whole model hierarchy on import, so only do so here
+    from ofxtools.Parser import OFXTree
+    from ofxtools.Types import OFXTypeError, OFXTypeWarning
 
+    warnings.filterwarnings("ignore", category=OFXTypeWarning)
     ofx_tree = OFXTree()
-    ofx_tree.parse(path)
+    with stage("parse", name=path.name) as timer:
+        ofx_tree.parse(path)
+        timer.count(bytes=os.path.getsize(path))
+    root = ofx_tree._root
+    institution = institution_key(root_element=root)
+    # Institutions already known to need fixes get them before the first
+    # conversion, instead of paying for a failed one.
+    known = KNOWN_QUIRKS.get(institution, frozenset())
+    if known:
+        with stage("fix", name=path.name):
+            apply_quirks(root_element=root, names=known)
     try:
-        ofx = ofx_tree.convert()
+        with stage("convert", name=path.name):
+            ofx = ofx_tree.convert()
     except OFXTypeError as e:
         logger.warning("Error parsing OFX file", error=str(e), name=path.name)
         # Attempt to fix the OFX file and try again
-        fix_ofx(root_element=ofx_tree._root)
-        ofx = ofx_tree.convert()
-        logger.debug("Fixed OFX file", name=path.name)
+        with stage("fix", name=path.name):
+            fired = apply_quirks(root_element=root, names=QUIRKS.keys() - known)
+        with stage("convert", name=path.name):
+            ofx = ofx_tree.convert()
+        KNOWN_QUIRKS[institution] = known | fired
+        logger.debug("Fixed OFX file", name=path.name, quirks=sorted(fired))
     logger.debug("Parsed OFX file", name=path.name)
     return ofx
 
 
-def fix_ofx(root_element: ET.Element) -> ET.Element:
-    """Attempt to fix an OFX file to be parsable by ofxtools."""
+def upper_severity(element: ET.Element) -> bool:
+    """Change the severity to uppercase."""
+    if element.text is not None and not element.text.isupper():
+        element.text = element.text.upper()
+        return True
+    return False
+
+
+def move_name_last(element: ET.Element) -> bool:
+    """Move the NAME tag of a STMTTRN to be its last child."""
+    name = element.find("NAME")
+    if name is not None and element[-1] is not name:
+        element.remove(name)
+        element.append(name)
+        return True
+    return False
+
+
+@dataclass(frozen=True)
+class Quirk:
+    """A fix for an OFX file that ofxtools cannot convert as-is."""
+
+    # Tag of the elements to fix
+    tag: str
+    # Fix one element in place, returning True if it changed anything
+    fix: Callable[[ET.Element], bool]
+
+
+# Registry of known quirks, by name
+QUIRKS: dict[str, Quirk] = {
+    "severity_case": Quirk(tag="SEVERITY", fix=upper_severity),
+    "name_order": Quirk(tag="STMTTRN", fix=move_name_last),
+}
+
+# Quirks each institution, keyed by (ORG, FID), was found to need
+KNOWN_QUIRKS: dict[tuple[str | None, str | None], frozenset[str]] = {}
 
-    # Change the severity to uppercase
-    for element in root_element.iter("SEVERITY"):
-        if element.text is not None:
-            element.text = element.text.upper()
+# Number of files each quirk fired for
+QUIRK_COUNTS: Counter[str] = Counter()
 
-    # For each STMTTRN tag, move the NAME tag to be the last child
-    for element in root_element.iter("STMTTRN"):
-        name = element.find("NAME")
-        if name is not None:
-            element.remove(name)
-            element.append(name)
 
+def institution_key(root_element: ET.Element) -> tuple[str | None, str | None]:
+    """Return the (ORG, FID) of the financial institution that produced the file."""
+    fi = root_element.find("SIGNONMSGSRSV1/SONRS/FI")
+    if fi is None:
+        return (None, None)
+    return (fi.findtext("ORG"), fi.findtext("FID"))
+
+
+def apply_quirks(root_element: ET.Element, names: Iterable[str]) -> frozenset[str]:
+    """Apply the named quirks in a single walk of the tree and return those that fired."""
+    fixes: dict[str, list[tuple[str, Quirk]]] = {}
+    for name in names:
+        quirk = QUIRKS[name]
+        fixes.setdefault(quirk.tag, []).append((name, quirk))
+    fired: set[str] = set()
+    for element in root_element.iter():
+        for name, quirk in fixes.get(element.tag, ()):
+            if quirk.fix(element):
+                fired.add(name)
+    QUIRK_COUNTS.update(fired)
+    return frozenset(fired)
+
+
+def fix_ofx(root_element: ET.Element) -> ET.Element:
+    """Attempt to fix an OFX file to be parsable by ofxtools."""
+    apply_quirks(root_element=root_element, names=QUIRKS)
     return root_element
@@ -0,0 +1,141 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import structlog
+
+from ..models import StatementList, StatementType
+from ..suffixes import SuffixMap
+from ..timing import stage
+from .extract import HEADER_BYTES, scan_account_ids
+
+logger = structlog.getLogger(__name__)
+
+
+@dataclass
+class QfxFile:
+    """Account IDs and parsed statements of a single OFX file."""
+
+    path: Path
+    size: int
+    mtime_ns: int
+    # ACCTIDs found in the header region of the file, in document order
+    header_account_ids: list[str]
+    # Whether the header region was the whole file
+    complete: bool = True
+    _account_ids: list[str] | None = field(default=None, repr=False)
+    _statement_list: StatementList | None = field(default=None, repr=False)
+    # Held while parsing, so threads asking for the same file parse it once
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
+    def __getstate__(self) -> dict:
+        # Locks can't be pickled, e.g. to return a file indexed by a worker process
+        return {name: value for name, value in vars(self).items() if name != "_lock"}
+
+    def __setstate__(self, state: dict) -> None:
+        vars(self).update(state, _lock=threading.Lock())
+
+    @property
+    def account_ids(self) -> list[str]:
+        """Every ACCTID in the file, in document order, scanning past the header if needed."""
+        if self.complete:
+            return self.header_account_ids
+        if self._account_ids is None:
+            self._account_ids, _ = scan_account_ids(path=self.path)
+        return self._account_ids
+
+    def account_suffix(self, suffixes: SuffixMap) -> str | None:
+        """Return the longest of the suffixes the first matching account ID ends with."""
+        # Statements start with their account, so the header holds the IDs of
+        # all but unusual files, and the rest is only scanned when none matches.
+        for account_id in self.header_account_ids:
+            if (suffix := suffixes.longest(account_id)) is not None:
+                return suffix
+        if not self.complete:
+            for account_id in self.account_ids[len(self.header_account_ids) :]:
+                if (suffix := suffixes.longest(account_id)) is not None:
+                    return suffix
+        return None
+
+    def contains_account_id_suffix(self, suffix: str) -> bool:
+        """Return True if any account ID in the file ends with the suffix."""
+        return any(account_id.endswith(suffix) for account_id in self.account_ids)
+
+    @property
+    def statement_list(self) -> StatementList:
+        """Parse the file on first access and return all of its statements."""
+        if self._statement_list is None:
+            from .load import load
+
+            with self._lock:
+                if self._statement_list is None:
+                    self._statement_list = load(path=str(self.path))
+        return self._statement_list
+
+    def get_statement(self, acctid_suffix: str) -> StatementType | None:
+        """Get a Statement by account ID suffix."""
+        return self.statement_list.get_by_acctid_suffix(suffix=acctid_suffix)
+
+
+class QfxFileIndex:
+    """
+    Process-wide index of OFX files keyed by path, size and mtime.
+
+    Every importer consults the same index, so each download's header is
+    scanned once for its account IDs and the file is parsed at most once, no
+    matter how many accounts are configured.
+    """
+
+    def __init__(self):
+        self._files: dict[Path, QfxFile] = {}
+        # Held while a file is read, so each file is indexed once across threads
+        self._path_locks: dict[Path, threading.Lock] = {}
+        # Guards the dicts only, never held during file I/O
+        self._lock = threading.Lock()
+
+    def get(self, filepath: str | Path) -> QfxFile:
+        """Return the indexed file, (re)reading it if it is new or has changed."""
+        path = Path(filepath).resolve()
+        stat = os.stat(path)
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+        with path_lock:
+            with self._lock:
+                qfx_file = self._files.get(path)
+            if (
+                qfx_file is not None
+                and qfx_file.size == stat.st_size
+                and qfx_file.mtime_ns == stat.st_mtime_ns
+            ):
+                return qfx_file
+            with stage("read", name=path.name) as timer:
+                account_ids, complete = scan_account_ids(path=path, limit=HEADER_BYTES)
+                timer.count(bytes=min(stat.st_size, HEADER_BYTES))
+            qfx_file = QfxFile(
+                path=path,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                header_account_ids=account_ids,
+                complete=complete,
+            )
+            with self._lock:
+                self._files[path] = qfx_file
+        logger.debug("Indexed OFX file", name=path.name, account_ids=len(account_ids))
+        return qfx_file
+
+    def add(self, qfx_file: QfxFile) -> None:
+        """Add a file indexed elsewhere, e.g. by a worker process."""
+        with self._lock:
+            self._files[qfx_file.path] = qfx_file
+
+    def clear(self) -> None:
+        """Forget every indexed file."""
+        with self._lock:
+            self._files.clear()
+            self._path_locks.clear()
+
+
+FILE_INDEX = QfxFileIndex()
@@ -1,9 +1,11 @@
+from collections.abc import Iterable
 from pathlib import Path
 
 import structlog
 
 from ..models import StatementList, StatementType
 from .extract import parse_ofx
+from .stream import UnsupportedOFXError, stream_ofx
 from .transform import transform_ofx
 
 logger = structlog.getLogger(__name__)
@@ -12,6 +14,12 @@ logger = structlog.getLogger(__name__)
 def load(path: str) -> StatementList:
     ofx_path = Path(path)
     logger.debug("Loading OFX file", name=ofx_path.name)
+    # Stream the statements straight out of the file when possible, falling
+    # back to a full ofxtools parse for anything the stream parser can't handle.
+    try:
+        return stream_ofx(path=ofx_path)
+    except UnsupportedOFXError as e:
+        logger.debug("Falling back to ofxtools", name=ofx_path.name, reason=str(e))
     ofx = parse_ofx(path=ofx_path)
     return transform_ofx(ofx=ofx)
 
@@ -19,3 +27,9 @@ def load(path: str) -> StatementList:
 def load_statement(path: str, acctid_suffix: str) -> StatementType | None:
     statement_list = load(path=path)
     return statement_list.get_by_acctid_suffix(suffix=acctid_suffix)
+
+
+def load_statements(path: str, acctid_suffixes: Iterable[str]) -> dict[str, StatementType]:
+    """Parse an OFX file once and map each account ID suffix to its statement."""
+    statement_list = load(path=path)
+    return statement_list.dispatch(suffixes=acctid_suffixes)
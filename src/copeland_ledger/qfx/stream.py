@@ -0,0 +1,282 @@
+import codecs
+import os
+import re
+from collections.abc import Iterator
+from decimal import Decimal
+from pathlib import Path
+
+import structlog
+from ofxtools import Types
+
+from ..models import (
+    InvestStatement,
+    InvestTransaction,
+    InvestType,
+    Security,
+    Statement,
+    StatementList,
+    Transaction,
+    TransactionBatch,
+)
+from ..timing import stage
+
+logger = structlog.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# A start or end tag followed by any text up to the next tag
+TOKEN_RE = re.compile(r"<(/?)([A-Z0-9./_]+)>([^<]*)")
+
+# Statement aggregates, by the message set that contains them
+STATEMENT_TAGS = {
+    "STMTRS": "BANKMSGSRSV1",
+    "CCSTMTRS": "CREDITCARDMSGSRSV1",
+    "INVSTMTRS": "INVSTMTMSGSRSV1",
+}
+ACCOUNT_TAGS = {"BANKACCTFROM", "CCACCTFROM", "INVACCTFROM"}
+INVEST_TRANSACTION_TAGS = {"BUYMF", "INCOME", "REINVEST", "SELLMF", "TRANSFER"}
+SECURITY_TYPE_TAGS = {"MFINFO": "MFTYPE", "STOCKINFO": "STOCKTYPE"}
+
+_STRING = Types.String()
+_DECIMAL = Types.Decimal()
+_DATETIME = Types.DateTime()
+CONVERTERS = {
+    "DTASOF": _DATETIME.convert,
+    "DTPOSTED": _DATETIME.convert,
+    "DTSETTLE": _DATETIME.convert,
+    "TOTAL": _DECIMAL.convert,
+    "TRNAMT": _DECIMAL.convert,
+    "UNITPRICE": _DECIMAL.convert,
+    "UNITS": _DECIMAL.convert,
+}
+
+
+class UnsupportedOFXError(ValueError):
+    """The document uses OFX structures the streaming parser does not handle."""
+
+
+def _encoding(head: bytes) -> str:
+    """Guess the text encoding of an OFX file from its header."""
+    header = head.lstrip()
+    if header.startswith(b"<?xml") or b"ENCODING:UTF-8" in header:
+        return "utf-8"
+    return "cp1252"
+
+
+def iter_tokens(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[bool, str, str]]:
+    """
+    Yield (is_end_tag, tag, text) for every tag of an OFX file.
+
+    The file is read in chunks, so memory use is bounded by the chunk size no
+    matter how large the file is. Works for both SGML (v1) and XML (v2) bodies.
+    """
+    with open(path, "rb") as f:
+        head = f.read(chunk_size)
+        # Holds back the bytes of a character split across chunks
+        decoder = codecs.getincrementaldecoder(_encoding(head))(errors="replace")
+        pending = ""
+        chunk = head
+        while chunk:
+            buffer = pending + decoder.decode(chunk)
+            if "<![CDATA[" in buffer:
+                raise UnsupportedOFXError("CDATA sections are not supported")
+            # The text after the last tag may continue in the next chunk
+            end = buffer.rfind("<")
+            end = len(buffer) if end == -1 else end
+            for match in TOKEN_RE.finditer(buffer, 0, end):
+                closing, tag, text = match.groups()
+                yield bool(closing), tag, text.strip()
+            pending = buffer[end:]
+            chunk = f.read(chunk_size)
+        pending += decoder.decode(b"", final=True)
+        for match in TOKEN_RE.finditer(pending):
+            closing, tag, text = match.groups()
+            yield bool(closing), tag, text.strip()
+
+
+class StreamParser:
+    """
+    Build statements straight from a stream of OFX tags.
+
+    Only the fields the transform step uses are kept, so no element tree or
+    ofxtools Aggregate hierarchy is ever built, and transactions are
+    collected as plain records and validated a column at a time. Anything outside the supported
+    subset raises UnsupportedOFXError so callers can fall back to ofxtools.
+    """
+
+    def __init__(self):
+        self.stack: list[str] = []
+        # Data element awaiting an optional (XML) end tag
+        self.leaf: str | None = None
+        self.statements: dict[str, list] = {tag: [] for tag in STATEMENT_TAGS.values()}
+        self.statement: dict | None = None
+        self.record: dict | None = None
+        self.record_depth = 0
+        self.securities: dict[int, Security] = {}
+
+    def feed(self, is_end_tag: bool, tag: str, text: str) -> None:
+        """Process a single tag."""
+        leaf, self.leaf = self.leaf, None
+        if is_end_tag:
+            if tag != leaf:
+                self.end(tag)
+        elif text:
+            self.data(tag, text)
+            self.leaf = tag
+        else:
+            self.start(tag)
+
+    def start(self, tag: str) -> None:
+        parent = self.stack[-1] if self.stack else None
+        if tag.endswith("MSGSRQV1"):
+            raise UnsupportedOFXError(f"{tag} requests are not supported")
+        self.stack.append(tag)
+        if tag in STATEMENT_TAGS:
+            self.statement = {"msgset": STATEMENT_TAGS[tag], "transactions": []}
+        elif parent == "BANKTRANLIST" and tag == "STMTTRN":
+            self.open_record(tag)
+        elif parent == "INVTRANLIST":
+            if tag not in INVEST_TRANSACTION_TAGS:
+                raise UnsupportedOFXError(f"{tag} transactions are not supported")
+            self.open_record(tag)
+        elif parent == "SECLIST":
+            if tag not in SECURITY_TYPE_TAGS:
+                raise UnsupportedOFXError(f"{tag} securities are not supported")
+            self.open_record(tag)
+
+    def open_record(self, tag: str) -> None:
+        self.record = {"tag": tag}
+        self.record_depth = len(self.stack)
+
+    def data(self, tag: str, text: str) -> None:
+        parent = self.stack[-1] if self.stack else None
+        value = CONVERTERS.get(tag, _STRING.convert)(text)
+        if self.record is not None:
+            # Bank transactions take NAME directly, not from a PAYEE aggregate
+            if self.record["tag"] != "STMTTRN" or parent == "STMTTRN":
+                self.record.setdefault(tag, value)
+        elif self.statement is not None and (parent in ACCOUNT_TAGS or parent in STATEMENT_TAGS):
+            self.statement.setdefault(tag, value)
+
+    def end(self, tag: str) -> None:
+        if tag not in self.stack:
+            raise UnsupportedOFXError(f"Unmatched end tag {tag}")
+        while self.stack:
+            depth = len(self.stack)
+            closed = self.stack.pop()
+            if self.record is not None and depth == self.record_depth:
+                self.close_record()
+            elif closed in STATEMENT_TAGS:
+                self.close_statement()
+            if closed == tag:
+                return
+
+    def close_record(self) -> None:
+        record, self.record = self.record, None
+        tag = record.pop("tag")
+        if tag == "STMTTRN":
+            self.statement["transactions"].append(
+                {
+                    "fit_id": record.get("FITID"),
+                    "date_posted": record.get("DTPOSTED"),
+                    "memo": record.get("NAME"),
+                    "amount": record.get("TRNAMT"),
+                    "currency": self.statement.get("CURDEF"),
+                }
+            )
+        elif tag in SECURITY_TYPE_TAGS:
+            security = Security(
+                ticker=record.get("TICKER"),
+                sec_id=record.get("UNIQUEID"),
+                date=record.get("DTASOF"),
+                name=record.get("SECNAME"),
+                type=record.get(SECURITY_TYPE_TAGS[tag]),
+                unit_price=record.get("UNITPRICE"),
+            )
+            self.securities[security.sec_id] = security
+        else:
+            # Tickers come from the SECLIST at the end of the document
+            record["tag"] = tag
+            self.statement["transactions"].append(record)
+
+    def close_statement(self) -> None:
+        statement, self.statement = self.statement, None
+        self.statements[statement.pop("msgset")].append(statement)
+
+    def statement_list(self) -> StatementList:
+        """Return the statements parsed so far."""
+        bank = self.statements["BANKMSGSRSV1"] + self.statements["CREDITCARDMSGSRSV1"]
+        invest = self.statements["INVSTMTMSGSRSV1"]
+        if bank and invest:
+            raise UnsupportedOFXError("Mixed bank and investment statements are not supported")
+        if bank:
+            return StatementList(statements=[self.build_statement(s) for s in bank])
+        if invest:
+            return StatementList(statements=[self.build_invest_statement(s) for s in invest])
+        raise UnsupportedOFXError("No statements found")
+
+    def build_statement(self, statement: dict) -> Statement:
+        transactions = TransactionBatch.from_records(
+            model=Transaction, records=statement["transactions"]
+        )
+        return Statement(
+            currency=statement.get("CURDEF"),
+            acct_id=statement.get("ACCTID"),
+            transactions=transactions.sorted_by("date_posted"),
+        )
+
+    def build_invest_statement(self, statement: dict) -> InvestStatement:
+        currency = statement.get("CURDEF")
+        transactions = TransactionBatch.from_records(
+            model=InvestTransaction,
+            records=[
+                self.build_invest_transaction(record, currency=currency)
+                for record in statement["transactions"]
+            ],
+        )
+        return InvestStatement(
+            currency=currency,
+            acct_id=statement.get("ACCTID"),
+            broker=statement.get("BROKERID"),
+            date=statement.get("DTASOF"),
+            securities=self.securities,
+            transactions=transactions.sorted_by("date_posted"),
+        )
+
+    def build_invest_transaction(self, record: dict, currency: str) -> dict:
+        tag = record["tag"]
+        if tag == "BUYMF":
+            inv_type = InvestType.BUY
+        elif "INCOMETYPE" in record:
+            inv_type = record["INCOMETYPE"]
+        elif tag == "TRANSFER":
+            inv_type = InvestType.TRANSFER
+        else:
+            inv_type = InvestType.MISC
+        return {
+            "fit_id": record.get("FITID"),
+            "ticker": self.securities[int(record["UNIQUEID"])].ticker,
+            "date_posted": record.get("DTSETTLE"),
+            "memo": record.get("MEMO"),
+            # Cash income (INCOME) doesn't change the number of units held
+            "units": record.get("UNITS", Decimal(0)),
+            "unit_price": record.get("UNITPRICE"),
+            "amount": record.get("TOTAL", 0),
+            "currency": currency,
+            "type": inv_type,
+        }
+
+
+def stream_ofx(path: Path) -> StatementList:
+    """Parse an OFX file into a StatementList without building an ofxtools tree."""
+    parser = StreamParser()
+    with stage("parse", name=path.name) as timer:
+        for token in iter_tokens(path=path):
+            parser.feed(*token)
+        statement_list = parser.statement_list()
+        timer.count(
+            bytes=os.path.getsize(path),
+            rows=sum(len(statement.transactions) for statement in statement_list.statements),
+        )
+    logger.debug("Streamed OFX file", name=path.name)
+    return statement_list
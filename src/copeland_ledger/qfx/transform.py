@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 import structlog
 from ofxtools.models.bank import CCSTMTRS, STMTTRN
 from ofxtools.models.invest import (
@@ -14,6 +16,7 @@ from ofxtools.models.invest import (
 )
 from ofxtools.models.ofx import OFX
 
+from ..logs import lazy_debug
 from ..models import (
     InvestStatement,
     InvestTransaction,
@@ -23,10 +26,12 @@ from ..models import (
     StatementList,
     Transaction,
 )
+from ..timing import timed
 
 logger = structlog.getLogger(__name__)
 
 
+@timed("transform")
 def transform_ofx(ofx: OFX) -> StatementList:
     """Get a list of Statements from an OFX object."""
     if ofx.creditcardmsgsrsv1 or ofx.bankmsgsrsv1:
@@ -61,7 +66,7 @@ def transform_statement(ofx_statement: CCSTMTRS) -> Statement:
         acct_id=ofx_statement.account.acctid,
         transactions=transactions,
     )
-    logger.debug("Loaded statement", statement=statement)
+    lazy_debug(logger, "Loaded statement", statement=statement.summary)
     return statement
 
 
@@ -95,7 +100,7 @@ def transform_invest_securities(ofx: OFX) -> dict[int, Security]:
             unit_price=ofx_security.unitprice,
         )
         securities[security.sec_id] = security
-    logger.debug("Loaded securities", tickers=[s.ticker for s in securities.values()])
+    lazy_debug(logger, "Loaded securities", securities=securities.__len__)
     return securities
 
 
@@ -133,7 +138,7 @@ def transform_invest_statement(
         securities=securities,
         transactions=transactions,
     )
-    logger.debug("Transformed investment statement", statement=statement)
+    lazy_debug(logger, "Transformed investment statement", statement=statement.summary)
     return statement
 
 
@@ -168,7 +173,8 @@ def transform_invtran(
         ticker=ticker,
         date_posted=invtran.dtsettle,
         memo=invtran.memo,
-        units=transaction.units if hasattr(transaction, "units") else None,
+        # Cash income (INCOME) doesn't change the number of units held
+        units=transaction.units if hasattr(transaction, "units") else Decimal(0),
         unit_price=transaction.unitprice if hasattr(transaction, "unitprice") else None,
         amount=transaction.total if hasattr(transaction, "total") else 0,
         currency=currency,
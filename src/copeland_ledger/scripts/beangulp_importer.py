@@ -1,19 +1,84 @@
-from dataclasses import dataclass
+import copy
+import datetime as dt
+import functools
+from collections.abc import Callable
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import beangulp
 import click
-import yaml
 
-from copeland_ledger.config import Config
-from copeland_ledger.importers.pdf_archive import PdfArchiver
-from copeland_ledger.importers.qfx import QfxImporter
+from copeland_ledger import timing
+from copeland_ledger.cache import TextCache, cache_dir
+from copeland_ledger.config import load_config
+from copeland_ledger.logs import LEVELS, configure_logging
+
+if TYPE_CHECKING:
+    from copeland_ledger.state import ImportState
 
 
 @dataclass
 class IngestWrapper:
     importers: list
     hooks: list | None = None
+    # Called with the SRC paths before a beangulp command walks them
+    prefetch: Callable | None = None
+    # Beancount accounts of the configured importers
+    accounts: list[str] = field(default_factory=list)
+    # Record of imported files, written once entries or documents are filed
+    state: "ImportState | None" = None
+
+
+def with_prefetch(command: click.Command) -> click.Command:
+    """Wrap a beangulp command so its SRC files are prefetched first."""
+    callback = command.callback
+
+    @functools.wraps(callback)
+    def prefetched(*args, **kwargs):
+        ingest = click.get_current_context().find_object(IngestWrapper)
+        if ingest.prefetch is not None:
+            ingest.prefetch(kwargs["src"])
+        return callback(*args, **kwargs)
+
+    command = copy.copy(command)
+    command.callback = prefetched
+    return command
+
+
+def with_record(command: click.Command) -> click.Command:
+    """Wrap beangulp's archive command so the PDFs it files are recorded as imported."""
+    callback = command.callback
+
+    @functools.wraps(callback)
+    def recorded(*args, **kwargs):
+        from beangulp import exceptions, identify, utils
+
+        from copeland_ledger.importers.pdf_archive import PdfArchiver
+
+        ingest = click.get_current_context().find_object(IngestWrapper)
+        if ingest.state is None or kwargs["dry_run"]:
+            return callback(*args, **kwargs)
+        # Archiving moves the files away, so they are hashed beforehand
+        documents = []
+        for filename in utils.walk(kwargs["src"]):
+            try:
+                importer = identify.identify(ingest.importers, filename)
+            except exceptions.Error:
+                continue  # Reported by the archive command, which then files nothing
+            if isinstance(importer, PdfArchiver):
+                digest = ingest.state.digest(filename)
+                documents.append((filename, digest, importer.matched_accounts(filename)))
+        # Exits without moving anything when any document fails
+        result = callback(*args, **kwargs)
+        for filename, digest, accounts in documents:
+            for account in accounts:
+                ingest.state.record(filename, account=account.bean_account, digest=digest)
+        return result
+
+    command = copy.copy(command)
+    command.callback = recorded
+    return command
 
 
 @click.group("beangulp")
@@ -28,29 +93,180 @@ def beangulp_group():
     required=True,
     help="Path to config YAML file with account mappings.",
 )
+@click.option(
+    "--pdf-max-pages",
+    type=int,
+    default=None,
+    help="Only read this many pages of each PDF when identifying it.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Parse downloaded files on this many worker processes.",
+)
+@click.option(
+    "--state-db",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="LEDGER_IMPORT_STATE",
+    default=None,
+    help="SQLite file recording previous imports, to skip files and transactions already handled.",
+)
+@click.option(
+    "--log-level",
+    type=click.Choice(LEVELS, case_sensitive=False),
+    envvar="LEDGER_LOG_LEVEL",
+    default="info",
+    show_default=True,
+    help="Only log events at this level and above, to stderr.",
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    envvar="LEDGER_TIMINGS",
+    help="Time each import stage and print a summary at the end of the run.",
+)
 @click.pass_context
-def main(ctx, config):
-    config_path = Path(config)
-    ledger_config = Config.model_validate(yaml.safe_load(config_path.read_text()))
+def main(ctx, config, pdf_max_pages, jobs, state_db, log_level, timings):
+    # Importers pull in ofxtools, numpy and beancount's parser, which --help doesn't need
+    from copeland_ledger.dedupe import ExistingIndex
+    from copeland_ledger.importers.pdf_archive import PdfArchiver, PdfIdentifier
+    from copeland_ledger.importers.qfx import QfxImporter
+    from copeland_ledger.prefetch import Prefetcher
+    from copeland_ledger.state import ImportState
+
+    configure_logging(level=log_level)
+    if timings:
+        timing.enable()
+        ctx.call_on_close(timing.print_summary)
+    ledger_config = load_config(path=config, snapshot_dir=cache_dir() / "config")
     accounts = ledger_config.accounts
+    state = ImportState(path=state_db) if state_db else None
+    # A download only bundles accounts held at the same institution
+    bundle_accounts = {
+        org: {account.acctid_suffix: account.bean_account for account in org_accounts}
+        for org, org_accounts in ledger_config.accounts_by_org.items()
+    }
+    # beangulp passes every importer the same existing entries, indexed once
+    existing_index = ExistingIndex()
     importers = [
         QfxImporter(
             bean_account=account.bean_account,
             org=account.org,
             acctid_suffix=account.acctid_suffix,
+            bundle_accounts=bundle_accounts[account.org],
+            state=state,
+            existing_index=existing_index,
         )
         for account in accounts
-    ] + [PdfArchiver(config=account) for account in accounts]
+    ]
+    # Extract each PDF's text once and check it against all accounts together
+    pdf_identifier = PdfIdentifier(
+        accounts=accounts,
+        cache=TextCache(directory=cache_dir() / "pdf-pages"),
+        max_pages=pdf_max_pages,
+        state=state,
+    )
+    importers += [PdfArchiver(config=account, identifier=pdf_identifier) for account in accounts]
     ctx.obj = IngestWrapper(
         importers=[beangulp._importer(i) for i in importers],
         hooks=[],
+        prefetch=(
+            Prefetcher(accounts=accounts, pdf_identifier=pdf_identifier, jobs=jobs)
+            if jobs > 1
+            else None
+        ),
+        accounts=[account.bean_account for account in accounts],
+        state=state,
     )
 
 
+@click.command("insert")
+@click.argument("src", nargs=-1, type=click.Path(exists=True, resolve_path=True))
+@click.option(
+    "--ledger-dir",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of per-account ledger files, e.g. Assets/US/Checking.beancount.",
+)
+@click.option(
+    "--existing",
+    "-e",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Existing Beancount ledger for de-duplication.",
+)
+@click.pass_obj
+def insert(ingest: IngestWrapper, src, ledger_dir: Path, existing):
+    """Extract transactions and insert them in date order into per-account ledger files.
+
+    Works like extract, but instead of printing the new entries, writes each
+    one into the file of its account under LEDGER_DIR. Entries found to be
+    duplicates, of the existing ledger or of the account files themselves,
+    are left out.
+    """
+    from beangulp import identify, utils
+
+    from copeland_ledger.dedupe import FIT_ID_META, EntryIndex
+    from copeland_ledger.importers.qfx import QfxImporter, merge_entries
+    from copeland_ledger.ledger import load_ledger
+    from copeland_ledger.writer import LedgerFile, account_file
+
+    # The loaded ledger's own dedupe index, shared and never added to
+    ledger_index = EntryIndex()
+    if existing:
+        ledger_index = load_ledger(existing, snapshot_dir=cache_dir() / "ledger").index
+
+    files = []
+    for filename in utils.walk(src):
+        importer = identify.identify(ingest.importers, filename)
+        if isinstance(importer, QfxImporter):
+            files.append((filename, importer))
+
+    def precedence(file):
+        filename, importer = file
+        return importer.date(filename) or dt.date.min, importer.account(filename), filename
+
+    # Earlier documents take precedence over later ones, as in beangulp's extract,
+    # ordered by their statements' last date since their entries aren't built yet.
+    files.sort(key=precedence)
+
+    # Entries stream from each statement through a k-way merge per account
+    # into its file, and are only built as the file takes them.
+    streams: dict[str, list] = {}
+    for filename, importer in files:
+        for account, entries in importer.account_entries(filename, index=ledger_index).items():
+            streams.setdefault(account, []).append(entries)
+
+    def new_entries(entries, fit_ids: set[str]):
+        # Download each FITID was first streamed from; the entries of one
+        # transaction, e.g. a dividend and its income, share its FITID
+        streamed: dict[str, str] = {}
+        for entry in entries:
+            if (fit_id := (entry.meta or {}).get(FIT_ID_META)) is not None:
+                fit_id, filename = str(fit_id), entry.meta["filename"]
+                if fit_id in fit_ids or streamed.setdefault(fit_id, filename) != filename:
+                    continue
+            yield entry
+
+    for account, account_streams in sorted(streams.items()):
+        path = account_file(ledger_dir, account)
+        ledger_file = LedgerFile(path)
+        # FITIDs inserted by earlier runs come from the file's persisted index,
+        # so the file isn't parsed
+        fit_ids = ledger_file.index().fit_ids
+        if count := ledger_file.insert(new_entries(merge_entries(account_streams), fit_ids)):
+            click.echo(f"{path}: {count} entries")
+    # Only now that their entries are written are the downloads imported
+    for filename, importer in files:
+        importer.record(filename)
+
+
 main.add_command(beangulp_group)
-beangulp_group.add_command(beangulp._archive)
-beangulp_group.add_command(beangulp._extract)
-beangulp_group.add_command(beangulp._identify)
+main.add_command(with_prefetch(insert))
+beangulp_group.add_command(with_prefetch(with_record(beangulp._archive)))
+beangulp_group.add_command(with_prefetch(beangulp._extract))
+beangulp_group.add_command(with_prefetch(beangulp._identify))
 
 
 if __name__ == "__main__":
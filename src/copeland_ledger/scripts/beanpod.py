@@ -2,19 +2,23 @@ import datetime as dt
 from pathlib import Path
 
 import click
-import pandas as pd
 
-from copeland_ledger.amortization import (
-    LoanDetail,
-    amortization_table,
-    output_beancount_amortization_table,
-)
-from copeland_ledger.qfx.load import load
+from copeland_ledger.logs import LEVELS, configure_logging
 
 
+# Commands import their dependencies when run, so --help and shell completion
+# don't pay for pandas, numpy and ofxtools.
 @click.group()
-def cli():
-    pass
+@click.option(
+    "--log-level",
+    type=click.Choice(LEVELS, case_sensitive=False),
+    envvar="LEDGER_LOG_LEVEL",
+    default="info",
+    show_default=True,
+    help="Only log events at this level and above, to stderr.",
+)
+def cli(log_level):
+    configure_logging(level=log_level)
 
 
 @click.command()
@@ -27,6 +31,8 @@ def cli():
 @click.argument("filename")
 def preview(home, filename):
     "Hello"
+    from copeland_ledger.qfx.load import load
+
     path = Path(home) / "downloads" / filename
     statement_list = load(path=path)
     for statement in statement_list.statements:
@@ -54,23 +60,68 @@ def preview(home, filename):
     is_flag=True,
     help="Show recent payments.",
 )
+@click.option(
+    "--sweep",
+    type=bool,
+    default=False,
+    is_flag=True,
+    help="Compare total interest across a grid of rates, terms and additional principal.",
+)
+@click.option("--rate", "rates", type=float, multiple=True, help="Annual interest rate to sweep.")
+@click.option("--years", "years", type=int, multiple=True, help="Loan term in years to sweep.")
+@click.option(
+    "--extra", "extras", type=float, multiple=True, help="Additional principal payment to sweep."
+)
 @click.argument(
     "loan-name",
     type=str,
     default="mortgage",
 )
-def amortization(config_path: Path, loan_name: str, show_table: bool, latest_payments: bool):
+def amortization(
+    config_path: Path,
+    loan_name: str,
+    show_table: bool,
+    latest_payments: bool,
+    sweep: bool,
+    rates: tuple[float, ...],
+    years: tuple[int, ...],
+    extras: tuple[float, ...],
+):
     """Print the amortization table for a loan, either as a table or Beancount transactions."""
+    from copeland_ledger.amortization import (
+        LoanDetail,
+        amortization_table,
+        payment_period,
+        schedule_payments,
+        sweep_loan,
+        write_beancount_payments,
+    )
+
     loan = LoanDetail.from_config_file(path=config_path, name=loan_name)
-    table_df = amortization_table(loan=loan)
+    if sweep:
+        import pandas as pd
+
+        scenarios = sweep_loan(loan=loan, rates=rates, years=years, extras=extras)
+        with pd.option_context(
+            "display.max_rows", 250, "display.max_columns", None, "display.width", None
+        ):
+            click.echo(scenarios.summary().round(2))
+        return
+    # Recent payments: the ten after 120 days ago
+    start, stop = 1, None
     if latest_payments:
-        start = dt.date.today() - dt.timedelta(days=120)
-        table_df = table_df[table_df["date"] > str(start)][:10]
+        since = dt.date.today() - dt.timedelta(days=119)
+        start = payment_period(start_date=loan.start_date, date=since)
+        stop = start + 10
     if show_table:
+        import pandas as pd
+
+        table_df = amortization_table(loan=loan, start=start, stop=stop)
         with pd.option_context("display.max_rows", 250):
             click.echo(table_df)
             return
-    output_beancount_amortization_table(df=table_df, loan=loan)
+    payments = schedule_payments(loan=loan, start=start, stop=stop)
+    write_beancount_payments(payments=payments, loan=loan)
 
 
 cli.add_command(preview)
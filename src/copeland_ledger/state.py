@@ -0,0 +1,149 @@
+import datetime as dt
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import structlog
+
+from copeland_ledger.cache import file_digest
+
+logger = structlog.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    digest TEXT NOT NULL,
+    account TEXT NOT NULL,
+    date_start TEXT,
+    date_end TEXT,
+    imported_at TEXT NOT NULL,
+    PRIMARY KEY (digest, account)
+);
+CREATE TABLE IF NOT EXISTS fit_ids (
+    account TEXT NOT NULL,
+    fit_id TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (account, fit_id)
+);
+"""
+
+
+@dataclass(frozen=True)
+class ImportedFile:
+    """A file previously imported into an account."""
+
+    digest: str
+    account: str
+    date_start: dt.date | None
+    date_end: dt.date | None
+
+
+class ImportState:
+    """
+    Local SQLite record of the files and transactions already imported.
+
+    Files are identified by the SHA-256 of their contents, so a download that
+    is re-saved under another name is still recognized. One instance may be
+    shared by importers running on several threads.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        # Serializes use of the connection and the in-memory caches
+        self._lock = threading.RLock()
+        # (path, size, mtime) -> digest, to avoid re-hashing unchanged files
+        self._digests: dict[tuple[Path, int, int], str] = {}
+        self._fit_ids: dict[str, set[str]] = {}
+
+    def digest(self, filepath: str | Path) -> str:
+        """Return the content digest of a file."""
+        path = Path(filepath).resolve()
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            # Hashed outside the lock, so threads hash different files at once
+            digest = file_digest(path)
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def imported_files(self, filepath: str | Path) -> list[ImportedFile]:
+        """Return the accounts a file was imported into."""
+        digest = self.digest(filepath)
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT account, date_start, date_end FROM files WHERE digest = ? ORDER BY account",
+                (digest,),
+            ).fetchall()
+        return [
+            ImportedFile(
+                digest=digest,
+                account=account,
+                date_start=dt.date.fromisoformat(start) if start else None,
+                date_end=dt.date.fromisoformat(end) if end else None,
+            )
+            for account, start, end in rows
+        ]
+
+    def imported_file(self, filepath: str | Path, account: str) -> ImportedFile | None:
+        """Return the record of a file imported into an account, if any."""
+        for imported in self.imported_files(filepath):
+            if imported.account == account:
+                return imported
+        return None
+
+    def fit_ids(self, account: str) -> frozenset[str]:
+        """Return the FITIDs already imported into an account."""
+        with self._lock:
+            # A copy, as record() may add to the cached set while the caller iterates
+            return frozenset(self._account_fit_ids(account))
+
+    def _account_fit_ids(self, account: str) -> set[str]:
+        with self._lock:
+            if account not in self._fit_ids:
+                rows = self.connection.execute(
+                    "SELECT fit_id FROM fit_ids WHERE account = ?", (account,)
+                )
+                self._fit_ids[account] = {fit_id for (fit_id,) in rows}
+            return self._fit_ids[account]
+
+    def record(
+        self,
+        filepath: str | Path,
+        account: str,
+        date_start: dt.date | None = None,
+        date_end: dt.date | None = None,
+        fit_ids: Iterable[str] = (),
+        digest: str | None = None,
+    ) -> None:
+        """
+        Record that a file, and the given FITIDs, were imported into an account.
+
+        Pass the file's digest when it was taken before the file was moved away.
+        """
+        digest = digest or self.digest(filepath)
+        fit_ids = list(fit_ids)
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (
+                    digest,
+                    account,
+                    date_start.isoformat() if date_start else None,
+                    date_end.isoformat() if date_end else None,
+                    dt.datetime.now(dt.UTC).isoformat(),
+                ),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO fit_ids VALUES (?, ?, ?)",
+                [(account, fit_id, digest) for fit_id in fit_ids],
+            )
+            self._account_fit_ids(account).update(fit_ids)
+        logger.debug("Recorded import", account=account, fit_ids=len(fit_ids))
@@ -0,0 +1,39 @@
+from collections.abc import Iterable, Iterator
+
+
+class SuffixMap[T]:
+    """
+    Map of suffixes to values, looked up by a key ending with one of them.
+
+    Suffixes are hashed and grouped by length, so finding the longest suffix
+    a key ends with is one dict lookup per distinct suffix length, longest
+    first, instead of a scan over every suffix.
+    """
+
+    def __init__(self, items: Iterable[tuple[str, T]] = ()):
+        self._values: dict[str, T] = {}
+        for suffix, value in items:
+            self._values.setdefault(suffix, value)
+        # Longest first, so "1111" wins over "11" for a key ending in 1111
+        self._lengths = sorted({len(suffix) for suffix in self._values}, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __getitem__(self, suffix: str) -> T:
+        return self._values[suffix]
+
+    def longest(self, key: str) -> str | None:
+        """Return the longest of the suffixes that key ends with, if any."""
+        for length in self._lengths:
+            if length <= len(key) and (suffix := key[len(key) - length :]) in self._values:
+                return suffix
+        return None
+
+    def find(self, key: str) -> T | None:
+        """Return the value of the longest suffix that key ends with, if any."""
+        suffix = self.longest(key)
+        return None if suffix is None else self._values[suffix]
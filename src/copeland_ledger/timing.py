@@ -0,0 +1,180 @@
+"""
+Opt-in timing of the import pipeline's stages.
+
+Instrumented code wraps each stage in ``with stage("parse", name=...) as s:``
+and reports what it processed with ``s.count(bytes=..., rows=...)``. Every
+stage emits a structured log event with its duration and counts, and is added
+to per-stage totals that print_summary() renders as a table at the end of a
+run. Timing is off by default, in which case stage() hands back a shared no-op
+and instrumented code only pays for a flag check.
+"""
+
+import functools
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import structlog
+
+if TYPE_CHECKING:
+    from rich.console import Console
+    from rich.table import Table
+
+logger = structlog.getLogger(__name__)
+
+_enabled = False
+
+
+@dataclass
+class StageTotals:
+    """Accumulated time and counts of every run of a stage."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    counts: Counter[str] = field(default_factory=Counter)
+
+
+# Stage name to its totals, in the order stages first ran
+TOTALS: dict[str, StageTotals] = {}
+
+
+class Stage:
+    """A single timed run of a stage."""
+
+    __slots__ = ("name", "fields", "counts", "start")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+        self.counts: Counter[str] = Counter()
+        self.start = 0.0
+
+    def count(self, **counts: int) -> None:
+        """Add to the amounts processed by this stage, e.g. bytes or rows."""
+        self.counts.update(counts)
+
+    def __enter__(self) -> "Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            # Only completed runs count, e.g. not a parse attempt that falls back
+            logger.debug(
+                "Failed stage",
+                stage=self.name,
+                duration_ms=round(seconds * 1000, 3),
+                error=exc_type.__name__,
+                **self.fields,
+            )
+            return
+        totals = TOTALS.setdefault(self.name, StageTotals())
+        totals.calls += 1
+        totals.seconds += seconds
+        totals.counts.update(self.counts)
+        logger.debug(
+            "Timed stage",
+            stage=self.name,
+            duration_ms=round(seconds * 1000, 3),
+            **self.counts,
+            **self.fields,
+        )
+
+
+class _NullStage:
+    """Stand-in for Stage while timing is disabled."""
+
+    __slots__ = ()
+
+    def count(self, **counts: int) -> None:
+        pass
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+def enable(enabled: bool = True) -> None:
+    """Turn stage timing on or off."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Forget the totals collected so far."""
+    TOTALS.clear()
+
+
+def merge(totals: dict[str, StageTotals]) -> None:
+    """Add totals collected elsewhere, e.g. in a worker process."""
+    for name, other in totals.items():
+        merged = TOTALS.setdefault(name, StageTotals())
+        merged.calls += other.calls
+        merged.seconds += other.seconds
+        merged.counts.update(other.counts)
+
+
+def stage(name: str, /, **fields) -> Stage | _NullStage:
+    """Time a stage of work; extra fields are added to its log event."""
+    if not _enabled:
+        return NULL_STAGE
+    return Stage(name=name, fields=fields)
+
+
+def timed[**P, R](name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Decorate a function to time each call of it as a stage."""
+
+    def decorator(function: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(function)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if not _enabled:
+                return function(*args, **kwargs)
+            with Stage(name=name, fields={}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def summary_table() -> "Table":
+    """Return a table of the time spent and amounts processed per stage."""
+    from rich.table import Table
+
+    count_names = sorted({name for totals in TOTALS.values() for name in totals.counts})
+    table = Table(title="Import stages")
+    table.add_column("Stage")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total (ms)", justify="right")
+    table.add_column("Mean (ms)", justify="right")
+    for name in count_names:
+        table.add_column(name.capitalize(), justify="right")
+    for name, totals in TOTALS.items():
+        table.add_row(
+            name,
+            str(totals.calls),
+            f"{totals.seconds * 1000:.1f}",
+            f"{totals.seconds * 1000 / totals.calls:.2f}",
+            *(f"{totals.counts[count]:,}" for count in count_names),
+        )
+    return table
+
+
+def print_summary(console: "Console | None" = None) -> None:
+    """Print the per-stage summary table, to stderr by default."""
+    from rich.console import Console
+
+    console = console or Console(stderr=True)
+    console.print(summary_table())
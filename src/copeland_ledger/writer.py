@@ -0,0 +1,375 @@
+"""
+Write entries straight into per-account Beancount files, in date order.
+
+format_entry() renders the transactions this project produces (single-leg
+bank postings, investment postings at cost, mortgage payments) directly to
+text, matching beancount's printer; anything else goes through the printer.
+LedgerFile inserts entries into a file in date order using a persisted index
+of the byte offset of every dated entry, so nothing is parsed. Entries that
+go after the last one are appended in place, and the file is truncated back
+if that fails; others are written into a temporary copy that then replaces
+the original, rewritten from the first insertion on only. Either way a
+failed write leaves the ledger as it was.
+"""
+
+import datetime as dt
+import hashlib
+import itertools
+import os
+import pickle
+import re
+import shutil
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field, replace
+from decimal import Decimal
+from pathlib import Path
+from typing import BinaryIO
+
+import structlog
+from beancount.core import amount, data, position
+
+from copeland_ledger.cache import cache_dir
+from copeland_ledger.dedupe import FIT_ID_META
+
+logger = structlog.getLogger(__name__)
+
+# Metadata the printer leaves out
+META_IGNORE = {"filename", "lineno"}
+
+# Start of a dated directive
+ENTRY_RE = re.compile(rb"^(\d{4})-(\d{2})-(\d{2})[ \t]", re.MULTILINE)
+# FITID of an entry, as format_entry writes its metadata
+FIT_ID_RE = re.compile(rb'^  fitid: "((?:[^"\\\n]|\\.)*)"', re.MULTILINE)
+
+
+def _quote(string: str) -> str:
+    return '"{}"'.format(string.replace("\\", r"\\").replace('"', r"\""))
+
+
+def _unquote(string: bytes) -> str:
+    return re.sub(rb"\\(.)", rb"\1", string).decode()
+
+
+def _metadata(meta: dict | None, prefix: str) -> list[str] | None:
+    """Return the lines of the metadata, or None if the fast path can't render it."""
+    lines = []
+    for key, value in (meta or {}).items():
+        if key in META_IGNORE or key.startswith("__"):
+            continue
+        if isinstance(value, str):
+            lines.append(f"{prefix}{key}: {_quote(value)}")
+        elif isinstance(value, Decimal | dt.date):
+            lines.append(f"{prefix}{key}: {value}")
+        elif value is None:
+            lines.append(f"{prefix}{key}: ")
+        else:
+            return None
+    return lines
+
+
+def _position(posting: data.Posting) -> tuple[str, str] | None:
+    """Return the number and the rest of a posting's position, split for alignment."""
+    units = posting.units
+    if units is None:
+        return ("", "") if posting.cost is None else None
+    if not isinstance(units, amount.Amount) or not isinstance(units.number, Decimal):
+        return None
+    cost = posting.cost
+    if cost is None:
+        return f"{units.number:f} ", units.currency
+    if not isinstance(cost, position.Cost) or cost.label or not isinstance(cost.number, Decimal):
+        return None
+    date = f", {cost.date}" if cost.date else ""
+    return f"{units.number:f} ", f"{units.currency} {{{cost.number:f} {cost.currency}{date}}}"
+
+
+def _format_transaction(entry: data.Transaction) -> str | None:
+    if entry.flag not in ("*", "!"):
+        return None
+    strings = []
+    if entry.payee:
+        strings.append(_quote(entry.payee))
+    if entry.narration:
+        strings.append(_quote(entry.narration))
+    elif entry.payee:
+        strings.append('""')
+    strings += [f"#{tag}" for tag in sorted(entry.tags or ())]
+    strings += [f"^{link}" for link in sorted(entry.links or ())]
+    lines = [f"{entry.date} {entry.flag} {' '.join(strings)}"]
+    if (meta := _metadata(entry.meta, "  ")) is None:
+        return None
+    lines += meta
+
+    positions = []
+    for posting in entry.postings:
+        if posting.flag or posting.price is not None:
+            return None
+        if (split := _position(posting)) is None:
+            return None
+        positions.append(split)
+    # Align the positions on their currency, as the printer does
+    width_account = max((len(posting.account) for posting in entry.postings), default=1)
+    before = max((len(number) for number, rest in positions if rest), default=0)
+    after = max((len(rest) for number, rest in positions if rest), default=0)
+    width_position = max(1, before + after)
+    for posting, (number, rest) in zip(entry.postings, positions, strict=True):
+        text = f"{number:>{before}}{rest:<{after}}" if rest else ""
+        lines.append(f"  {posting.account:{width_account}}  {text:{width_position}}".rstrip())
+        if posting.meta:
+            if (meta := _metadata(posting.meta, "    ")) is None:
+                return None
+            lines += meta
+    return "\n".join(lines) + "\n"
+
+
+def format_entry(entry: data.Directive) -> str:
+    """Return the Beancount text of an entry, as beancount's printer would write it."""
+    if isinstance(entry, data.Transaction) and (text := _format_transaction(entry)) is not None:
+        return text
+    from beancount.parser import printer
+
+    return printer.format_entry(entry)
+
+
+def in_date_order(entries: Iterable[data.Directive]) -> Iterator[data.Directive]:
+    """Pass entries through, raising ValueError on one dated before its predecessor."""
+    previous = None
+    for entry in entries:
+        if previous is not None and entry.date < previous:
+            raise ValueError(f"Entry dated {entry.date} follows one dated {previous}")
+        previous = entry.date
+        yield entry
+
+
+def account_file(directory: Path, account: str) -> Path:
+    """Return the ledger file of an account, e.g. Assets/US/Checking.beancount."""
+    *parents, name = account.split(":")
+    return Path(directory).joinpath(*parents, f"{name}.beancount")
+
+
+# Bumped whenever DateIndex changes, so old pickles are ignored
+INDEX_VERSION = 2
+
+
+@dataclass
+class DateIndex:
+    """Date and byte offset of every dated entry of a file, in file order, and its FITIDs."""
+
+    size: int
+    mtime_ns: int
+    dates: list[int]
+    offsets: list[int]
+    # FITIDs of the file's entries, to dedupe against without parsing it
+    fit_ids: set[str] = field(default_factory=set)
+
+    @classmethod
+    def scan(cls, path: Path) -> "DateIndex":
+        """Index a file by reading it; only needed when it changed behind our back."""
+        content = path.read_bytes() if path.exists() else b""
+        return cls.parse(content, mtime_ns=path.stat().st_mtime_ns if path.exists() else 0)
+
+    @classmethod
+    def parse(cls, content: bytes, mtime_ns: int) -> "DateIndex":
+        dates, offsets = [], []
+        for match in ENTRY_RE.finditer(content):
+            try:
+                date = dt.date(*map(int, match.groups()))
+            except ValueError:
+                continue
+            dates.append(date.toordinal())
+            offsets.append(match.start())
+        fit_ids = {_unquote(match[1]) for match in FIT_ID_RE.finditer(content)}
+        return cls(
+            size=len(content), mtime_ns=mtime_ns, dates=dates, offsets=offsets, fit_ids=fit_ids
+        )
+
+    def is_current(self, path: Path) -> bool:
+        if not path.exists():
+            return self.size == 0
+        stat = path.stat()
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    def matches(self, tail: bytes, start: int) -> bool:
+        """
+        Return whether the entries indexed from the start-th on are where they are indexed.
+
+        tail is the file's content from the start-th entry on, the only part
+        an insertion there rewrites.
+        """
+        base = self.offsets[start]
+        if base + len(tail) != self.size:
+            return False
+        for date, offset in zip(self.dates[start:], self.offsets[start:], strict=True):
+            match = ENTRY_RE.match(tail, offset - base)
+            if match is None or match[0][:10] != dt.date.fromordinal(date).isoformat().encode():
+                return False
+        return True
+
+
+class LedgerFile:
+    """
+    A Beancount file kept in date order, which entries are inserted into.
+
+    The date index is persisted under index_dir and trusted while the file's
+    size and mtime match it. Entries dated on or after the last one are
+    appended in place, without reading the file. Earlier ones go into a copy
+    of the file, of which only the part from the first insertion on is read
+    and rewritten; the entries indexed there are checked first, so an edit
+    that keeps the size within the mtime's granularity is caught before
+    anything is spliced.
+    """
+
+    def __init__(self, path: Path, index_dir: Path | None = None):
+        self.path = Path(path)
+        index_dir = Path(index_dir) if index_dir else cache_dir() / "ledger-index"
+        name = hashlib.sha256(f"{INDEX_VERSION}:{self.path.resolve()}".encode()).hexdigest()
+        self.index_path = index_dir / f"{name}.pickle"
+
+    def index(self) -> DateIndex:
+        """Return the file's date index, rebuilding it if the file changed."""
+        try:
+            index = pickle.loads(self.index_path.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            index = None
+        if index is None or not index.is_current(self.path):
+            logger.debug("Indexing ledger file", name=self.path.name)
+            index = DateIndex.scan(self.path)
+            self._save(index)
+        return index
+
+    def _save(self, index: DateIndex) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(pickle.dumps(index))
+        os.replace(tmp, self.index_path)
+
+    def insert(self, entries: Iterable[data.Directive]) -> int:
+        """
+        Insert entries, already in date order, and return how many were written.
+
+        Entries are formatted as they are consumed, so a merged stream of them
+        is never collected or sorted again.
+        """
+        entries = in_date_order(entries)
+        if (first := next(entries, None)) is None:
+            return 0
+        entries = itertools.chain([first], entries)
+        index = self.index()
+        start = bisect_right(index.dates, first.date.toordinal())
+        if start == len(index.offsets):
+            return self._append(index, entries)
+        with open(self.path, "rb") as f:
+            f.seek(index.offsets[start])
+            tail = f.read()
+        if not index.matches(tail, start):
+            logger.warning("Reindexing changed ledger file", name=self.path.name)
+            content = self.path.read_bytes()
+            index = DateIndex.parse(content, mtime_ns=index.mtime_ns)
+            start = bisect_right(index.dates, first.date.toordinal())
+            if start == len(index.offsets):
+                return self._append(index, entries)
+            tail = content[index.offsets[start] :]
+        return self._splice(index, start, tail, entries)
+
+    def _append(self, index: DateIndex, entries: Iterable[data.Directive]) -> int:
+        """Append entries to the file in place, truncating it back if that fails."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = index.size
+        try:
+            with open(self.path, "a+b") as f:
+                # Only the last byte is read, to end the file's last line first
+                f.seek(max(size - 1, 0))
+                ends_with_newline = f.read(1) in (b"", b"\n")
+                f.seek(size)
+                new, count = self._write(
+                    f, index, len(index.offsets), b"", ends_with_newline, entries
+                )
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            if self.path.exists():
+                os.truncate(self.path, size)
+            raise
+        self._saved(new)
+        return count
+
+    def _splice(
+        self, index: DateIndex, start: int, tail: bytes, entries: Iterable[data.Directive]
+    ) -> int:
+        """Insert entries into a copy of the file rewritten from the start-th entry on."""
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            # The part before the first insertion is copied as is, by the OS where it can
+            shutil.copyfile(self.path, tmp)
+            with open(tmp, "r+b") as f:
+                f.seek(index.offsets[start])
+                f.truncate()
+                new, count = self._write(f, index, start, tail, tail.endswith(b"\n"), entries)
+                f.flush()
+                os.fsync(f.fileno())
+            shutil.copymode(self.path, tmp)
+            os.replace(tmp, self.path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        self._saved(new)
+        return count
+
+    def _write(
+        self,
+        f: BinaryIO,
+        index: DateIndex,
+        start: int,
+        tail: bytes,
+        ends_with_newline: bool,
+        entries: Iterable[data.Directive],
+    ) -> tuple[DateIndex, int]:
+        """
+        Write entries into the tail of the file from the start-th entry on, at f's position.
+
+        Return the index of the new file, bar its mtime, and the number of
+        entries written.
+        """
+        base = cursor = position = f.tell()
+        dates, offsets = index.dates[:start], index.offsets[:start]
+        fit_ids = set(index.fit_ids)
+        i, count = start, 0
+        for entry in entries:
+            date = entry.date.toordinal()
+            j = bisect_right(index.dates, date, lo=i)
+            offset = index.offsets[j] if j < len(index.offsets) else index.size
+            # Entries already in the file move by the bytes inserted before them
+            dates += index.dates[i:j]
+            offsets += [moved + position - cursor for moved in index.offsets[i:j]]
+            f.write(tail[cursor - base : offset - base])
+            position += offset - cursor
+            cursor, i = offset, j
+            text = format_entry(entry).encode()
+            if offset < index.size:
+                # Before an existing entry, followed by a blank line
+                lead, text = b"", text + b"\n"
+            elif position == 0:
+                lead = b""
+            else:
+                lead = b"\n" if ends_with_newline else b"\n\n"
+                ends_with_newline = True
+            dates.append(date)
+            offsets.append(position + len(lead))
+            if fit_id := (entry.meta or {}).get(FIT_ID_META):
+                fit_ids.add(str(fit_id))
+            f.write(lead + text)
+            position += len(lead) + len(text)
+            count += 1
+        dates += index.dates[i:]
+        offsets += [moved + position - cursor for moved in index.offsets[i:]]
+        f.write(tail[cursor - base :])
+        position += index.size - cursor
+        new = DateIndex(size=position, mtime_ns=0, dates=dates, offsets=offsets, fit_ids=fit_ids)
+        logger.debug("Inserted entries", name=self.path.name, entries=count)
+        return new, count
+
+    def _saved(self, index: DateIndex) -> None:
+        """Persist the index of the file just written, stamped with its mtime."""
+        stat = self.path.stat()
+        self._save(replace(index, size=stat.st_size, mtime_ns=stat.st_mtime_ns))
@@ -0,0 +1,28 @@
+import pytest
+import structlog
+
+from copeland_ledger import timing
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Keep on-disk caches out of the user's cache directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture(autouse=True)
+def reset_logging():
+    """Undo logging configured by a command under test."""
+    yield
+    structlog.reset_defaults()
+
+
+@pytest.fixture
+def timings():
+    """Collect stage timings for the duration of a test."""
+    timing.reset()
+    timing.enable()
+    yield timing.TOTALS
+    timing.enable(False)
+    timing.reset()
@@ -1,12 +1,22 @@
 from pathlib import Path
 
 import pytest
+from pypdf import PdfWriter
 
+from copeland_ledger.cache import TextCache
+from copeland_ledger.config import Account, PdfArchive
+from copeland_ledger.importers import pdf_archive
 from copeland_ledger.importers.pdf_archive import (
+    PdfAccountMatcher,
+    PdfArchiver,
+    PdfIdentifier,
     extract_pdf_text,
     find_account_id_suffix_in_pdf,
     find_org_name_in_pdf,
 )
+from copeland_ledger.state import ImportState
+
+TEST_PDF = Path(__file__).parent / "test.pdf"
 
 
 @pytest.mark.parametrize(
@@ -31,6 +41,148 @@ def test_find_org_name_in_pdf(org, content):
     assert find_org_name_in_pdf(org, content) is True
 
 
+def test_find_org_name_in_pdf_escapes_org():
+    assert find_org_name_in_pdf("A+B (Bank)", "Statement from A+B (Bank)") is True
+    assert find_org_name_in_pdf("A+B", "AAB") is False
+
+
+def test_pdf_account_matcher_reports_overlapping_hits():
+    accounts = [
+        Account(bean_account="Assets:A", org="Chase", acctid_suffix="1234"),
+        Account(bean_account="Assets:B", org="Chase", acctid_suffix="2345"),
+        Account(bean_account="Assets:C", org="Chase Bank", acctid_suffix="123"),
+        Account(bean_account="Assets:D", org="Amex", acctid_suffix="12345"),
+    ]
+    matcher = PdfAccountMatcher(accounts=accounts)
+    assert matcher.scan("Chase Bank account 12345") == (
+        {"Chase", "Chase Bank"},
+        {"123", "1234", "2345", "12345"},
+    )
+    assert matcher.match(["Chase Bank", "account 12345"]) == accounts[:3]
+    assert matcher.match(["Amex 2345"]) == []
+
+
+def test_pdf_account_matcher_reads_until_the_org_matches():
+    accounts = [
+        Account(bean_account="Assets:A", org="Chase", acctid_suffix="1111"),
+        Account(bean_account="Assets:B", org="Chase", acctid_suffix="2222"),
+    ]
+    matcher = PdfAccountMatcher(accounts=accounts)
+    read = []
+    pages = ["Chase checking 1111", "Chase savings 2222", "Terms"]
+    # The second account first appears on the second page
+    assert matcher.match(read.append(page) or page for page in pages) == accounts
+    # Once both are matched the last page isn't needed
+    assert read == pages[:2]
+
+
+def test_pdf_account_matcher_stops_at_first_match():
+    accounts = [
+        Account(bean_account="Assets:A", org="Chase", acctid_suffix="1111"),
+        Account(bean_account="Assets:B", org="Amex", acctid_suffix="2222"),
+        Account(bean_account="Assets:C", org="Ally", acctid_suffix="3333"),
+    ]
+    matcher = PdfAccountMatcher(accounts=accounts)
+    read = []
+    pages = ["Chase checking 1111", *["Terms"] * 29]
+    assert matcher.match(read.append(page) or page for page in pages) == accounts[:1]
+    # Accounts of other orgs don't keep the rest of the statement being read
+    assert len(read) == 1
+
+
 def test_extract_pdf_text():
     path = Path(__file__).parent / "test.pdf"
     assert "This is a test PDF document" in extract_pdf_text(path)
+
+
+@pytest.fixture
+def three_page_pdf(tmp_path):
+    writer = PdfWriter()
+    for _ in range(3):
+        writer.append(TEST_PDF)
+    path = tmp_path / "three_pages.pdf"
+    writer.write(path)
+    return path
+
+
+@pytest.fixture
+def extracted_pages(monkeypatch):
+    """Record every page extracted from a PDF."""
+    pages = []
+
+    def iter_pdf_pages(path, start=0):
+        for page in extract_pages(path, start=start):
+            pages.append(page)
+            yield page
+
+    extract_pages = pdf_archive.iter_pdf_pages
+    monkeypatch.setattr(pdf_archive, "iter_pdf_pages", iter_pdf_pages)
+    return pages
+
+
+ACCOUNTS = [
+    Account(bean_account="Assets:Lorem", org="Lorem", acctid_suffix="ipsum"),
+    Account(
+        bean_account="Assets:Dolor",
+        org="DOLOR",
+        acctid_suffix="amet",
+        pdf_archive=PdfArchive(org="dolor"),
+    ),
+    Account(bean_account="Assets:Other", org="Other", acctid_suffix="1234"),
+]
+
+
+def test_pdf_identifier_extracts_once(three_page_pdf, extracted_pages):
+    identifier = PdfIdentifier(accounts=ACCOUNTS)
+    archivers = [PdfArchiver(config=account, identifier=identifier) for account in ACCOUNTS]
+    assert [bool(archiver.identify(str(three_page_pdf))) for archiver in archivers] == [
+        True,
+        True,
+        False,
+    ]
+    # Both matched on the first page, and the third account is of another org
+    assert len(extracted_pages) == 1
+
+
+def test_pdf_identifier_caches_unmatched_text(tmp_path, three_page_pdf, extracted_pages):
+    accounts = ACCOUNTS[2:]
+    identifier = PdfIdentifier(accounts=accounts, cache=TextCache(directory=tmp_path / "cache"))
+    assert identifier.match(three_page_pdf) == []
+    assert len(extracted_pages) == 3
+    # A fresh identifier reads the text back from the on-disk cache
+    identifier = PdfIdentifier(accounts=accounts, cache=TextCache(directory=tmp_path / "cache"))
+    assert identifier.match(three_page_pdf) == []
+    assert len(extracted_pages) == 3
+
+
+def test_pdf_identifier_caches_pages_read(tmp_path, three_page_pdf, extracted_pages):
+    cache = TextCache(directory=tmp_path / "cache")
+    # Both accounts match on the first page, so only it is read and cached
+    assert PdfIdentifier(accounts=ACCOUNTS[:2], cache=cache).match(three_page_pdf) == ACCOUNTS[:2]
+    assert len(extracted_pages) == 1
+    assert PdfIdentifier(accounts=ACCOUNTS[:2], cache=cache).match(three_page_pdf) == ACCOUNTS[:2]
+    assert len(extracted_pages) == 1
+    # Reading further extracts only the pages past the cached one
+    assert PdfIdentifier(accounts=ACCOUNTS[2:], cache=cache).match(three_page_pdf) == []
+    assert len(extracted_pages) == 3
+    assert PdfIdentifier(accounts=ACCOUNTS[2:], cache=cache).match(three_page_pdf) == []
+    assert len(extracted_pages) == 3
+
+
+def test_pdf_archiver_max_pages(three_page_pdf, extracted_pages):
+    archiver = PdfArchiver(config=ACCOUNTS[2], max_pages=2)
+    assert not archiver.identify(str(three_page_pdf))
+    assert len(extracted_pages) == 2
+
+
+def test_pdf_identifier_reuses_import_state(tmp_path, three_page_pdf, extracted_pages):
+    state = ImportState(path=tmp_path / "state.sqlite")
+    assert PdfIdentifier(accounts=ACCOUNTS, state=state).match(three_page_pdf) == ACCOUNTS[:2]
+    assert len(extracted_pages) == 1
+    # Identifying a PDF doesn't record it
+    assert state.imported_files(three_page_pdf) == []
+    # Once archived, a later run recognizes the file without extracting any text
+    for account in ACCOUNTS[:2]:
+        state.record(three_page_pdf, account=account.bean_account)
+    assert PdfIdentifier(accounts=ACCOUNTS, state=state).match(three_page_pdf) == ACCOUNTS[:2]
+    assert len(extracted_pages) == 1
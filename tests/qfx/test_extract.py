@@ -1,6 +1,12 @@
+from collections import Counter
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
 import pytest
+from ofxtools.Parser import OFXTree
 
-from copeland_ledger.qfx.extract import ofx_content_contains_account_id_suffix
+from copeland_ledger.qfx import extract
+from copeland_ledger.qfx.extract import ofx_content_contains_account_id_suffix, parse_ofx
 
 
 @pytest.mark.parametrize(
@@ -13,3 +19,42 @@ from copeland_ledger.qfx.extract import ofx_content_contains_account_id_suffix
 )
 def test_me(content, suffix):
     assert ofx_content_contains_account_id_suffix(content, suffix) is True
+
+
+@pytest.fixture
+def quirky_qfx(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "KNOWN_QUIRKS", {})
+    monkeypatch.setattr(extract, "QUIRK_COUNTS", Counter())
+    content = (Path(__file__).parent / "bank.qfx").read_text()
+    content = content.replace("<SEVERITY>INFO", "<SEVERITY>Info", 1)
+    path = tmp_path / "quirky.qfx"
+    path.write_text(content)
+    return path
+
+
+def test_parse_ofx_learns_institution_quirks(quirky_qfx, monkeypatch):
+    conversions = []
+    convert = OFXTree.convert
+    monkeypatch.setattr(OFXTree, "convert", lambda self: conversions.append(1) or convert(self))
+
+    ofx = parse_ofx(quirky_qfx)
+    assert ofx.signonmsgsrsv1.sonrs.status.severity == "INFO"
+    assert len(conversions) == 2
+    assert extract.KNOWN_QUIRKS == {("Ally", "1234"): frozenset({"severity_case"})}
+
+    # The fix is applied up front the next time, so one conversion suffices
+    parse_ofx(quirky_qfx)
+    assert len(conversions) == 3
+    assert extract.QUIRK_COUNTS == {"severity_case": 2}
+
+
+def test_apply_quirks_in_one_walk():
+    root = ET.fromstring(
+        "<OFX><STATUS><SEVERITY>warn</SEVERITY></STATUS>"
+        "<STMTTRN><NAME>Store</NAME><TRNAMT>1</TRNAMT></STMTTRN>"
+        "<STMTTRN><TRNAMT>2</TRNAMT><NAME>Other</NAME></STMTTRN></OFX>"
+    )
+    assert extract.apply_quirks(root, extract.QUIRKS) == {"severity_case", "name_order"}
+    assert root.findtext("STATUS/SEVERITY") == "WARN"
+    assert [trn[-1].tag for trn in root.iter("STMTTRN")] == ["NAME", "NAME"]
+    assert extract.apply_quirks(root, extract.QUIRKS) == set()
@@ -0,0 +1,211 @@
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from beancount.core import amount, data, flags
+from beangulp.extract import DUPLICATE
+
+from copeland_ledger.dedupe import EntryIndex
+from copeland_ledger.importers.qfx import QfxImporter, merge_entries
+from copeland_ledger.qfx.index import FILE_INDEX
+
+BANK_QFX = str(Path(__file__).parent / "bank.qfx")
+
+
+@pytest.fixture
+def importer():
+    FILE_INDEX.clear()
+    importer = QfxImporter(org="Ally", acctid_suffix="1111", bean_account="Assets:Checking")
+    assert importer.identify(BANK_QFX)
+    return importer
+
+
+def test_extract_stamps_fit_ids(importer):
+    entries = importer.extract(BANK_QFX, existing=[])
+    assert [entry.meta["fitid"] for entry in entries] == ["CHK-0001", "CHK-0002"]
+
+
+def test_extract_skips_existing_entries(importer):
+    imported = importer.extract(BANK_QFX, existing=[])[0]
+    posting = data.Posting(
+        "Assets:Checking", amount.Amount(Decimal("-42.50"), "USD"), None, None, None, None
+    )
+    by_hand = data.Transaction(
+        data.new_metadata("ledger.beancount", 1),
+        dt.date(2024, 1, 15),
+        flags.FLAG_OKAY,
+        None,
+        "Groceries",
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        [posting],
+    )
+    assert importer.extract(BANK_QFX, existing=[imported, by_hand]) == []
+
+
+def test_extract_matches_any_leg_of_hand_entries(importer):
+    by_hand = data.Transaction(
+        data.new_metadata("ledger.beancount", 1),
+        dt.date(2024, 1, 15),
+        flags.FLAG_OKAY,
+        None,
+        "Groceries",
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        [
+            data.Posting(
+                "Expenses:Food", amount.Amount(Decimal("42.50"), "USD"), None, None, None, None
+            ),
+            data.Posting(
+                "Assets:Checking", amount.Amount(Decimal("-42.50"), "USD"), None, None, None, None
+            ),
+        ],
+    )
+    entries = importer.extract(BANK_QFX, existing=[by_hand])
+    assert [entry.meta["fitid"] for entry in entries] == ["CHK-0001"]
+
+
+def test_deduplicate_keeps_entries_extract_kept(tmp_path):
+    """A hand entry absorbs one of two identical charges, in extract only."""
+    FILE_INDEX.clear()
+    path = tmp_path / "bank.qfx"
+    charge = "<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240115120000.000[-5:EST]\n"
+    content = Path(BANK_QFX).read_text()
+    path.write_text(
+        content.replace(
+            charge,
+            f"{charge}<TRNAMT>-42.50\n<FITID>CHK-0003\n<NAME>Grocery Store\n</STMTTRN>\n{charge}",
+            1,
+        )
+    )
+    importer = QfxImporter(org="Ally", acctid_suffix="1111", bean_account="Assets:Checking")
+    assert importer.identify(str(path))
+    posting = data.Posting(
+        "Assets:Checking", amount.Amount(Decimal("-42.50"), "USD"), None, None, None, None
+    )
+    by_hand = data.Transaction(
+        data.new_metadata("ledger.beancount", 1),
+        dt.date(2024, 1, 15),
+        flags.FLAG_OKAY,
+        None,
+        "Groceries",
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        [posting],
+    )
+    existing = [by_hand]
+    entries = importer.extract(str(path), existing=existing)
+    assert [entry.meta["fitid"] for entry in entries] == ["CHK-0001", "CHK-0002"]
+    importer.deduplicate(entries, existing)
+    assert not any(DUPLICATE in entry.meta for entry in entries)
+    FILE_INDEX.clear()
+
+
+def test_extract_keeps_fit_ids_of_other_accounts(importer):
+    imported = importer.extract(BANK_QFX, existing=[])
+    # The same FITIDs, imported into another account or from another bank
+    elsewhere = [
+        entry._replace(
+            postings=[posting._replace(account="Assets:Other") for posting in entry.postings]
+        )
+        for entry in imported
+    ]
+    assert importer.extract(BANK_QFX, existing=elsewhere) == imported
+    assert importer.extract(BANK_QFX, existing=elsewhere + imported) == []
+
+
+def test_deduplicate_marks_entries_from_other_files(importer):
+    existing = importer.extract(BANK_QFX, existing=[])
+    entries = importer.extract(BANK_QFX, existing=[])
+    importer.deduplicate(entries, existing)
+    assert [entry.meta[DUPLICATE] for entry in entries] == existing
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    """Three downloads of the same account, with distinct FITIDs and dates."""
+    FILE_INDEX.clear()
+    content = Path(BANK_QFX).read_text()
+    paths = []
+    for month in range(1, 4):
+        path = tmp_path / f"bank-{month}.qfx"
+        path.write_text(content.replace("CHK-", f"CHK-{month}-").replace("2024", f"202{month + 3}"))
+        paths.append(str(path))
+    yield paths
+    FILE_INDEX.clear()
+
+
+def test_importer_handles_several_files(downloads):
+    importer = QfxImporter(org="Ally", acctid_suffix="1111", bean_account="Assets:Checking")
+    assert all(importer.identify(path) for path in downloads)
+    # Results don't depend on which file was identified last
+    assert [importer.date(path).year for path in downloads] == [2024, 2025, 2026]
+    fit_ids = [entry.meta["fitid"] for entry in importer.extract(downloads[0], existing=[])]
+    assert fit_ids == ["CHK-1-0001", "CHK-1-0002"]
+
+
+def test_importer_is_thread_safe(downloads):
+    importer = QfxImporter(org="Ally", acctid_suffix="1111", bean_account="Assets:Checking")
+
+    def extract(path):
+        assert importer.identify(path)
+        return path, [entry.meta["fitid"] for entry in importer.extract(path, existing=[])]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = dict(executor.map(extract, downloads * 4))
+    for month, path in enumerate(downloads, start=1):
+        assert results[path] == [f"CHK-{month}-0001", f"CHK-{month}-0002"]
+
+
+# Savings transactions dated before, between and after the checking ones
+SAVINGS_TRANSACTIONS = """<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240110120000.000[-5:EST]
+<TRNAMT>50.00
+<FITID>SAV-0002
+<NAME>Transfer
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240101120000.000[-5:EST]
+<TRNAMT>25.00
+<FITID>SAV-0003
+<NAME>Transfer
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>INT"""
+
+
+def test_extract_merges_statements_in_order(tmp_path):
+    FILE_INDEX.clear()
+    path = tmp_path / "bank.qfx"
+    path.write_text(
+        Path(BANK_QFX).read_text().replace("<STMTTRN>\n<TRNTYPE>INT", SAVINGS_TRANSACTIONS)
+    )
+    importer = QfxImporter(
+        org="Ally",
+        acctid_suffix="1111",
+        bean_account="Assets:Checking",
+        bundle_accounts={"2222": "Assets:Savings"},
+    )
+    assert importer.identify(str(path))
+    entries = importer.extract(str(path), existing=[])
+    # The accounts' entries interleave by date
+    assert [entry.meta["fitid"] for entry in entries] == [
+        "SAV-0003",
+        "CHK-0001",
+        "SAV-0002",
+        "CHK-0002",
+        "SAV-0001",
+    ]
+    assert entries == data.sorted(entries)
+
+
+def test_merge_entries_across_files(downloads):
+    importer = QfxImporter(org="Ally", acctid_suffix="1111", bean_account="Assets:Checking")
+    streams = [importer.iter_entries(path, index=EntryIndex()) for path in reversed(downloads)]
+    dates = [entry.date for entry in merge_entries(streams)]
+    assert len(dates) == 6
+    assert dates == sorted(dates)
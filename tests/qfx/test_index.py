@@ -0,0 +1,188 @@
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import pytest
+
+from copeland_ledger.importers.qfx import QfxImporter
+from copeland_ledger.qfx.extract import HEADER_BYTES, scan_account_ids
+from copeland_ledger.qfx.index import FILE_INDEX, QfxFileIndex
+from copeland_ledger.qfx.load import load
+from copeland_ledger.suffixes import SuffixMap
+
+BANK_QFX = Path(__file__).parent / "bank.qfx"
+
+
+@pytest.fixture
+def bank_qfx(tmp_path):
+    path = tmp_path / "bank.qfx"
+    shutil.copy(BANK_QFX, path)
+    FILE_INDEX.clear()
+    yield path
+    FILE_INDEX.clear()
+
+
+def test_index_records_every_account_id(bank_qfx):
+    qfx_file = QfxFileIndex().get(bank_qfx)
+    assert qfx_file.account_ids == ["000011111111", "000022222222"]
+    assert qfx_file.account_suffix(SuffixMap([("2222", None), ("1111", None)])) == "1111"
+    assert qfx_file.contains_account_id_suffix("2222")
+
+
+def test_index_reuses_unchanged_file(bank_qfx):
+    index = QfxFileIndex()
+    qfx_file = index.get(bank_qfx)
+    assert index.get(str(bank_qfx)) is qfx_file
+    assert qfx_file.statement_list is qfx_file.statement_list
+
+
+def test_index_rereads_modified_file(bank_qfx):
+    index = QfxFileIndex()
+    qfx_file = index.get(bank_qfx)
+    bank_qfx.write_text(bank_qfx.read_text().replace("000011111111", "000033333333"))
+    os.utime(bank_qfx, ns=(0, qfx_file.mtime_ns + 1))
+    assert index.get(bank_qfx).account_ids == ["000033333333", "000022222222"]
+
+
+def test_index_reads_files_concurrently(bank_qfx, monkeypatch):
+    other = bank_qfx.with_name("other.qfx")
+    shutil.copy(BANK_QFX, other)
+    reading, release = threading.Event(), threading.Event()
+
+    def scan(path, limit):
+        if path == bank_qfx.resolve():
+            reading.set()
+            release.wait(timeout=5)
+        return scan_account_ids(path=path, limit=limit)
+
+    monkeypatch.setattr("copeland_ledger.qfx.index.scan_account_ids", scan)
+    index = QfxFileIndex()
+    first = threading.Thread(target=index.get, args=(bank_qfx,))
+    first.start()
+    reading.wait(timeout=5)
+    # Another file is indexed while the first is still being read
+    second = threading.Thread(target=index.get, args=(other,))
+    second.start()
+    second.join(timeout=2)
+    blocked = second.is_alive()
+    release.set()
+    first.join()
+    second.join()
+    assert not blocked
+    assert index.get(bank_qfx).account_ids == ["000011111111", "000022222222"]
+
+
+def test_importers_share_index(bank_qfx, monkeypatch):
+    loads = []
+    monkeypatch.setattr(
+        "copeland_ledger.qfx.load.load", lambda path: loads.append(path) or load(path)
+    )
+    bundle_accounts = {"1111": "Assets:Checking", "2222": "Assets:Savings"}
+    checking = QfxImporter(
+        org="Ally",
+        acctid_suffix="1111",
+        bean_account="Assets:Checking",
+        bundle_accounts=bundle_accounts,
+    )
+    savings = QfxImporter(
+        org="Ally",
+        acctid_suffix="2222",
+        bean_account="Assets:Savings",
+        bundle_accounts=bundle_accounts,
+    )
+    assert checking.identify(str(bank_qfx))
+    assert not savings.identify(str(bank_qfx))
+    assert checking.identify(str(bank_qfx))
+    assert len(loads) == 1
+    entries = checking.extract(str(bank_qfx), existing=[])
+    assert [entry.narration for entry in entries] == [
+        "Payroll & Co",
+        "Grocery Store",
+        "Interest Paid",
+    ]
+
+
+def test_importer_identifies_file_behind_unconfigured_account(bank_qfx):
+    bank_qfx.write_text(bank_qfx.read_text().replace("000011111111", "000099999999"))
+    bundle_accounts = {"2222": "Assets:Savings", "3333": "Assets:Other"}
+    savings = QfxImporter(
+        org="Ally",
+        acctid_suffix="2222",
+        bean_account="Assets:Savings",
+        bundle_accounts=bundle_accounts,
+    )
+    other = QfxImporter(
+        org="Ally",
+        acctid_suffix="3333",
+        bean_account="Assets:Other",
+        bundle_accounts=bundle_accounts,
+    )
+    assert savings.identify(str(bank_qfx))
+    assert not other.identify(str(bank_qfx))
+    entries = savings.extract(str(bank_qfx), existing=[])
+    assert [entry.meta["fitid"] for entry in entries] == ["SAV-0001"]
+
+
+def test_importer_extracts_bundled_accounts(bank_qfx):
+    checking = QfxImporter(
+        org="Ally",
+        acctid_suffix="1111",
+        bean_account="Assets:Checking",
+        bundle_accounts={"1111": "Assets:Checking", "2222": "Assets:Savings"},
+    )
+    assert checking.identify(str(bank_qfx))
+    entries = checking.extract(str(bank_qfx), existing=[])
+    assert [entry.postings[0].account for entry in entries] == [
+        "Assets:Checking",
+        "Assets:Checking",
+        "Assets:Savings",
+    ]
+
+
+def test_importer_dispatches_to_longest_suffix(bank_qfx):
+    bundle_accounts = {"111": "Assets:Other", "1111": "Assets:Checking", "2222": "Assets:Savings"}
+    other = QfxImporter(
+        org="Ally",
+        acctid_suffix="111",
+        bean_account="Assets:Other",
+        bundle_accounts=bundle_accounts,
+    )
+    checking = QfxImporter(
+        org="Ally",
+        acctid_suffix="1111",
+        bean_account="Assets:Checking",
+        bundle_accounts=bundle_accounts,
+    )
+    # 000011111111 ends with both suffixes, and belongs to the longer one only
+    assert not other.identify(str(bank_qfx))
+    assert checking.identify(str(bank_qfx))
+    entries = checking.extract(str(bank_qfx), existing=[])
+    assert [entry.postings[0].account for entry in entries] == [
+        "Assets:Checking",
+        "Assets:Checking",
+        "Assets:Savings",
+    ]
+    assert other.statements(str(bank_qfx)).keys() == {"Assets:Checking", "Assets:Savings"}
+
+
+def test_index_scans_past_header_only_when_needed(tmp_path):
+    path = tmp_path / "large.qfx"
+    padding = "<STMTTRN>\n" * (HEADER_BYTES // 10)
+    path.write_text(f"<OFX>\n<ACCTID>000011111111\n{padding}<ACCTID>000022222222\n</OFX>\n")
+    qfx_file = QfxFileIndex().get(path)
+    assert qfx_file.header_account_ids == ["000011111111"]
+    assert not qfx_file.complete
+    assert qfx_file.account_suffix(SuffixMap([("1111", None)])) == "1111"
+    assert qfx_file._account_ids is None
+    assert qfx_file.account_suffix(SuffixMap([("2222", None)])) == "2222"
+    assert qfx_file.account_ids == ["000011111111", "000022222222"]
+
+
+def test_scan_account_ids_drops_cut_off_id(tmp_path):
+    path = tmp_path / "cut.qfx"
+    path.write_bytes(b"<ACCTID>000011111111\n<ACCTID>000022222222\n")
+    assert scan_account_ids(path, limit=30) == (["000011111111"], False)
+    assert scan_account_ids(path) == (["000011111111", "000022222222"], True)
+    (tmp_path / "empty.qfx").write_bytes(b"")
+    assert scan_account_ids(tmp_path / "empty.qfx") == ([], True)
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+from copeland_ledger.qfx.load import load_statement, load_statements
+
+BANK_QFX = str(Path(__file__).parent / "bank.qfx")
+
+
+def test_load_statement():
+    statement = load_statement(path=BANK_QFX, acctid_suffix="2222")
+    assert statement.acct_id == "000022222222"
+
+
+def test_load_statements_dispatches_every_account():
+    statements = load_statements(path=BANK_QFX, acctid_suffixes=["1111", "2222", "3333"])
+    assert list(statements) == ["1111", "2222"]
+    assert [t.fit_id for t in statements["1111"].transactions] == ["CHK-0001", "CHK-0002"]
+    assert [t.fit_id for t in statements["2222"].transactions] == ["SAV-0001"]
@@ -0,0 +1,120 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from copeland_ledger.qfx import stream
+from copeland_ledger.qfx.extract import parse_ofx
+from copeland_ledger.qfx.load import load
+from copeland_ledger.qfx.stream import UnsupportedOFXError, stream_ofx
+from copeland_ledger.qfx.transform import transform_ofx
+
+QFX_DIR = Path(__file__).parent
+
+XML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+    '<?OFX OFXHEADER="200" VERSION="220" SECURITY="NONE" OLDFILEUID="NONE" NEWFILEUID="NONE"?>\n'
+)
+
+
+def to_xml(sgml: str) -> str:
+    """Convert an SGML (v1) OFX document to XML (v2) by closing every data element."""
+    body = sgml[sgml.index("<OFX>") :]
+    return XML_HEADER + re.sub(r"<([A-Z0-9.]+)>([^<\n]+)", r"<\1>\2</\1>", body)
+
+
+@pytest.fixture(params=["bank.qfx", "invest.qfx"])
+def qfx_path(request):
+    return QFX_DIR / request.param
+
+
+def test_stream_matches_ofxtools(qfx_path):
+    assert stream_ofx(qfx_path) == transform_ofx(parse_ofx(qfx_path))
+
+
+def test_stream_matches_ofxtools_xml(qfx_path, tmp_path):
+    path = tmp_path / qfx_path.name
+    path.write_text(to_xml(qfx_path.read_text()))
+    assert stream_ofx(path) == transform_ofx(parse_ofx(path))
+
+
+def test_stream_across_chunk_boundaries(qfx_path):
+    expected = stream_ofx(qfx_path)
+    tokens = list(stream.iter_tokens(qfx_path, chunk_size=7))
+    assert tokens == list(stream.iter_tokens(qfx_path))
+    parser = stream.StreamParser()
+    for token in tokens:
+        parser.feed(*token)
+    assert parser.statement_list() == expected
+
+
+def test_stream_decodes_characters_across_chunk_boundaries(tmp_path):
+    path = tmp_path / "bank.qfx"
+    path.write_text(to_xml((QFX_DIR / "bank.qfx").read_text()).replace("Grocery", "Café Grocery"))
+    expected = stream_ofx(path)
+    # Split every multi-byte character between two chunks
+    content = path.read_bytes()
+    split = content.index("é".encode()) + 1
+    for chunk_size in (split, 7):
+        tokens = list(stream.iter_tokens(path, chunk_size=chunk_size))
+        assert tokens == list(stream.iter_tokens(path))
+    assert expected.statements[0].transactions[1].memo == "Café Grocery Store"
+
+
+def test_stream_ignores_payee_name(tmp_path):
+    path = tmp_path / "payee.qfx"
+    path.write_text(
+        (QFX_DIR / "bank.qfx")
+        .read_text()
+        .replace("<NAME>Grocery Store", "<PAYEE>\n<NAME>Grocery Store Inc\n</PAYEE>")
+        .replace("<TRNAMT>-42.50", "<TRNAMT>-42.50\n<NAME>Grocery Store")
+    )
+    statement = stream_ofx(path).statements[0]
+    assert [t.memo for t in statement.transactions] == ["Payroll & Co", "Grocery Store"]
+
+
+def test_load_falls_back_to_ofxtools(tmp_path):
+    path = tmp_path / "cdata.qfx"
+    path.write_text(
+        (QFX_DIR / "bank.qfx").read_text().replace("Grocery Store", "<![CDATA[Grocery & Co]]>")
+    )
+    with pytest.raises(UnsupportedOFXError):
+        stream_ofx(path)
+    statement = load(str(path)).statements[0]
+    assert statement.transactions[1].memo == "Grocery & Co"
+
+
+def test_load_fallback_counts_one_parse(tmp_path, timings):
+    path = tmp_path / "cdata.qfx"
+    path.write_text(
+        (QFX_DIR / "bank.qfx").read_text().replace("Grocery Store", "<![CDATA[Grocery & Co]]>")
+    )
+    load(str(path))
+    assert timings["parse"].calls == 1
+
+
+def test_load_cash_income(tmp_path):
+    path = tmp_path / "income.qfx"
+    income = """<INCOME>
+<INVTRAN>
+<FITID>INV-0004
+<DTTRADE>20240125120000.000[-5:EST]
+<DTSETTLE>20240125120000.000[-5:EST]
+<MEMO>Dividend VTSAX
+</INVTRAN>
+<SECID>
+<UNIQUEID>922908728
+<UNIQUEIDTYPE>CUSIP
+</SECID>
+<INCOMETYPE>DIV
+<TOTAL>12.34
+<SUBACCTSEC>CASH
+<SUBACCTFUND>CASH
+</INCOME>
+</INVTRANLIST>"""
+    path.write_text((QFX_DIR / "invest.qfx").read_text().replace("</INVTRANLIST>", income))
+    # Cash income has no UNITS; it doesn't change the number of units held
+    for statement_list in (stream_ofx(path), transform_ofx(parse_ofx(path)), load(str(path))):
+        transaction = statement_list.statements[0].transactions[-1]
+        assert transaction.fit_id == "INV-0004"
+        assert transaction.units == 0
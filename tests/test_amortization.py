@@ -1,9 +1,30 @@
 import datetime as dt
+import io
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+import numpy_financial as npf
+import pytest
+import yaml
+from beancount.core import amount, data, flags
+from beancount.parser import printer
+from click.testing import CliRunner
 
 from copeland_ledger.amortization import (
+    PAYOFF_TOLERANCE,
     LoanDetail,
     amortization_table,
+    amortize,
+    amortize_scenarios,
+    output_beancount_amortization_table,
+    payment_date,
+    payment_period,
+    scenario_grid,
+    schedule_payments,
+    write_beancount_payments,
 )
+from copeland_ledger.scripts.beanpod import amortization
 
 
 def test_loan_detail_from_config_file(tmp_path):
@@ -49,9 +70,196 @@ def test_amortization_table():
     )
     df = amortization_table(loan)
     assert df.shape == (12, 9)
-    assert df["payment"].sum() == -10272.84
-    assert df["principal"].sum() == -10000.0
-    assert df["interest"].sum() == -272.89
+    assert df["payment"].sum() == pytest.approx(-10272.89)
+    assert df["principal"].sum() == pytest.approx(-10000.0)
+    assert df["interest"].sum() == pytest.approx(-272.89)
     assert df["principal_addl"].sum() == 0
     assert df["monthly_payment"].sum() == -10272.84
     assert df.iloc[-1]["curr_balance"] == 0
+
+
+def loan_detail(**kwargs) -> LoanDetail:
+    return LoanDetail(
+        **{
+            "interest_rate": 0.06,
+            "years": 30,
+            "principal": 300000,
+            "monthly_payment": -2500,
+            "start_date": dt.date(2000, 1, 1),
+            "account_bank": "Assets:Checking",
+            "account_liability": "Liabilities:Mortgage",
+            "account_interest_expense": "Expenses:Interest",
+            "account_escrow": "Assets:Escrow",
+        }
+        | kwargs
+    )
+
+
+def amortize_loop(principal, rate, periods, extra):
+    """Reference schedule computed one payment at a time."""
+    payment = -npf.pmt(rate, periods, principal)
+    balance, rows = principal, []
+    for k in range(periods):
+        interest = balance * rate
+        scheduled = min(payment - interest, balance)
+        addl = balance - scheduled if k == periods - 1 else min(extra[k], balance - scheduled)
+        balance -= scheduled + addl
+        rows.append((scheduled, interest, addl, balance))
+        if balance <= PAYOFF_TOLERANCE:
+            break
+    return np.array(rows)
+
+
+def test_amortize_matches_recurrence():
+    extra = np.random.default_rng(0).uniform(0, 500, 360)
+    schedule = amortize(principal=300000, rate=0.005, periods=360, extra=extra)
+    expected = amortize_loop(300000, 0.005, 360, extra)
+    payoff = len(expected)
+    assert schedule.payoff.tolist() == [payoff]
+    assert payoff < 360
+    actual = [schedule.principal, schedule.interest, schedule.extra, schedule.balance]
+    for i, column in enumerate(actual):
+        np.testing.assert_allclose(column[0, :payoff], expected[:, i], atol=1e-6)
+        assert not column[0, payoff:].any()
+
+
+def test_amortize_many_loans():
+    principal = np.array([100000, 200000, 300000])
+    schedule = amortize(
+        principal=principal, rate=0.005, periods=[120, 240, 360], extra=[[0], [100], [0]]
+    )
+    assert schedule.payoff[[0, 2]].tolist() == [120, 360]
+    assert schedule.payoff[1] < 240
+    np.testing.assert_allclose((schedule.principal + schedule.extra).sum(axis=1), principal)
+
+
+def test_amortization_table_extra_principal():
+    df = amortization_table(loan_detail())
+    assert len(df) == 360
+    with_extra = amortization_table(
+        loan_detail(addl_principal=200, addl_principal_schedule={dt.date(2001, 1, 1): 10000})
+    )
+    assert len(with_extra) < 360
+    assert with_extra.loc[13, "principal_addl"] == -10200
+    assert abs(with_extra["interest"].sum()) < abs(df["interest"].sum())
+    assert with_extra.iloc[-1]["curr_balance"] == 0
+    assert round(with_extra.iloc[-1]["principal_cum"]) == -300000
+
+
+def test_amortize_scenarios():
+    grid = scenario_grid(principal=[300000], rate=[0.05, 0.06], years=[15, 30], extra=[0, 500])
+    scenarios = amortize_scenarios(**grid)
+    assert scenarios.schedule.balance.shape == (8, 360)
+    for i in range(8):
+        single = amortize(
+            principal=grid["principal"][i],
+            rate=grid["rate"][i] / 12,
+            periods=grid["years"][i] * 12,
+            extra=grid["extra"][i],
+        )
+        assert scenarios.payoff[i] == single.payoff[0]
+        np.testing.assert_allclose(scenarios.total_interest[i], single.interest.sum())
+    no_extra = grid["extra"] == 0
+    np.testing.assert_allclose(scenarios.interest_saved[no_extra], 0, atol=1e-6)
+    assert (scenarios.interest_saved[~no_extra] > 0).all()
+
+
+def test_amortization_sweep(tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump({"loans": {"mortgage": loan_detail().model_dump()}}))
+    result = CliRunner().invoke(
+        amortization,
+        ["--config-path", str(config_path), "--sweep", "--rate", "0.05", "--rate", "0.06"]
+        + ["--extra", "0", "--extra", "250"],
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert len(lines) == 5
+    assert "interest_saved" in lines[0]
+
+
+def test_amortization_table_matches_payments():
+    loan = loan_detail(addl_principal=200, addl_principal_schedule={dt.date(2001, 1, 1): 10000})
+    df = amortization_table(loan)
+    payments = list(schedule_payments(loan))
+    assert len(payments) == len(df)
+    for payment in payments:
+        row = df.loc[payment.period]
+        assert row["date"].date() == payment.date
+        assert row["principal"] == -float(payment.principal)
+        assert row["interest"] == -float(payment.interest)
+        assert row["principal_addl"] == -float(payment.principal_addl)
+        assert row["curr_balance"] == float(payment.balance)
+    assert payments[-1].balance == 0
+    assert sum(p.principal + p.principal_addl for p in payments) == Decimal("300000.00")
+    assert df.iloc[-1]["principal_cum"] == -300000
+    window = amortization_table(loan, start=13, stop=23)
+    assert window.index.tolist() == list(range(13, 23))
+    assert window["principal"].tolist() == df.loc[13:22, "principal"].tolist()
+
+
+def test_output_beancount_amortization_table(capsys):
+    loan = loan_detail(addl_principal=200)
+    output_beancount_amortization_table(amortization_table(loan, stop=4), loan=loan)
+    expected = io.StringIO()
+    write_beancount_payments(payments=schedule_payments(loan, stop=4), loan=loan, file=expected)
+    assert capsys.readouterr().out == expected.getvalue()
+
+
+def test_write_beancount_payments_matches_printer():
+    loan = loan_detail(addl_principal=200)
+    payments = list(islice(schedule_payments(loan), 3))
+    output = io.StringIO()
+    write_beancount_payments(payments=payments, loan=loan, file=output)
+
+    def posting(account, number=None):
+        units = amount.Amount(number, loan.currency) if number is not None else None
+        return data.Posting(account, units, None, None, None, None)
+
+    entries = [
+        data.Transaction(
+            data.new_metadata("<build_transaction>", 0),
+            payment.date,
+            flags.FLAG_OKAY,
+            None,
+            "Mortgage payment",
+            data.EMPTY_SET,
+            data.EMPTY_SET,
+            [
+                posting(loan.account_bank, Decimal("-2500.00")),
+                posting(loan.account_liability, payment.principal + payment.principal_addl),
+                posting(loan.account_interest_expense, payment.interest),
+                posting(loan.account_escrow),
+            ],
+        )
+        for payment in payments
+    ]
+    expected = io.StringIO()
+    printer.print_entries(entries, file=expected)
+    assert output.getvalue() == expected.getvalue()
+
+
+def test_schedule_payments_window():
+    loan = loan_detail(
+        start_date=dt.date(2000, 1, 15),
+        addl_principal=200,
+        addl_principal_schedule={dt.date(2001, 2, 1): 10000, dt.date(2010, 6, 1): 5000},
+    )
+    payments = list(schedule_payments(loan))
+    for start in (2, 13, 14, 150, len(payments)):
+        assert (
+            list(schedule_payments(loan, start=start, stop=start + 10))
+            == payments[start - 1 : start + 9]
+        )
+    assert list(schedule_payments(loan, start=len(payments) + 1)) == []
+
+
+def test_payment_period():
+    start_date = dt.date(2000, 1, 15)
+    assert payment_date(start_date, 1) == dt.date(2000, 2, 1)
+    assert payment_period(start_date, dt.date(1999, 1, 1)) == 1
+    assert payment_period(start_date, dt.date(2000, 2, 1)) == 1
+    assert payment_period(start_date, dt.date(2000, 2, 2)) == 2
+    assert payment_date(start_date, payment_period(start_date, dt.date(2024, 7, 1))) == dt.date(
+        2024, 7, 1
+    )
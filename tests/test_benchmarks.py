@@ -0,0 +1,30 @@
+from pypdf import PdfReader
+
+from benchmarks import generate
+from benchmarks.__main__ import compare, run
+from benchmarks.suite import BENCHMARKS
+from copeland_ledger.qfx.load import load
+
+
+def test_generated_qfx_files(tmp_path):
+    bank = load(str(generate.write_bank_qfx(tmp_path / "bank.qfx", transactions=5, accounts=2)))
+    assert [s.acct_id[-4:] for s in bank.statements] == ["1111", "2222"]
+    card = load(str(generate.write_bank_qfx(tmp_path / "cc.qfx", transactions=5, credit_card=True)))
+    assert len(card.statements[0].transactions) == 5
+    invest = load(str(generate.write_invest_qfx(tmp_path / "invest.qfx", transactions=6)))
+    statement = invest.statements[0]
+    assert {s.ticker for s in statement.securities.values()} == {"VTSAX", "VFIAX", "AAPL"}
+    assert len(statement.transactions) == 6
+
+
+def test_generated_pdf(tmp_path):
+    path = generate.write_pdf(tmp_path / "statement.pdf", pages=3, footer="Chase (1111)")
+    reader = PdfReader(path)
+    assert len(reader.pages) == 3
+    assert "Chase (1111)" in reader.pages[-1].extract_text()
+
+
+def test_benchmarks_run(tmp_path):
+    results = run(directory=tmp_path, quick=True)
+    assert len(results) == len(BENCHMARKS)
+    assert compare(results, baseline=dict.fromkeys(results, 0.0)) == list(results)
@@ -0,0 +1,32 @@
+import os
+
+from copeland_ledger.cache import TextCache
+
+
+def test_text_cache_is_content_addressed(tmp_path):
+    cache = TextCache(directory=tmp_path / "cache")
+    first = tmp_path / "first.pdf"
+    first.write_bytes(b"same bytes")
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(b"same bytes")
+    assert cache.get(first) is None
+    cache.put(first, "extracted text")
+    assert cache.get(copy) == "extracted text"
+
+
+def test_text_cache_evicts_least_recently_used(tmp_path):
+    cache = TextCache(directory=tmp_path / "cache", max_bytes=10)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.pdf"
+        path.write_bytes(bytes([i]))
+        paths.append(path)
+    cache.put(paths[0], "aaaa")
+    cache.put(paths[1], "bbbb")
+    # Make the first entry the least recently used
+    entry = cache.directory / f"{cache.key(paths[0])}.txt"
+    os.utime(entry, ns=(0, 0))
+    cache.put(paths[2], "cccc")
+    assert cache.get(paths[0]) is None
+    assert cache.get(paths[1]) == "bbbb"
+    assert cache.get(paths[2]) == "cccc"
@@ -1,8 +1,10 @@
 import datetime as dt
 
+import pytest
 import yaml
 
-from copeland_ledger.config import Account, Config, Loan, PdfArchive
+from copeland_ledger import config
+from copeland_ledger.config import Account, Config, Loan, PdfArchive, load_config
 
 
 def test_account():
@@ -119,3 +121,66 @@ def test_config_with_loans():
     assert mortgage.account_liability == "Liabilities:Mortgage"
     assert mortgage.account_interest_expense == "Expenses:Interest"
     assert mortgage.account_escrow == "Assets:Escrow"
+
+
+CONFIG = """
+accounts:
+  - bean_account: Assets:US:Amex:Checking
+    org: Amex
+    acctid_suffix: "1111"
+  - bean_account: Assets:US:Amex:Savings
+    org: Amex
+    acctid_suffix: "2222"
+  - bean_account: Assets:US:Ally:Checking
+    org: Ally
+    acctid_suffix: "11111"
+  - bean_account: Assets:US:Chase:Savings
+    org: Chase
+    acctid_suffix: "2222"
+"""
+
+
+def test_load_config_lookups(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    loaded = load_config(path)
+    assert [a.bean_account for a in loaded.accounts_by_org["Amex"]] == [
+        "Assets:US:Amex:Checking",
+        "Assets:US:Amex:Savings",
+    ]
+    assert [a.bean_account for a in loaded.accounts_by_org["Chase"]] == ["Assets:US:Chase:Savings"]
+
+
+def test_load_config_is_cached_until_changed(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    loaded = load_config(path)
+    assert load_config(path) is loaded
+    path.write_text(CONFIG.replace('"2222"', '"3333"'))
+    reloaded = load_config(path)
+    assert reloaded is not loaded
+    assert reloaded.accounts_by_org["Chase"][0].acctid_suffix == "3333"
+
+
+def test_load_config_snapshot(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    loaded = load_config(path, snapshot_dir=tmp_path / "snapshots")
+    # A new process reads the snapshot without parsing YAML
+    monkeypatch.setattr(config, "_loaded", {})
+    monkeypatch.setattr(yaml, "safe_load", None)
+    snapshot = load_config(path, snapshot_dir=tmp_path / "snapshots")
+    assert snapshot is not loaded
+    assert snapshot.config == loaded.config
+
+
+def test_load_config_snapshot_version(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    load_config(path, snapshot_dir=tmp_path / "snapshots")
+    # A snapshot of another format version is not read
+    monkeypatch.setattr(config, "_loaded", {})
+    monkeypatch.setattr(config, "SNAPSHOT_VERSION", config.SNAPSHOT_VERSION + 1)
+    monkeypatch.setattr(yaml, "safe_load", None)
+    with pytest.raises(TypeError):
+        load_config(path, snapshot_dir=tmp_path / "snapshots")
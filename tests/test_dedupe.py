@@ -0,0 +1,81 @@
+import datetime as dt
+from decimal import Decimal
+
+from beancount.core import amount, data, flags
+
+from copeland_ledger.dedupe import EntryIndex, ExistingIndex
+
+
+def posting(account, number):
+    return data.Posting(account, amount.Amount(Decimal(number), "USD"), None, None, None, None)
+
+
+def transaction(date, number, fit_id=None, account="Assets:Checking", postings=()):
+    meta = data.new_metadata("<test>", 0, kvlist={"fitid": fit_id} if fit_id else None)
+    postings = [posting(account, number), *postings]
+    return data.Transaction(
+        meta, date, flags.FLAG_OKAY, None, "", data.EMPTY_SET, data.EMPTY_SET, postings
+    )
+
+
+def test_find_duplicate_by_fit_id():
+    existing = transaction(dt.date(2024, 1, 2), "10.00", fit_id="A1")
+    index = EntryIndex([existing])
+    assert index.find_duplicate(transaction(dt.date(2024, 1, 3), "99", "A1"), set()) is existing
+    assert index.find_duplicate(transaction(dt.date(2024, 1, 2), "10.00", "B2"), set()) is None
+
+
+def test_find_duplicate_by_key_matches_once():
+    existing = transaction(dt.date(2024, 1, 2), "-5.00")
+    index = EntryIndex([existing])
+    used = set()
+    new = transaction(dt.date(2024, 1, 2), "-5.00", fit_id="C3")
+    assert index.find_duplicate(new, used) is existing
+    assert index.find_duplicate(new, used) is None
+    assert (
+        index.find_duplicate(transaction(dt.date(2024, 1, 2), "-5.00", account="X"), used) is None
+    )
+
+
+def test_find_duplicate_by_fit_id_per_account():
+    checking = transaction(dt.date(2024, 1, 2), "10.00", fit_id="A1")
+    brokerage = transaction(dt.date(2024, 1, 2), "1", fit_id="A1", account="Assets:Broker:VTSAX")
+    index = EntryIndex([checking])
+    new = transaction(dt.date(2024, 1, 3), "99", "A1", account="Assets:Savings")
+    # FITIDs are only unique within an account
+    assert index.find_duplicate(new, set()) is None
+    assert index.find_duplicate(new, set(), account="Assets:Checking") is checking
+    index.add([brokerage])
+    # An account's FITIDs include those of its sub-accounts
+    assert index.find_duplicate(new, set(), account="Assets:Broker") is brokerage
+
+
+def test_find_duplicate_by_key_matches_any_posting():
+    # Entered by hand, expense first, bank side second
+    existing = transaction(
+        dt.date(2024, 1, 2),
+        "42.50",
+        account="Expenses:Food",
+        postings=[posting("Assets:Checking", "-42.50")],
+    )
+    index = EntryIndex([existing])
+    used = set()
+    assert index.find_duplicate(transaction(dt.date(2024, 1, 2), "-42.50", "D4"), used) is existing
+    # Absorbing one import uses up the whole entry, whichever leg matched
+    new = transaction(dt.date(2024, 1, 2), "42.50", "E5", account="Expenses:Food")
+    assert index.find_duplicate(new, used) is None
+
+
+def test_existing_index_extends_as_entries_are_appended():
+    existing = [transaction(dt.date(2024, 1, 2), "10.00", fit_id="A1")]
+    existing_index = ExistingIndex()
+    index = existing_index.of(existing)
+    existing.append(transaction(dt.date(2024, 1, 3), "20.00", fit_id="B2"))
+    assert existing_index.of(existing) is index
+    assert index.find_fit_id(transaction(dt.date(2024, 1, 3), "20.00", "B2")) is existing[1]
+    # Another list, or one whose indexed entries changed, is indexed anew
+    assert existing_index.of(list(existing)) is not index
+    other = list(existing)
+    existing_index.of(other)
+    other[-1] = transaction(dt.date(2024, 1, 4), "30.00", fit_id="C3")
+    assert existing_index.of(other).find_fit_id(other[-1]) is other[-1]
@@ -0,0 +1,110 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from copeland_ledger.qfx.index import FILE_INDEX
+from copeland_ledger.scripts.beangulp_importer import main
+
+TESTS = Path(__file__).parent
+
+CONFIG = """
+accounts:
+  - bean_account: Assets:Checking
+    org: Ally
+    acctid_suffix: "1111"
+  - bean_account: Assets:Savings
+    org: Ally
+    acctid_suffix: "2222"
+  - bean_account: Assets:Vanguard
+    org: Vanguard
+    acctid_suffix: "7777"
+"""
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    shutil.copy(TESTS / "qfx" / "bank.qfx", downloads / "bank.qfx")
+    shutil.copy(TESTS / "qfx" / "invest.qfx", downloads / "invest.qfx")
+    FILE_INDEX.clear()
+    yield downloads
+    FILE_INDEX.clear()
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = tmp_path / "accounts.yaml"
+    config.write_text(CONFIG)
+    return config
+
+
+def insert(config: Path, ledger_dir: Path, *args: str) -> str:
+    result = CliRunner().invoke(
+        main, ["--config", str(config), "insert", "--ledger-dir", str(ledger_dir), *args]
+    )
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_insert_into_ledger_files(downloads, config, tmp_path):
+    ledger_dir = tmp_path / "ledger"
+    insert(config, ledger_dir, str(downloads))
+    checking = (ledger_dir / "Assets" / "Checking.beancount").read_text()
+    assert checking.count('fitid: "CHK-') == 2
+    assert 'fitid: "SAV-0001"' in (ledger_dir / "Assets" / "Savings.beancount").read_text()
+
+
+def test_insert_skips_existing_entries(downloads, config, tmp_path):
+    existing = tmp_path / "existing.beancount"
+    existing.write_text(
+        """
+2024-01-01 open Assets:Checking
+
+2024-01-02 * "Imported before"
+  fitid: "CHK-0001"
+  Assets:Checking  1.00 USD
+"""
+    )
+    ledger_dir = tmp_path / "ledger"
+    insert(config, ledger_dir, "--existing", str(existing), str(downloads))
+    checking = (ledger_dir / "Assets" / "Checking.beancount").read_text()
+    assert "CHK-0001" not in checking
+    assert 'fitid: "CHK-0002"' in checking
+
+
+def test_insert_again_skips_inserted_entries(downloads, config, tmp_path, monkeypatch):
+    ledger_dir = tmp_path / "ledger"
+    insert(config, ledger_dir, str(downloads))
+    checking = ledger_dir / "Assets" / "Checking.beancount"
+    before = checking.read_text()
+    FILE_INDEX.clear()
+    # Dedupes against the files' persisted FITIDs, without parsing them
+    monkeypatch.setattr("beancount.parser.parser.parse_file", None)
+    output = insert(config, ledger_dir, str(downloads))
+    assert "Checking.beancount" not in output
+    assert checking.read_text() == before
+
+
+def test_insert_merges_downloads_in_date_order(downloads, config, tmp_path):
+    content = (downloads / "bank.qfx").read_text()
+    (downloads / "bank-2023.qfx").write_text(
+        content.replace("CHK-", "CHK-2023-").replace("SAV-", "SAV-2023-").replace("2024", "2023")
+    )
+    # The same download twice only inserts its entries once
+    (downloads / "bank-copy.qfx").write_text(content)
+    ledger_dir = tmp_path / "ledger"
+    insert(config, ledger_dir, str(downloads))
+    checking = (ledger_dir / "Assets" / "Checking.beancount").read_text()
+    dates = [line[:10] for line in checking.splitlines() if line[:1].isdigit()]
+    assert dates == ["2023-01-02", "2023-01-15", "2024-01-02", "2024-01-15"]
+
+
+def test_insert_keeps_every_entry_of_a_transaction(downloads, config, tmp_path):
+    ledger_dir = tmp_path / "ledger"
+    insert(config, ledger_dir, str(downloads))
+    vanguard = (ledger_dir / "Assets" / "Vanguard.beancount").read_text()
+    # A dividend's reinvestment and its income share a FITID
+    assert vanguard.count('fitid: "INV-0001"') == 2
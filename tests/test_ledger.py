@@ -0,0 +1,126 @@
+import datetime as dt
+import os
+
+import pytest
+
+from copeland_ledger import ledger
+from copeland_ledger.ledger import load_ledger
+
+MAIN = """
+option "operating_currency" "USD"
+include "accounts/*.beancount"
+
+2024-01-01 open Assets:Checking
+2024-01-01 open Expenses:Groceries
+2024-01-01 open Equity:Opening
+"""
+
+CHECKING = """
+2024-01-02 * "Opening balance"
+  fitid: "CHK-0001"
+  Assets:Checking  100.00 USD
+  Equity:Opening
+
+2024-01-15 * "Groceries"
+  Assets:Checking  -25.00 USD
+  Expenses:Groceries
+
+2024-02-01 balance Assets:Checking  75.00 USD
+"""
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    ledger._loaded.clear()
+    (tmp_path / "accounts").mkdir()
+    (tmp_path / "accounts" / "checking.beancount").write_text(CHECKING)
+    path = tmp_path / "main.beancount"
+    path.write_text(MAIN)
+    yield path
+    ledger._loaded.clear()
+
+
+def test_load_ledger_indexes(ledger_path):
+    loaded = load_ledger(ledger_path)
+    assert loaded.errors == []
+    assert len(loaded.files) == 2
+    assert loaded.index.fit_ids[("Assets:Checking", "CHK-0001")].narration == "Opening balance"
+    checking = loaded.by_account["Assets:Checking"]
+    assert [type(entry).__name__ for entry in checking] == [
+        "Open",
+        "Transaction",
+        "Transaction",
+        "Balance",
+    ]
+    assert [entry.narration for entry in loaded.by_account["Expenses:Groceries"][1:]] == [
+        "Groceries"
+    ]
+    january = loaded.between(dt.date(2024, 1, 2), dt.date(2024, 2, 1))
+    assert [entry.narration for entry in january] == ["Opening balance", "Groceries"]
+    assert len(loaded.between(dt.date(2024, 1, 10), dt.date(2025, 1, 1), "Assets:Checking")) == 2
+    assert loaded.between(dt.date(2024, 1, 1), dt.date(2025, 1, 1), "Assets:Unknown") == []
+
+
+def test_load_ledger_indexes_fit_ids_per_account(ledger_path):
+    savings = ledger_path.parent / "accounts" / "savings.beancount"
+    savings.write_text(
+        """
+2024-01-01 open Assets:Savings
+
+2024-03-01 * "Interest"
+  fitid: "CHK-0001"
+  Assets:Savings  1.00 USD
+  Equity:Opening
+"""
+    )
+    # FITIDs are only unique per account, so both transactions are indexed
+    fit_ids = load_ledger(ledger_path).index.fit_ids
+    assert fit_ids[("Assets:Checking", "CHK-0001")].narration == "Opening balance"
+    assert fit_ids[("Assets:Savings", "CHK-0001")].narration == "Interest"
+
+
+def test_load_ledger_is_cached_until_changed(ledger_path):
+    loaded = load_ledger(ledger_path)
+    assert load_ledger(ledger_path) is loaded
+    included = ledger_path.parent / "accounts" / "checking.beancount"
+    included.write_text(CHECKING.replace("-25.00", "-30.00"))
+    assert load_ledger(ledger_path) is not loaded
+
+
+def test_load_ledger_notices_globbed_files(ledger_path):
+    loaded = load_ledger(ledger_path)
+    savings = ledger_path.parent / "accounts" / "savings.beancount"
+    savings.write_text("2024-01-01 open Assets:Savings\n")
+    assert "Assets:Savings" in load_ledger(ledger_path).by_account
+    assert "Assets:Savings" not in loaded.by_account
+
+
+def test_load_ledger_snapshot(ledger_path, tmp_path, monkeypatch):
+    snapshots = tmp_path / "snapshots"
+    loaded = load_ledger(ledger_path, snapshot_dir=snapshots)
+    # A new process reads the snapshot without beancount's loader
+    ledger._loaded.clear()
+    monkeypatch.setattr("beancount.loader.load_file", None)
+    snapshot = load_ledger(ledger_path, snapshot_dir=snapshots)
+    assert snapshot is not loaded
+    assert snapshot.entries == loaded.entries
+    checking = snapshot.by_account["Assets:Checking"]
+    assert snapshot.index.fit_ids[("Assets:Checking", "CHK-0001")] is checking[1]
+
+    # Touching a file without changing it keeps the snapshot
+    included = ledger_path.parent / "accounts" / "checking.beancount"
+    stat = included.stat()
+    os.utime(included, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    ledger._loaded.clear()
+    assert load_ledger(ledger_path, snapshot_dir=snapshots).entries == loaded.entries
+
+
+def test_load_ledger_snapshot_version(ledger_path, tmp_path, monkeypatch):
+    snapshots = tmp_path / "snapshots"
+    load_ledger(ledger_path, snapshot_dir=snapshots)
+    # A snapshot of another format version is not read
+    ledger._loaded.clear()
+    monkeypatch.setattr(ledger, "SNAPSHOT_VERSION", ledger.SNAPSHOT_VERSION + 1)
+    monkeypatch.setattr("beancount.loader.load_file", None)
+    with pytest.raises(TypeError):
+        load_ledger(ledger_path, snapshot_dir=snapshots)
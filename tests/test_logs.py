@@ -0,0 +1,21 @@
+import logging
+
+import structlog
+
+from copeland_ledger.logs import configure_logging, lazy_debug
+
+
+def test_lazy_debug_skips_fields_below_level(capsys):
+    configure_logging(level=logging.INFO)
+    calls = []
+    lazy_debug(structlog.getLogger(__name__), "Loaded", value=lambda: calls.append(1))
+    assert calls == []
+    assert capsys.readouterr().err == ""
+
+
+def test_lazy_debug_computes_fields_when_enabled(capsys):
+    configure_logging(level="debug")
+    lazy_debug(structlog.getLogger(__name__), "Loaded", value=lambda: 42)
+    captured = capsys.readouterr()
+    assert "value=42" in captured.err
+    assert captured.out == ""
@@ -0,0 +1,64 @@
+import datetime as dt
+import pickle
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+from copeland_ledger.models import Statement, Transaction, TransactionBatch
+
+COLUMNS = {
+    "fit_id": ["b", "a", "c"],
+    "date_posted": ["2024-01-03T00:00:00Z", "2024-01-01T00:00:00Z", "2024-01-01T00:00:00Z"],
+    "memo": ["Third", "First", "Second"],
+    "amount": ["1.50", "-2", "3"],
+    "currency": ["USD", "USD", "USD"],
+}
+
+
+@pytest.fixture
+def batch():
+    return TransactionBatch.from_columns(model=Transaction, columns=COLUMNS)
+
+
+def test_batch_validates_columns(batch):
+    assert batch.column("amount").tolist() == [Decimal("1.50"), Decimal("-2"), Decimal("3")]
+    with pytest.raises(ValidationError):
+        TransactionBatch.from_columns(model=Transaction, columns=COLUMNS | {"amount": ["x"] * 3})
+    with pytest.raises(ValueError, match="Missing"):
+        TransactionBatch.from_columns(model=Transaction, columns={"fit_id": ["a"]})
+
+
+def test_batch_rows(batch):
+    row = batch[0]
+    assert isinstance(row, Transaction)
+    assert row == Transaction(
+        fit_id="b",
+        date_posted=dt.datetime(2024, 1, 3, tzinfo=dt.UTC),
+        memo="Third",
+        amount=Decimal("1.50"),
+        currency="USD",
+    )
+    assert [t.memo for t in batch.sorted_by("date_posted")] == ["First", "Second", "Third"]
+    assert len(batch[1:]) == 2
+    assert pickle.loads(pickle.dumps(batch)) == batch
+
+
+def test_statement_accepts_models_and_batches(batch):
+    from_batch = Statement(acct_id="1234", currency="USD", transactions=batch)
+    from_models = Statement(acct_id="1234", currency="USD", transactions=list(batch))
+    assert from_batch == from_models
+    df = from_batch.as_dataframe()
+    assert list(df.columns) == list(Transaction.model_fields)
+    assert df["amount"].tolist() == batch.column("amount").tolist()
+
+
+def test_statement_summary(batch):
+    statement = Statement(acct_id="000011111111", currency="USD", transactions=batch)
+    assert statement.summary() == {
+        "acctid_suffix": "1111",
+        "currency": "USD",
+        "transactions": 3,
+        "date_start": dt.datetime(2024, 1, 1, tzinfo=dt.UTC),
+        "date_end": dt.datetime(2024, 1, 3, tzinfo=dt.UTC),
+    }
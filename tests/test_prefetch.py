@@ -0,0 +1,73 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from copeland_ledger.config import Account
+from copeland_ledger.importers.pdf_archive import PdfIdentifier
+from copeland_ledger.prefetch import Prefetcher
+from copeland_ledger.qfx.index import FILE_INDEX
+from copeland_ledger.scripts.beangulp_importer import main
+
+TESTS = Path(__file__).parent
+
+ACCOUNTS = [
+    Account(bean_account="Assets:Checking", org="Ally", acctid_suffix="1111"),
+    Account(bean_account="Assets:Lorem", org="Lorem", acctid_suffix="ipsum"),
+]
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    shutil.copy(TESTS / "qfx" / "bank.qfx", downloads / "bank.qfx")
+    shutil.copy(TESTS / "qfx" / "invest.qfx", downloads / "invest.qfx")
+    shutil.copy(TESTS / "pdf" / "test.pdf", downloads / "statement.pdf")
+    FILE_INDEX.clear()
+    yield downloads
+    FILE_INDEX.clear()
+
+
+def test_prefetcher_warms_shared_indexes(downloads):
+    identifier = PdfIdentifier(accounts=ACCOUNTS)
+    Prefetcher(accounts=ACCOUNTS, pdf_identifier=identifier, jobs=2)([str(downloads)])
+
+    bank = FILE_INDEX.get(downloads / "bank.qfx")
+    assert bank._statement_list is not None
+    # Files of unconfigured accounts are indexed but not parsed
+    assert FILE_INDEX.get(downloads / "invest.qfx")._statement_list is None
+    assert identifier._matches
+    assert identifier.match(downloads / "statement.pdf") == ACCOUNTS[1:]
+
+
+def test_prefetcher_merges_worker_timings(downloads, timings):
+    identifier = PdfIdentifier(accounts=ACCOUNTS)
+    Prefetcher(accounts=ACCOUNTS, pdf_identifier=identifier, jobs=2)([str(downloads)])
+    # Stages run in the worker processes are added to this process's totals
+    assert timings["read"].calls == 2
+    assert timings["parse"].calls == 1
+    assert timings["extract_pdf_text"].counts["pages"] > 0
+
+
+def test_identify_with_jobs(downloads, tmp_path):
+    config = tmp_path / "accounts.yaml"
+    config.write_text(
+        """
+        accounts:
+          - bean_account: Assets:Checking
+            org: Ally
+            acctid_suffix: "1111"
+          - bean_account: Assets:Lorem
+            org: Lorem
+            acctid_suffix: ipsum
+        """
+    )
+    result = CliRunner().invoke(
+        main,
+        ["--config", str(config), "--jobs", "2", "beangulp", "identify", "-v", str(downloads)],
+    )
+    assert result.exit_code == 0, result.output
+    assert "Assets:Checking" in result.output
+    assert "Assets:Lorem" in result.output
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+# Dependencies only specific subcommands need
+HEAVY_PACKAGES = {"numpy", "ofxtools", "pandas", "pypdf"}
+# Generous cap on the total import time of bean-pod --help, in seconds
+IMPORT_TIME_LIMIT = 1.0
+
+
+def import_times(*args: str) -> dict[str, int]:
+    """Run a module with -X importtime and return each imported module's own time in us."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, _, name = line.removeprefix("import time:").split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = int(own)
+    return times
+
+
+def test_beanpod_help_startup():
+    times = import_times("copeland_ledger.scripts.beanpod", "--help")
+    packages = {name.split(".")[0] for name in times}
+    assert not packages & HEAVY_PACKAGES
+    assert sum(times.values()) / 1e6 < IMPORT_TIME_LIMIT
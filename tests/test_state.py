@@ -0,0 +1,140 @@
+import datetime as dt
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from copeland_ledger.importers.qfx import QfxImporter
+from copeland_ledger.qfx.index import FILE_INDEX
+from copeland_ledger.scripts.beangulp_importer import main
+from copeland_ledger.state import ImportState
+
+BANK_QFX = Path(__file__).parent / "qfx" / "bank.qfx"
+TEST_PDF = Path(__file__).parent / "pdf" / "test.pdf"
+
+
+def test_import_state_persists_files_and_fit_ids(tmp_path):
+    path = tmp_path / "state.sqlite"
+    state = ImportState(path=path)
+    state.record(
+        BANK_QFX,
+        account="Assets:Checking",
+        date_start=dt.date(2024, 1, 2),
+        date_end=dt.date(2024, 1, 15),
+        fit_ids=["CHK-0001"],
+    )
+    # Same contents under another name
+    copy = tmp_path / "renamed.qfx"
+    copy.write_bytes(BANK_QFX.read_bytes())
+    reopened = ImportState(path=path)
+    imported = reopened.imported_file(copy, account="Assets:Checking")
+    assert imported.date_end == dt.date(2024, 1, 15)
+    assert reopened.imported_file(copy, account="Assets:Savings") is None
+    assert reopened.fit_ids("Assets:Checking") == {"CHK-0001"}
+
+
+def test_import_state_fit_ids_is_a_snapshot(tmp_path):
+    state = ImportState(path=tmp_path / "state.sqlite")
+    fit_ids = state.fit_ids("Assets:Checking")
+    state.record(BANK_QFX, account="Assets:Checking", fit_ids=["CHK-0001"])
+    # Recording doesn't change a set a caller may be iterating
+    assert fit_ids == frozenset()
+    assert state.fit_ids("Assets:Checking") == {"CHK-0001"}
+
+
+def test_qfx_importer_skips_imported_files_and_transactions(tmp_path):
+    FILE_INDEX.clear()
+    state = ImportState(path=tmp_path / "state.sqlite")
+    # CHK-0001 was already imported from an earlier, overlapping download
+    earlier = tmp_path / "earlier.qfx"
+    earlier.write_text("earlier download")
+    state.record(earlier, account="Assets:Checking", fit_ids=["CHK-0001"])
+    importer = QfxImporter(
+        org="Ally", acctid_suffix="1111", bean_account="Assets:Checking", state=state
+    )
+    assert importer.identify(str(BANK_QFX))
+    entries = importer.extract(str(BANK_QFX), existing=[])
+    assert [entry.meta["fitid"] for entry in entries] == ["CHK-0002"]
+    # Extracting doesn't record the file: nothing has reached the ledger yet
+    assert importer.extract(str(BANK_QFX), existing=[]) == entries
+    importer.record(str(BANK_QFX))
+
+    # A second run recognizes the file without parsing it
+    FILE_INDEX.clear()
+    importer = QfxImporter(
+        org="Ally", acctid_suffix="1111", bean_account="Assets:Checking", state=state
+    )
+    assert importer.identify(str(BANK_QFX))
+    assert FILE_INDEX.get(BANK_QFX)._statement_list is None
+    assert importer.date(str(BANK_QFX)) == dt.date(2024, 1, 15)
+    assert importer.extract(str(BANK_QFX), existing=[]) == []
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    FILE_INDEX.clear()
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    shutil.copy(BANK_QFX, downloads / "bank.qfx")
+    shutil.copy(TEST_PDF, downloads / "statement.pdf")
+    yield downloads
+    FILE_INDEX.clear()
+
+
+@pytest.fixture
+def state_db(tmp_path):
+    return tmp_path / "state.sqlite"
+
+
+@pytest.fixture
+def run(tmp_path, state_db):
+    """Run beangulp-import with an import state."""
+    config = tmp_path / "accounts.yaml"
+    config.write_text(
+        """
+        accounts:
+          - bean_account: Assets:Checking
+            org: Ally
+            acctid_suffix: "1111"
+          - bean_account: Assets:Lorem
+            org: Lorem
+            acctid_suffix: ipsum
+        """
+    )
+
+    def run(*args):
+        FILE_INDEX.clear()
+        args = ["--config", str(config), "--state-db", str(state_db), *args]
+        result = CliRunner().invoke(main, args)
+        assert result.exit_code == 0, result.output
+        return result
+
+    return run
+
+
+def test_extract_does_not_record_imports(run, downloads, state_db):
+    run("beangulp", "extract", str(downloads))
+    assert ImportState(path=state_db).imported_files(downloads / "bank.qfx") == []
+    # So extracting again still yields every transaction
+    assert "CHK-0001" in run("beangulp", "extract", str(downloads)).output
+
+
+def test_insert_records_imports(run, downloads, state_db, tmp_path):
+    run("insert", "--ledger-dir", str(tmp_path / "ledger"), str(downloads))
+    state = ImportState(path=state_db)
+    assert state.imported_file(downloads / "bank.qfx", "Assets:Checking") is not None
+    assert state.fit_ids("Assets:Checking") == {"CHK-0001", "CHK-0002"}
+
+
+def test_archive_records_pdfs(run, downloads, state_db, tmp_path):
+    digest = ImportState(path=state_db).digest(downloads / "statement.pdf")
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    run("beangulp", "archive", "--dry-run", "-o", str(documents), str(downloads))
+    assert ImportState(path=state_db).imported_files(downloads / "statement.pdf") == []
+    run("beangulp", "archive", "-o", str(documents), str(downloads))
+    archived = next(documents.rglob("*.pdf"))
+    state = ImportState(path=state_db)
+    assert state.digest(archived) == digest
+    assert [imported.account for imported in state.imported_files(archived)] == ["Assets:Lorem"]
@@ -0,0 +1,17 @@
+from copeland_ledger.suffixes import SuffixMap
+
+
+def test_find_longest_suffix():
+    suffixes = SuffixMap([("1", "a"), ("1111", "b"), ("111", "c"), ("2222", "d")])
+    assert suffixes.longest("000011111111") == "1111"
+    assert suffixes.find("000011111111") == "b"
+    assert suffixes.find("0001") == "a"
+    assert suffixes.longest("000022222223") is None
+    assert suffixes.find("") is None
+
+
+def test_first_value_of_a_suffix_wins():
+    suffixes = SuffixMap([("1111", "checking"), ("2222", "savings"), ("1111", "other")])
+    assert suffixes.find("000011111111") == "checking"
+    assert list(suffixes) == ["1111", "2222"]
+    assert len(suffixes) == 2
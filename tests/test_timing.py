@@ -0,0 +1,58 @@
+import io
+from pathlib import Path
+
+import pytest
+from rich.console import Console
+
+from copeland_ledger import timing
+from copeland_ledger.qfx.load import load
+
+BANK_QFX = Path(__file__).parent / "qfx" / "bank.qfx"
+
+
+def test_stage_is_a_no_op_when_disabled():
+    assert timing.stage("parse") is timing.NULL_STAGE
+    with timing.stage("parse") as timer:
+        timer.count(rows=1)
+    assert "parse" not in timing.TOTALS
+
+
+def test_stage_accumulates_totals(timings):
+    for rows in (2, 3):
+        with timing.stage("parse", name="bank.qfx") as timer:
+            timer.count(rows=rows, bytes=100)
+    totals = timing.TOTALS["parse"]
+    assert totals.calls == 2
+    assert totals.seconds > 0
+    assert totals.counts == {"rows": 5, "bytes": 200}
+
+
+def test_timed_decorator(timings):
+    @timing.timed("transform")
+    def transform(value):
+        return value * 2
+
+    assert transform(2) == 4
+    assert timing.TOTALS["transform"].calls == 1
+
+
+def test_load_reports_stages(timings):
+    load(path=str(BANK_QFX))
+    parse = timing.TOTALS["parse"]
+    assert parse.counts["rows"] == 3
+    assert parse.counts["bytes"] == BANK_QFX.stat().st_size
+
+
+def test_print_summary(timings):
+    with timing.stage("read") as timer:
+        timer.count(bytes=2048)
+    output = io.StringIO()
+    timing.print_summary(console=Console(file=output, width=120))
+    assert "read" in output.getvalue()
+    assert "2,048" in output.getvalue()
+
+
+def test_failed_stage_is_not_counted(timings):
+    with pytest.raises(ValueError), timing.stage("parse"):
+        raise ValueError
+    assert "parse" not in timings
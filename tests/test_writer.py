@@ -0,0 +1,202 @@
+import datetime as dt
+import io
+import os
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from beancount.core import amount, data, position
+from beancount.parser import parser, printer
+
+from copeland_ledger.amortization import schedule_payments, write_beancount_payments
+from copeland_ledger.importers.qfx import QfxImporter
+from copeland_ledger.qfx.index import FILE_INDEX
+from copeland_ledger.writer import DateIndex, LedgerFile, account_file, format_entry
+from tests.test_amortization import loan_detail
+
+QFX_DIR = Path(__file__).parent / "qfx"
+
+
+def transaction(date: dt.date, number: str, narration: str = "Groceries") -> data.Transaction:
+    posting = data.Posting(
+        "Assets:Checking", amount.Amount(Decimal(number), "USD"), None, None, None, None
+    )
+    return data.Transaction(
+        data.new_metadata("<test>", 0),
+        date,
+        "*",
+        None,
+        narration,
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        [posting],
+    )
+
+
+@pytest.fixture
+def extracted():
+    FILE_INDEX.clear()
+    entries = []
+    for name, account in (("bank.qfx", "Assets:Checking"), ("invest.qfx", "Assets:Vanguard")):
+        importer = QfxImporter(org="Test", acctid_suffix="", bean_account=account)
+        assert importer.identify(str(QFX_DIR / name))
+        entries += importer.extract(str(QFX_DIR / name), existing=[])
+    FILE_INDEX.clear()
+    return entries
+
+
+def test_format_entry_matches_printer(extracted):
+    cost = position.Cost(Decimal("1E+2"), "USD", None, None)
+    posting = data.Posting("Assets:A", amount.Amount(Decimal("2"), "X"), cost, None, None, None)
+    other = data.Transaction(
+        {"note": None, "flagged": True},
+        dt.date(2024, 1, 1),
+        "!",
+        'Payee "quoted"',
+        None,
+        frozenset({"b", "a"}),
+        frozenset({"link"}),
+        [posting, data.Posting("Assets:Longer:Name", None, None, None, None, None)],
+    )
+    for entry in [*extracted, other]:
+        assert format_entry(entry) == printer.format_entry(entry)
+
+
+def test_format_entry_matches_payment_writer():
+    loan = loan_detail()
+    payments = list(schedule_payments(loan=loan, stop=3))
+    expected = io.StringIO()
+    write_beancount_payments(payments=payments, loan=loan, file=expected)
+    entries, errors, _ = parser.parse_string(expected.getvalue())
+    assert not errors
+    assert "".join("\n" + format_entry(entry) for entry in entries) == expected.getvalue()
+
+
+def test_account_file(tmp_path):
+    assert account_file(tmp_path, "Assets:US:Checking") == tmp_path / "Assets/US/Checking.beancount"
+
+
+def test_ledger_file_inserts_in_date_order(tmp_path):
+    path = tmp_path / "Assets" / "Checking.beancount"
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    assert ledger.insert([transaction(dt.date(2024, 1, d), "-1.00") for d in (5, 10)]) == 2
+    path.write_text(";; Checking\n\n" + path.read_text())
+    ledger.insert(
+        [
+            transaction(dt.date(2024, 1, 1), "-2.00", "First"),
+            transaction(dt.date(2024, 1, 7), "-3.00", "Middle"),
+            transaction(dt.date(2024, 1, 7), "-4.00", "Middle again"),
+            transaction(dt.date(2024, 2, 1), "-5.00", "Last"),
+        ]
+    )
+    entries, errors, _ = parser.parse_file(str(path))
+    assert not errors
+    assert [entry.narration for entry in entries] == [
+        "First",
+        "Groceries",
+        "Middle",
+        "Middle again",
+        "Groceries",
+        "Last",
+    ]
+    assert path.read_text().startswith(";; Checking\n\n2024-01-01")
+    assert "\n\n\n" not in path.read_text()
+    # The index kept up to date by the insertions matches one built from scratch
+    assert ledger.index() == DateIndex.scan(path)
+
+
+def test_ledger_file_takes_entries_in_date_order(tmp_path):
+    path = tmp_path / "Checking.beancount"
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    ledger.insert([transaction(dt.date(2024, 1, 1), "-1.00")])
+    before = path.read_bytes()
+    entries = iter([transaction(dt.date(2024, 1, d), "-1.00") for d in (5, 3)])
+    with pytest.raises(ValueError):
+        ledger.insert(entries)
+    assert path.read_bytes() == before
+    assert ledger.insert(entries) == 0
+
+
+def test_ledger_file_appends_without_reading(tmp_path, monkeypatch):
+    path = tmp_path / "Checking.beancount"
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    ledger.insert([transaction(dt.date(2024, 1, 1), "-1.00")])
+    inode = path.stat().st_ino
+    monkeypatch.setattr(DateIndex, "scan", None)
+    read_bytes = Path.read_bytes
+    monkeypatch.setattr(Path, "read_bytes", lambda p: None if p == path else read_bytes(p))
+    ledger.insert([transaction(dt.date(2024, 1, 2), "-2.00")])
+    # Appended in place, not copied to a new file
+    assert path.stat().st_ino == inode
+    assert path.read_text().count("2024-01-0") == 2
+
+
+def test_ledger_file_truncates_failed_append(tmp_path, monkeypatch):
+    path = tmp_path / "Checking.beancount"
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    ledger.insert([transaction(dt.date(2024, 1, 1), "-1.00")])
+    before = path.read_bytes()
+
+    def fsync(fd):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr("copeland_ledger.writer.os.fsync", fsync)
+    with pytest.raises(OSError):
+        ledger.insert([transaction(dt.date(2024, 1, 2), "-2.00")])
+    assert path.read_bytes() == before
+
+
+def test_ledger_file_indexes_fit_ids(tmp_path):
+    path = tmp_path / "Checking.beancount"
+    path.write_text('2024-01-01 * "By hand"\n  fitid: "A\\"1"\n  Assets:Checking  1 USD\n')
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    entry = transaction(dt.date(2024, 1, 2), "-1.00")
+    entry.meta["fitid"] = "B2"
+    ledger.insert([entry])
+    assert ledger.index().fit_ids == {'A"1', "B2"}
+    assert ledger.index() == DateIndex.scan(path)
+
+
+def test_ledger_file_reindexes_edited_file(tmp_path):
+    path = tmp_path / "Checking.beancount"
+    path.write_text("2024-01-01 open Assets:Checking\n")
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    ledger.insert([transaction(dt.date(2024, 1, 3), "-1.00")])
+    path.write_text(path.read_text() + '\n2024-01-05 note Assets:Checking "Edited"\n')
+    ledger.insert([transaction(dt.date(2024, 1, 4), "-2.00")])
+    dates = [entry.date.day for entry in parser.parse_file(str(path))[0]]
+    assert dates == [1, 3, 4, 5]
+
+
+def test_ledger_file_keeps_file_when_write_fails(tmp_path, monkeypatch):
+    path = tmp_path / "Checking.beancount"
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    ledger.insert([transaction(dt.date(2024, 1, 2), "-1.00")])
+    before = path.read_bytes()
+
+    def replace(src, dst):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr("copeland_ledger.writer.os.replace", replace)
+    with pytest.raises(OSError):
+        ledger.insert([transaction(dt.date(2024, 1, 1), "-2.00")])
+    assert path.read_bytes() == before
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == ["Checking.beancount"]
+
+
+def test_ledger_file_checks_index_before_splicing(tmp_path):
+    path = tmp_path / "Checking.beancount"
+    ledger = LedgerFile(path, index_dir=tmp_path / "index")
+    ledger.insert([transaction(dt.date(2024, 1, d), "-1.00") for d in (2, 9)])
+    # An edit after the insertion point that keeps the size and mtime, e.g.
+    # within the mtime's granularity
+    stat = path.stat()
+    head, date, rest = path.read_text().rpartition("2024-01-09")
+    path.write_text(head + ";x\n" + date + rest.replace('"Groceries"', '"Grocer"'))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert path.stat().st_size == stat.st_size
+    ledger.insert([transaction(dt.date(2024, 1, 5), "-2.00", "Middle")])
+    entries, errors, _ = parser.parse_file(str(path))
+    assert not errors
+    assert [entry.date.day for entry in entries] == [2, 5, 9]
+    assert ledger.index() == DateIndex.scan(path)